@@ -8,6 +8,7 @@ benchmark orchestration.
 import os
 import re
 import html
+import time
 from datetime import datetime
 from pathlib import Path
 
@@ -15,33 +16,73 @@ import numpy as np
 import pandas as pd
 import streamlit as st
 import tiktoken
-from sentence_transformers import SentenceTransformer, CrossEncoder
 
 # Suppress tqdm progress bars that cause BrokenPipeError in Streamlit
 os.environ.setdefault("TQDM_DISABLE", "1")
 
 from app_logic.config import (
+    CANDIDATE_POOL,
+    CANDIDATE_POOL_MODE,
     DATA_PATH,
     DEFAULT_TOP_K,
-    EMBED_MODEL,
-    EMBEDDINGS_PATH,
+    EMBEDDING_STORE_DIR,
     LLM_MODEL,
+    LOCAL_RERANK_METHOD,
     LOCAL_RERANK_MODEL,
+    LOCAL_RERANK_WINDOW_POOL,
     MODEL_PRICING,
-    RERANKER_MODEL,
+    MODEL_SERVER_URL,
+    QUERY_CACHE_MAX_ITEMS,
+    QUERY_CACHE_PATH,
+    RERANK_CACHE_MAX_ITEMS,
+    RERANK_CACHE_PATH,
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_MAX_ITEMS,
+    RESPONSE_CACHE_THRESHOLD,
+    RESPONSE_CACHE_TTL_SECONDS,
+    SCHEDULER_ENABLED,
+    RERANKER_BACKEND,
+    VECTOR_INDEX_PATH,
+)
+from app_logic.cache import (
+    CachedEmbedder,
+    PersistentLRUCache,
+    RerankScoreCache,
+    SemanticResponseCache,
+)
+from app_logic.data import load_courses
+from app_logic.embedding_store import (
+    is_store_stale,
+    open_embedding_store,
+    validate_embedding_store,
 )
-from app_logic.data import load_courses, load_embeddings
 from app_logic.feedback import log_feedback
-from app_logic.filters import apply_filters, format_active_filters
+from app_logic.filters import apply_filters, build_filter_index, format_active_filters
 from app_logic.llm import build_system_prompt, create_response_stream, detect_language
+from app_logic.lookup import CourseLookupIndex, build_course_lookup
+from app_logic.model_client import (
+    ModelServerClient,
+    RemoteCrossEncoder,
+    RemoteEmbedder,
+    connect_model_server,
+    remote_local_rerank_runtime,
+)
+from app_logic.models import (
+    load_embedding_model,
+    load_first_stage_model,
+    load_reranker_model,
+)
 from app_logic.retrieval import (
     build_course_context,
-    get_semantic_candidates,
+    cascade_rerank_candidates,
+    get_index_candidates,
     load_local_transformers_reranker,
     rerank_candidates,
     rerank_candidates_with_local_llm,
     select_semantic_results,
 )
+from app_logic.scheduler import BatchedEmbedder, BatchedReranker, scheduler_stats
+from app_logic.vector_index import ExactIndex, load_vector_index
 from app_ui.benchmark import (
     get_benchmark_case_count,
     initialize_benchmark_state,
@@ -99,8 +140,19 @@ def _resolve_openrouter_api_key() -> str:
 _RANKING_MODE_LABELS = {
     "semantic": "Kiire: semantiline otsing",
     "cross_encoder": "Täpsus: cross-encoder reranker",
+    "cascade": "Kaskaad: väike mudel eelvalib, cross-encoder järjestab",
     "local_llm": "Kohalik LLM reranker (Transformers)",
 }
+_LOCAL_RERANK_METHOD_LABELS = {
+    "logits": "Jah/ei skoor (üks läbimine)",
+    "generate": "JSON-järjestuse genereerimine",
+    "window": f"Libisevad aknad ({LOCAL_RERANK_WINDOW_POOL} kandidaati)",
+}
+# Ranking modes plus result sources that bypass the models.
+_RESULT_SOURCE_LABELS = {
+    **_RANKING_MODE_LABELS,
+    "lookup": "Otseotsing ainekoodi või nime järgi",
+}
 
 
 def _confidence_to_score_10(confidence: np.ndarray) -> np.ndarray:
@@ -200,6 +252,76 @@ def _parse_llm_course_details(response_text: str) -> dict[str, dict[str, str | i
     return details
 
 
+_COURSE_HEADER_RE = re.compile(r"^\s*-\s*\*\*", re.MULTILINE)
+
+
+class _CourseDetailStream:
+    """Parse course blocks of a streamed LLM answer as they complete.
+
+    A block is complete once the next course header arrives (or the stream
+    ends); each completed block is parsed once with
+    ``_parse_llm_course_details``.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.details: dict[str, dict[str, str | int]] = {}
+        self._parsed_upto = 0
+
+    def _parse_until(self, end: int) -> bool:
+        if end <= self._parsed_upto:
+            return False
+        new_details = _parse_llm_course_details(self.text[self._parsed_upto:end])
+        self._parsed_upto = end
+        for code, item in new_details.items():
+            self.details.setdefault(code, {}).update(item)
+        return bool(new_details)
+
+    def feed(self, chunk: str) -> bool:
+        """Add streamed text; True if a course block was completed."""
+        self.text += chunk
+        complete_lines = self.text[:self.text.rfind("\n") + 1]
+        headers = [m.start() for m in _COURSE_HEADER_RE.finditer(complete_lines, self._parsed_upto)]
+        # Everything before the last complete header line belongs to finished blocks.
+        return self._parse_until(headers[-1]) if headers else False
+
+    def finish(self) -> bool:
+        """Parse the final block; True if it held course details."""
+        return self._parse_until(len(self.text))
+
+
+def _stream_text(stream):
+    """Yield the text deltas of a streaming chat completion."""
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def _apply_llm_details(results_df: pd.DataFrame, llm_details: dict[str, dict[str, str | int]]) -> None:
+    """Copy parsed LLM overviews, goals and scores into the card columns."""
+    llm_overviews: list[str] = []
+    llm_scores: list[float] = []
+    llm_goals: list[str] = []
+    llm_relevances: list[str] = []
+    for _, course_row in results_df.iterrows():
+        code_key = _normalize_course_code(str(course_row.get("aine_kood", "")))
+        item = llm_details.get(code_key, {})
+        llm_overviews.append(str(item.get("overview", "")).strip())
+        llm_goals.append(str(item.get("goals", "")).strip())
+        llm_relevances.append(str(item.get("relevance", "")).strip())
+        score_value = item.get("score_10")
+        llm_scores.append(float(score_value) if isinstance(score_value, int) else np.nan)
+
+    results_df["_llm_overview"] = llm_overviews
+    results_df["_llm_score_10"] = llm_scores
+    results_df["_llm_goals"] = llm_goals
+    results_df["_llm_relevance"] = llm_relevances
+
+    llm_score_series = pd.to_numeric(results_df["_llm_score_10"], errors="coerce")
+    match_score_series = pd.to_numeric(results_df["_match_score_10"], errors="coerce")
+    results_df["_display_score_10"] = llm_score_series.fillna(match_score_series).fillna(6).astype(int)
+
+
 def _maybe_auto_release_reranker_memory(
     current_mode: str,
     current_local_model: str,
@@ -210,8 +332,12 @@ def _maybe_auto_release_reranker_memory(
     previous_local_model = st.session_state.get("_previous_local_rerank_model")
     if enabled:
         if previous_mode != current_mode:
-            if previous_mode == "cross_encoder":
+            if previous_mode == "cross_encoder" and current_mode != "cascade":
                 _load_reranker.clear()
+            elif previous_mode == "cascade":
+                _load_first_stage_reranker.clear()
+                if current_mode != "cross_encoder":
+                    _load_reranker.clear()
             elif previous_mode == "local_llm":
                 _load_local_llm_reranker.clear()
         elif (
@@ -242,23 +368,133 @@ def _load_courses() -> pd.DataFrame:
     return load_courses(DATA_PATH)
 
 
-@st.cache_data
+@st.cache_resource
+def _load_embedding_store():
+    # cache_resource (not cache_data) so the read-only memmap is shared, not copied.
+    return open_embedding_store(EMBEDDING_STORE_DIR)
+
+
 def _load_embeddings() -> np.ndarray:
-    return load_embeddings(EMBEDDINGS_PATH)
+    return _load_embedding_store().matrix
+
+
+@st.cache_data
+def _embedding_store_is_stale() -> bool:
+    return is_store_stale(_load_embedding_store(), DATA_PATH)
 
 
 @st.cache_resource
-def _load_embedder() -> SentenceTransformer:
-    return SentenceTransformer(EMBED_MODEL, model_kwargs={"torch_dtype": "float16"})
+def _load_filter_index():
+    return build_filter_index(_load_courses())
+
+
+@st.cache_resource
+def _load_course_lookup() -> CourseLookupIndex:
+    return build_course_lookup(_load_courses())
+
+
+@st.cache_resource
+def _load_vector_index():
+    """Load the offline-built ANN index, or fall back to exact search."""
+    embeddings = _load_embeddings()
+    try:
+        return load_vector_index(VECTOR_INDEX_PATH, embeddings)
+    except (FileNotFoundError, ValueError):
+        return ExactIndex(embeddings, normalized=True)
+
+
+@st.cache_resource
+def _load_query_cache() -> PersistentLRUCache:
+    return PersistentLRUCache(QUERY_CACHE_MAX_ITEMS, QUERY_CACHE_PATH)
+
+
+@st.cache_resource
+def _load_rerank_score_store() -> PersistentLRUCache:
+    # One store for both cascade stages; keys include the model name.
+    return PersistentLRUCache(RERANK_CACHE_MAX_ITEMS, RERANK_CACHE_PATH)
+
+
+@st.cache_resource
+def _load_model_client() -> ModelServerClient | None:
+    """Client of a running model_server.py, or None to load models in-process."""
+    return connect_model_server(os.getenv("MODEL_SERVER_URL", MODEL_SERVER_URL))
+
+
+@st.cache_resource
+def _load_rerank_cache(model_key: str) -> RerankScoreCache:
+    """Score cache of the cross-encoder whose effective key its loader returned."""
+    return RerankScoreCache(model_key, _load_rerank_score_store())
+
+
+@st.cache_resource
+def _load_response_cache() -> SemanticResponseCache:
+    return SemanticResponseCache(
+        RESPONSE_CACHE_MAX_ITEMS, RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_THRESHOLD,
+    )
+
+
+def _course_descriptions() -> pd.Series:
+    return _load_courses()["description"].fillna("").astype(str)
+
+
+def _scheduled_reranker(cross_encoder, name: str = "reranker"):
+    # With the scheduler on, calls from all sessions share micro-batches.
+    return BatchedReranker(cross_encoder, name=name) if SCHEDULER_ENABLED else cross_encoder
+
+
+def _local_reranker():
+    model, model_key = load_reranker_model(RERANKER_BACKEND, _course_descriptions())
+    return _scheduled_reranker(model), model_key
+
+
+def _local_first_stage_reranker():
+    model, model_key = load_first_stage_model(_course_descriptions())
+    return _scheduled_reranker(model, name="first-stage reranker"), model_key
+
+
+def _local_embedder():
+    model, model_key = load_embedding_model()
+    return (BatchedEmbedder(model) if SCHEDULER_ENABLED else model), model_key
 
 
 @st.cache_resource
-def _load_reranker() -> CrossEncoder:
-    return CrossEncoder(RERANKER_MODEL, model_kwargs={"torch_dtype": "float16"})
+def _load_embedder() -> CachedEmbedder:
+    client = _load_model_client()
+    if client is not None:
+        # Cache keys follow the server's backend, or the local one after a fallback.
+        remote = RemoteEmbedder(client, fallback=_local_embedder)
+        return CachedEmbedder(remote, remote.model_key, _load_query_cache())
+    model, model_key = _local_embedder()
+    return CachedEmbedder(model, model_key, _load_query_cache())
+
+
+@st.cache_resource
+def _load_reranker():
+    """(reranker, score-cache key); the key names the backend actually loaded."""
+    client = _load_model_client()
+    if client is not None:
+        remote = RemoteCrossEncoder(client, fallback=_local_reranker)
+        return remote, remote.model_key
+    return _local_reranker()
+
+
+@st.cache_resource
+def _load_first_stage_reranker():
+    """(first-stage reranker, score-cache key), like ``_load_reranker``."""
+    client = _load_model_client()
+    if client is not None and "first_stage" in client.info.get("models", []):
+        remote = RemoteCrossEncoder(client, model="first_stage", fallback=_local_first_stage_reranker)
+        return remote, remote.model_key
+    return _local_first_stage_reranker()
 
 
 @st.cache_resource
 def _load_local_llm_reranker(model_name: str):
+    client = _load_model_client()
+    if client is not None:
+        return remote_local_rerank_runtime(
+            client, model_name, fallback=lambda: load_local_transformers_reranker(model_name),
+        )
     return load_local_transformers_reranker(model_name)
 
 
@@ -435,15 +671,24 @@ def _render_sidebar(
             st.caption("Cross-encoder kasutab rohkem mälu. Kohalik LLM kasutab Hugging Face Transformers mudelit.")
             
             local_rerank_model = LOCAL_RERANK_MODEL
+            local_rerank_method = LOCAL_RERANK_METHOD
             if ranking_mode == "local_llm":
                 local_rerank_model = st.text_input(
                     "Kohalik rerank mudel",
                     value=LOCAL_RERANK_MODEL,
                     help="Näide: Qwen/Qwen3-0.6B või lokaalne mudelitee.",
                 ).strip() or LOCAL_RERANK_MODEL
+                local_rerank_method = st.radio(
+                    "Kohaliku LLM-i meetod",
+                    options=list(_LOCAL_RERANK_METHOD_LABELS.keys()),
+                    format_func=lambda key: _LOCAL_RERANK_METHOD_LABELS[key],
+                    index=list(_LOCAL_RERANK_METHOD_LABELS).index(LOCAL_RERANK_METHOD),
+                    help="Jah/ei skoor annab igale kandidaadile päris skoori ja on kiirem kui genereerimine.",
+                )
 
             if st.button("Vabasta järjestusmudelite mälu"):
                 _load_reranker.clear()
+                _load_first_stage_reranker.clear()
                 _load_local_llm_reranker.clear()
                 st.success("Järjestusmudelite cache tühjendatud.")
 
@@ -452,9 +697,44 @@ def _render_sidebar(
                 value=True,
                 help="Kui lahkud cross-encoder või kohaliku LLM-i režiimist, vabastatakse vastava mudeli cache automaatselt.",
             )
+
+            query_cache_stats = _load_query_cache().stats()
+            st.caption(
+                f"Päringuvektorite cache: {query_cache_stats['hits']} tabamust "
+                f"({query_cache_stats['memory_hits']} mälust, {query_cache_stats['disk_hits']} kettalt), "
+                f"{query_cache_stats['misses']} möödalasku."
+            )
+            rerank_cache_stats = _load_rerank_score_store().stats()
+            st.caption(
+                f"Rerankeri skooride cache: {rerank_cache_stats['hits']} tabamust, "
+                f"{rerank_cache_stats['misses']} möödalasku."
+            )
+            response_cache_stats = _load_response_cache().stats()
+            st.caption(
+                f"Vastuste cache: {response_cache_stats['hits']} tabamust, "
+                f"{response_cache_stats['misses']} möödalasku "
+                f"({response_cache_stats['hit_rate']:.0%}), "
+                f"säästetud {response_cache_stats['tokens_saved']} tokenit."
+            )
+            batch_stats = scheduler_stats()
+            model_client = _load_model_client()
+            if model_client is not None:
+                try:
+                    server_stats = model_client.health().get("scheduler", {})
+                    batch_stats.update({f"server: {name}": stats for name, stats in server_stats.items()})
+                except (OSError, RuntimeError, ValueError):
+                    st.caption("Mudeliserver ei vasta; mudelid laaditakse rakendusse.")
+            for name, stats in batch_stats.items():
+                st.caption(
+                    f"Mikropartiid ({name}): {stats['requests']} päringut {stats['batches']} partiis "
+                    f"(keskmiselt {stats['mean_batch_requests']:.1f}, max {stats['max_batch_requests']}), "
+                    f"järjekorras {stats['queue_depth']} (max {stats['max_queue_depth']}), "
+                    f"ootamine {stats['mean_wait_ms']:.1f} ms."
+                )
         else:
             ranking_mode = "cross_encoder"
             local_rerank_model = LOCAL_RERANK_MODEL
+            local_rerank_method = LOCAL_RERANK_METHOD
             auto_release_reranker = True
 
         # Active-filter summary
@@ -476,6 +756,7 @@ def _render_sidebar(
                 study_levels=selected_levels,
                 teaching_methods=selected_teaching,
                 domains=selected_domains,
+                filter_index=_load_filter_index(),
             )
             st.caption(f"{int(match_mask.sum())} kursust vastab filtritele")
 
@@ -509,6 +790,7 @@ def _render_sidebar(
         "selected_domains": selected_domains,
         "ranking_mode": ranking_mode,
         "local_rerank_model": local_rerank_model,
+        "local_rerank_method": local_rerank_method,
         "auto_release_reranker": auto_release_reranker,
         "active_filters_str": active_filters_str,
     }
@@ -1004,9 +1286,19 @@ def _render_debug_info(debug: dict, index: int) -> None:
         st.caption(f"**Aktiivsed filtrid:** {debug.get('filters', 'Info puudub')}")
         ranking_mode = debug.get("ranking_mode")
         if ranking_mode:
-            st.caption(f"**Järjestusmeetod:** {_RANKING_MODE_LABELS.get(ranking_mode, ranking_mode)}")
+            st.caption(f"**Järjestusmeetod:** {_RESULT_SOURCE_LABELS.get(ranking_mode, ranking_mode)}")
         st.write(f"Filtreeritud kursuste arv: **{debug.get('filtered_count', 0)}**")
         st.write(f"Kandidaatide arv (semantiline otsing): **{debug.get('candidate_count', 0)}**")
+        if debug.get("response_cache_similarity") is not None:
+            st.write(
+                f"Vastus vastuste cache'ist (päringu sarnasus "
+                f"**{debug['response_cache_similarity']:.3f}**)"
+            )
+        if debug.get("llm_first_token_ms") is not None:
+            st.write(
+                f"LLM-i esimene token: **{debug['llm_first_token_ms']:.0f} ms**, "
+                f"kogu vastus: **{debug.get('llm_total_ms', 0):.0f} ms**"
+            )
 
         st.write("**Lõpptulemused (järjestatud):**")
         rdf = debug.get("results_df")
@@ -1085,11 +1377,131 @@ def _render_chat_history(show_debug: bool, developer_mode: bool) -> None:
 
 
 # ---------- Handle user prompt ----------
+def _rank_semantic_candidates(
+    prompt: str,
+    sidebar: dict,
+    df: pd.DataFrame,
+    vector_index,
+    mask: pd.Series,
+) -> tuple[pd.DataFrame, np.ndarray, int]:
+    """Vector search plus the selected ranking mode.
+
+    Returns (results_df, match_confidence, candidate_count).
+    """
+    embedder = _load_embedder()
+    # The windowed local LLM ranks a larger fixed pool.
+    windowed = sidebar["ranking_mode"] == "local_llm" and sidebar["local_rerank_method"] == "window"
+    candidates_df, candidate_scores = get_index_candidates(
+        embedder, prompt, df, vector_index, row_mask=mask,
+        candidate_pool=LOCAL_RERANK_WINDOW_POOL if windowed else CANDIDATE_POOL,
+        adaptive_pool=CANDIDATE_POOL_MODE == "adaptive" and not windowed,
+    )
+    candidate_count = len(candidates_df)
+
+    ranking_mode = sidebar["ranking_mode"]
+    match_confidence = np.array([], dtype=float)
+    if ranking_mode == "cross_encoder":
+        reranker, reranker_key = _load_reranker()
+        rerank_result = rerank_candidates(
+            reranker, prompt, candidates_df, top_k=sidebar["top_k"],
+            return_scores=True, score_cache=_load_rerank_cache(reranker_key),
+        )
+        if isinstance(rerank_result, tuple):
+            results_df, match_confidence = rerank_result
+        else:
+            results_df = rerank_result
+        _release_torch_cache()
+    elif ranking_mode == "cascade":
+        reranker, reranker_key = _load_reranker()
+        first_stage, first_stage_key = _load_first_stage_reranker()
+        results_df, match_confidence = cascade_rerank_candidates(
+            first_stage,
+            reranker,
+            prompt,
+            candidates_df,
+            top_k=sidebar["top_k"],
+            return_scores=True,
+            score_cache=_load_rerank_cache(reranker_key),
+            first_stage_cache=_load_rerank_cache(first_stage_key),
+        )
+        _release_torch_cache()
+    elif ranking_mode == "local_llm":
+        try:
+            llm_top_k = sidebar["top_k"]
+            if llm_top_k is None and not windowed:
+                semantic_pick = select_semantic_results(
+                    candidates_df,
+                    candidate_scores,
+                    top_k=None,
+                    return_confidence=True,
+                )
+                if isinstance(semantic_pick, tuple):
+                    llm_candidates, llm_confidence = semantic_pick
+                else:
+                    llm_candidates = semantic_pick
+                    llm_confidence = np.array([], dtype=float)
+                llm_top_k = len(llm_candidates)
+            else:
+                llm_candidates = candidates_df
+                llm_confidence = np.clip(
+                    (np.asarray(candidate_scores, dtype=float) + 1.0) / 2.0,
+                    0.0,
+                    1.0,
+                )
+                if llm_top_k is None:
+                    # Windows rank the whole pool; the smart cut-off only sets the count.
+                    llm_top_k = len(select_semantic_results(candidates_df, candidate_scores, top_k=None))
+
+            local_runtime = _load_local_llm_reranker(sidebar["local_rerank_model"])
+            llm_result = rerank_candidates_with_local_llm(
+                prompt,
+                llm_candidates,
+                rerank_runtime=local_runtime,
+                top_k=llm_top_k,
+                return_candidate_indices=True,
+                method=sidebar["local_rerank_method"],
+                return_scores=True,
+            )
+            results_df, selected_indices, llm_scores = llm_result
+            if llm_scores is not None:
+                match_confidence = llm_scores
+            elif len(llm_confidence):
+                match_confidence = np.asarray(llm_confidence, dtype=float)[selected_indices]
+        except Exception as llm_rerank_error:
+            st.warning(
+                "Kohalik rerank ebaõnnestus, kasutan semantilist järjestust. "
+                f"({llm_rerank_error})"
+            )
+            semantic_result = select_semantic_results(
+                candidates_df,
+                candidate_scores,
+                sidebar["top_k"],
+                return_confidence=True,
+            )
+            if isinstance(semantic_result, tuple):
+                results_df, match_confidence = semantic_result
+            else:
+                results_df = semantic_result
+    else:
+        semantic_result = select_semantic_results(
+            candidates_df,
+            candidate_scores,
+            sidebar["top_k"],
+            return_confidence=True,
+        )
+        if isinstance(semantic_result, tuple):
+            results_df, match_confidence = semantic_result
+        else:
+            results_df = semantic_result
+
+    return results_df, match_confidence, candidate_count
+
+
 def _handle_user_prompt(
     prompt: str,
     sidebar: dict,
     df: pd.DataFrame,
-    embeddings: np.ndarray,
+    vector_index,
 ) -> None:
     st.session_state.messages.append({"role": "user", "content": prompt})
     with st.chat_message("user"):
@@ -1120,97 +1532,28 @@ def _handle_user_prompt(
                 study_levels=sidebar["selected_levels"],
                 teaching_methods=sidebar["selected_teaching"],
                 domains=sidebar["selected_domains"],
+                filter_index=_load_filter_index(),
             )
-            filtered_df = df[mask].copy()
-            filtered_embeddings = embeddings[mask.values]
+            # The mask is applied inside the top-k search; only the winning
+            # rows are materialised as a DataFrame.
+            filtered_count = int(mask.sum())
 
-            if filtered_df.empty:
+            if filtered_count == 0:
                 st.warning("Filtritele vastavaid kursusi ei leitud.")
             else:
-                # 2. Semantic search
-                embedder = _load_embedder()
-                candidates_df, candidate_scores = get_semantic_candidates(
-                    embedder, prompt, filtered_df, filtered_embeddings,
-                )
-                candidate_count = len(candidates_df)
-
-                ranking_mode = sidebar["ranking_mode"]
-                match_confidence = np.array([], dtype=float)
-                if ranking_mode == "cross_encoder":
-                    reranker = _load_reranker()
-                    rerank_result = rerank_candidates(
-                        reranker, prompt, candidates_df, top_k=sidebar["top_k"],
-                        return_scores=True,
-                    )
-                    if isinstance(rerank_result, tuple):
-                        results_df, match_confidence = rerank_result
-                    else:
-                        results_df = rerank_result
-                    _release_torch_cache()
-                elif ranking_mode == "local_llm":
-                    try:
-                        llm_top_k = sidebar["top_k"]
-                        if llm_top_k is None:
-                            semantic_pick = select_semantic_results(
-                                candidates_df,
-                                candidate_scores,
-                                top_k=None,
-                                return_confidence=True,
-                            )
-                            if isinstance(semantic_pick, tuple):
-                                llm_candidates, llm_confidence = semantic_pick
-                            else:
-                                llm_candidates = semantic_pick
-                                llm_confidence = np.array([], dtype=float)
-                            llm_top_k = len(llm_candidates)
-                        else:
-                            llm_candidates = candidates_df
-                            llm_confidence = np.clip(
-                                (np.asarray(candidate_scores, dtype=float) + 1.0) / 2.0,
-                                0.0,
-                                1.0,
-                            )
-
-                        local_runtime = _load_local_llm_reranker(sidebar["local_rerank_model"])
-                        llm_result = rerank_candidates_with_local_llm(
-                            prompt,
-                            llm_candidates,
-                            rerank_runtime=local_runtime,
-                            top_k=llm_top_k,
-                            return_candidate_indices=True,
-                        )
-                        if isinstance(llm_result, tuple):
-                            results_df, selected_indices = llm_result
-                            if len(llm_confidence):
-                                match_confidence = np.asarray(llm_confidence, dtype=float)[selected_indices]
-                        else:
-                            results_df = llm_result
-                    except Exception as llm_rerank_error:
-                        st.warning(
-                            "Kohalik rerank ebaõnnestus, kasutan semantilist järjestust. "
-                            f"({llm_rerank_error})"
-                        )
-                        semantic_result = select_semantic_results(
-                            candidates_df,
-                            candidate_scores,
-                            sidebar["top_k"],
-                            return_confidence=True,
-                        )
-                        if isinstance(semantic_result, tuple):
-                            results_df, match_confidence = semantic_result
-                        else:
-                            results_df = semantic_result
+                # 2. Course codes and titles are answered without the models
+                lookup_rows = _load_course_lookup().lookup(prompt, row_mask=mask)
+                if len(lookup_rows):
+                    results_df = df.iloc[lookup_rows]
+                    match_confidence = np.ones(len(lookup_rows), dtype=float)
+                    candidate_count = len(lookup_rows)
+                    result_source = "lookup"
                 else:
-                    semantic_result = select_semantic_results(
-                        candidates_df,
-                        candidate_scores,
-                        sidebar["top_k"],
-                        return_confidence=True,
+                    # 3. Semantic search + ranking
+                    results_df, match_confidence, candidate_count = _rank_semantic_candidates(
+                        prompt, sidebar, df, vector_index, mask,
                     )
-                    if isinstance(semantic_result, tuple):
-                        results_df, match_confidence = semantic_result
-                    else:
-                        results_df = semantic_result
+                    result_source = sidebar["ranking_mode"]
 
                 results_df = results_df.copy().reset_index(drop=True)
                 confidence = np.asarray(match_confidence, dtype=float)
@@ -1231,8 +1574,8 @@ def _handle_user_prompt(
 
                 context_text = build_course_context(results_df)
                 st.caption(
-                    f"Näitan {len(results_df)} kursust {len(filtered_df)}-st "
-                    f"({_RANKING_MODE_LABELS[ranking_mode]})"
+                    f"Näitan {len(results_df)} kursust {filtered_count}-st "
+                    f"({_RESULT_SOURCE_LABELS[result_source]})"
                 )
 
         if context_text is None:
@@ -1256,41 +1599,61 @@ def _handle_user_prompt(
                 for m in st.session_state.messages
             ]
 
-            stream = create_response_stream(api_key, messages_to_send)
-
-            full_response = ""
-            for chunk in stream:
-                if chunk.choices and chunk.choices[0].delta.content:
-                    full_response += chunk.choices[0].delta.content
-            response = full_response
-
-            # Token accounting (approximate)
-            input_text = "".join(m["content"] for m in messages_to_send)
-            st.session_state.total_input_tokens += _count_tokens(input_text)
-            st.session_state.total_output_tokens += _count_tokens(response)
-
-            llm_details = _parse_llm_course_details(response)
-            llm_overviews: list[str] = []
-            llm_scores: list[float] = []
-            llm_goals: list[str] = []
-            llm_relevances: list[str] = []
-            for _, course_row in results_df.iterrows():
-                code_key = _normalize_course_code(str(course_row.get("aine_kood", "")))
-                item = llm_details.get(code_key, {})
-                llm_overviews.append(str(item.get("overview", "")).strip())
-                llm_goals.append(str(item.get("goals", "")).strip())
-                llm_relevances.append(str(item.get("relevance", "")).strip())
-                score_value = item.get("score_10")
-                llm_scores.append(float(score_value) if isinstance(score_value, int) else np.nan)
-
-            results_df["_llm_overview"] = llm_overviews
-            results_df["_llm_score_10"] = llm_scores
-            results_df["_llm_goals"] = llm_goals
-            results_df["_llm_relevance"] = llm_relevances
-
-            llm_score_series = pd.to_numeric(results_df["_llm_score_10"], errors="coerce")
-            match_score_series = pd.to_numeric(results_df["_match_score_10"], errors="coerce")
-            results_df["_display_score_10"] = llm_score_series.fillna(match_score_series).fillna(6).astype(int)
+            # Near-identical questions over the same courses reuse an answer.
+            # Lookup results skip the cache so they never load the embedder.
+            cache_args = None
+            if RESPONSE_CACHE_ENABLED and result_source != "lookup":
+                cache_args = (
+                    _load_embedder().encode([prompt])[0],
+                    results_df["aine_kood"].astype(str).tolist(),
+                    sidebar["active_filters_str"],
+                    response_lang,
+                    # Earlier turns change the answer: key on them too.
+                    messages_to_send[1:-1],
+                )
+            cached = _load_response_cache().get(*cache_args) if cache_args else None
+
+            # Cards show the ranking scores right away; LLM details fill in
+            # per course as its block of the streamed answer completes.
+            _apply_llm_details(results_df, {})
+            cards_placeholder = st.empty()
+            with cards_placeholder.container():
+                _render_course_cards(results_df, card_prefix="live")
+            text_placeholder = st.empty()
+
+            started = time.perf_counter()
+            first_token_ms = None
+            if cached is not None:
+                text_chunks = [cached["response"]]
+            else:
+                text_chunks = _stream_text(create_response_stream(api_key, messages_to_send))
+            course_stream = _CourseDetailStream()
+            for text in text_chunks:
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - started) * 1000.0
+                if course_stream.feed(text):
+                    _apply_llm_details(results_df, course_stream.details)
+                    with cards_placeholder.container():
+                        _render_course_cards(results_df, card_prefix="live")
+                text_placeholder.markdown(course_stream.text + "▌")
+            course_stream.finish()
+            text_placeholder.empty()
+            response = course_stream.text
+            total_ms = (time.perf_counter() - started) * 1000.0
+
+            if cached is None:
+                # Token accounting (approximate)
+                input_text = "".join(m["content"] for m in messages_to_send)
+                input_tokens = _count_tokens(input_text)
+                output_tokens = _count_tokens(response)
+                st.session_state.total_input_tokens += input_tokens
+                st.session_state.total_output_tokens += output_tokens
+                if cache_args and response.strip():
+                    _load_response_cache().put(
+                        *cache_args, response, tokens=input_tokens + output_tokens,
+                    )
+
+            _apply_llm_details(results_df, course_stream.details)
 
             display_cols = [
                 "aine_kood",
@@ -1319,11 +1682,14 @@ def _handle_user_prompt(
                 "debug_info": {
                     "user_prompt": prompt,
                     "filters": sidebar["active_filters_str"],
-                    "ranking_mode": sidebar["ranking_mode"],
-                    "filtered_count": len(filtered_df),
+                    "ranking_mode": result_source,
+                    "filtered_count": filtered_count,
                     "candidate_count": candidate_count,
                     "results_df": results_display,
                     "system_prompt": system_content,
+                    "llm_first_token_ms": first_token_ms,
+                    "llm_total_ms": total_ms,
+                    "response_cache_similarity": cached["similarity"] if cached else None,
                 },
             })
             st.rerun()
@@ -1366,12 +1732,15 @@ def main(developer_mode: bool = False) -> None:
         df_error = e
 
     try:
-        embeddings = _load_embeddings()
+        embedding_store = _load_embedding_store()
+        embeddings = embedding_store.matrix
         if df is not None:
-            assert len(embeddings) == len(df), (
-                f"Embeddings ({len(embeddings)}) ja andmestiku ({len(df)}) ridade arv ei klapi. "
-                "Käivita build_embeddings.py uuesti."
-            )
+            validate_embedding_store(embedding_store, df)
+            if _embedding_store_is_stale():
+                st.warning(
+                    "Kursuste CSV on pärast embeddingute arvutamist muutunud. "
+                    "Käivita `python build_embeddings.py`, et kirjeldused oleksid ajakohased."
+                )
     except FileNotFoundError as e:
         emb_error = e
     except Exception as e:
@@ -1380,8 +1749,10 @@ def main(developer_mode: bool = False) -> None:
     if df_error:
         st.error(f"Andmete laadimine ebaõnnestus: {df_error}")
     if emb_error:
+        embeddings = None
         st.warning(
-            "Embeddingute fail puudub või ei lae. Käivita esmalt: `python build_embeddings.py`"
+            "Embeddingute hoidla puudub, ei lae või ei vasta andmestikule. "
+            f"Käivita esmalt: `python build_embeddings.py` ({emb_error})"
         )
 
     data_ready = df is not None and embeddings is not None
@@ -1405,6 +1776,8 @@ def main(developer_mode: bool = False) -> None:
             benchmark_limit,
             benchmark_ranking_mode,
             benchmark_local_model,
+            benchmark_adaptive_pool,
+            benchmark_local_method,
         ) = render_benchmark_sidebar(
             sidebar["api_key"], benchmark_case_count,
         )
@@ -1412,7 +1785,14 @@ def main(developer_mode: bool = False) -> None:
         if run_clicked and data_ready:
             with st.spinner("Laadin mudeleid..."):
                 embedder = _load_embedder()
-                reranker = _load_reranker() if benchmark_ranking_mode == "cross_encoder" else None
+                reranker, rerank_cache = None, None
+                if benchmark_ranking_mode in ("cross_encoder", "cascade"):
+                    reranker, reranker_key = _load_reranker()
+                    rerank_cache = _load_rerank_cache(reranker_key)
+                first_stage_reranker, first_stage_cache = None, None
+                if benchmark_ranking_mode == "cascade":
+                    first_stage_reranker, first_stage_key = _load_first_stage_reranker()
+                    first_stage_cache = _load_rerank_cache(first_stage_key)
                 local_runtime = (
                     _load_local_llm_reranker(benchmark_local_model)
                     if benchmark_ranking_mode == "local_llm"
@@ -1427,6 +1807,12 @@ def main(developer_mode: bool = False) -> None:
                 embeddings,
                 benchmark_limit,
                 benchmark_ranking_mode,
+                rerank_cache=rerank_cache,
+                vector_index=_load_vector_index(),
+                first_stage_reranker=first_stage_reranker,
+                first_stage_cache=first_stage_cache,
+                adaptive_pool=benchmark_adaptive_pool,
+                local_rerank_method=benchmark_local_method,
             )
         if load_clicked:
             load_saved_benchmark()
@@ -1440,7 +1826,7 @@ def main(developer_mode: bool = False) -> None:
         if not data_ready:
             st.error("Andmed pole laaditud. Käivita esmalt `python build_embeddings.py`.")
         else:
-            _handle_user_prompt(prompt, sidebar, df, embeddings)
+            _handle_user_prompt(prompt, sidebar, df, _load_vector_index())
 
 
 if __name__ == "__main__":
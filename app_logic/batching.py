@@ -0,0 +1,32 @@
+"""Token-budgeted batching of variable-length inputs.
+
+Shared by the offline embedding build (``app_logic.embedding_build``) and
+the serving-time rerankers (``app_logic.rerank_input``, the local LLM
+scorer in ``app_logic.retrieval``).
+"""
+
+import numpy as np
+
+
+def plan_token_batches(
+    lengths: np.ndarray,
+    max_batch_tokens: int,
+    max_batch_size: int,
+) -> list[np.ndarray]:
+    """Cut length-sorted positions into batches whose padded size fits the budget.
+
+    The padded size of a batch is ``longest * count``; a text longer than the
+    budget gets a batch of its own.
+    """
+    order = np.argsort(lengths, kind="stable")
+    batches: list[np.ndarray] = []
+    start = 0
+    for end in range(1, len(order) + 1):
+        longest = lengths[order[end - 1]]
+        count = end - start
+        if count > 1 and (longest * count > max_batch_tokens or count > max_batch_size):
+            batches.append(order[start:end - 1])
+            start = end - 1
+    if start < len(order):
+        batches.append(order[start:])
+    return batches
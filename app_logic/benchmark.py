@@ -10,6 +10,7 @@ import csv
 import gc
 import json
 import re
+import time
 from dataclasses import asdict, dataclass
 from datetime import datetime
 from pathlib import Path
@@ -22,6 +23,8 @@ from app_logic.config import (
     BENCHMARK_RUNS_PATH,
     CANDIDATE_POOL,
     DEFAULT_TOP_K,
+    LOCAL_RERANK_METHOD,
+    LOCAL_RERANK_WINDOW_POOL,
 )
 from app_logic.llm import (
     build_benchmark_system_prompt,
@@ -33,12 +36,14 @@ from app_logic.retrieval import (
     batch_cosine_similarity,
     batch_encode_queries,
     build_benchmark_context,
+    cascade_rerank_candidates,
     get_semantic_candidates,
     get_semantic_candidates_from_scores,
     rerank_candidates,
     rerank_candidates_with_local_llm,
     _normalize_ids,
 )
+from app_logic.vector_index import recall_at_k
 
 
 def _cleanup_after_case() -> None:
@@ -80,6 +85,7 @@ class StageResult:
     missing_ids: list[str]
     unexpected_ids: list[str]
     raw_text: str | None = None
+    elapsed_ms: float | None = None
 
 
 @dataclass
@@ -100,6 +106,21 @@ class BenchmarkRunResult:
     llm_correct: int
     llm_incorrect: int
     case_results: list[CaseBenchmarkResult]
+    index_kind: str | None = None
+    index_recall: float | None = None
+    ranking_mode: str | None = None
+    pool_mode: str | None = None
+    local_rerank_method: str | None = None
+
+    def mean_pool_size(self) -> float | None:
+        """Average number of retrieved candidates over valid cases."""
+        sizes = [len(r.retrieval.returned_ids) for r in self.case_results if not r.case.parse_error]
+        return float(np.mean(sizes)) if sizes else None
+
+    def mean_reranker_ms(self) -> float | None:
+        """Average reranking time per case (cases without a timing skipped)."""
+        timings = [r.reranker.elapsed_ms for r in self.case_results if r.reranker.elapsed_ms is not None]
+        return float(np.mean(timings)) if timings else None
 
 
 # ---------------------------------------------------------------------------
@@ -165,6 +186,7 @@ def _build_stage_result(
     case: BenchmarkCase,
     returned_ids: list[str],
     raw_text: str | None = None,
+    elapsed_ms: float | None = None,
 ) -> StageResult:
     comparison = compare_ids(case.expected_ids, returned_ids, case.expects_empty)
     return StageResult(
@@ -173,6 +195,7 @@ def _build_stage_result(
         missing_ids=comparison.missing_ids,
         unexpected_ids=comparison.unexpected_ids,
         raw_text=raw_text,
+        elapsed_ms=elapsed_ms,
     )
 
 
@@ -287,13 +310,15 @@ def evaluate_case_retrieval(
     candidate_pool: int = CANDIDATE_POOL,
     *,
     precomputed_scores: np.ndarray | None = None,
+    adaptive_pool: bool = False,
 ) -> tuple[StageResult, pd.DataFrame]:
     """Stage 1: evaluate cosine-similarity retrieval for one test case.
 
     If *precomputed_scores* is supplied (a 1-D similarity array aligned with
     *courses_df*), candidates are extracted without re-encoding the query or
     recomputing cosine similarity.  Otherwise, falls back to the original
-    encode-then-compare path.
+    encode-then-compare path.  *adaptive_pool* sizes the pool from the
+    score distribution instead of using *candidate_pool*.
 
     Returns (stage_result, candidates_df).
     """
@@ -303,11 +328,12 @@ def evaluate_case_retrieval(
     if precomputed_scores is not None:
         candidates_df, _ = get_semantic_candidates_from_scores(
             precomputed_scores, courses_df, candidate_pool=candidate_pool,
+            adaptive_pool=adaptive_pool,
         )
     else:
         candidates_df, _ = get_semantic_candidates(
             embedder, case.query, courses_df, embeddings,
-            candidate_pool=candidate_pool,
+            candidate_pool=candidate_pool, adaptive_pool=adaptive_pool,
         )
 
     returned_ids = _normalize_course_ids(
@@ -324,9 +350,20 @@ def evaluate_case_reranker(
     local_rerank_runtime=None,
     ranking_mode: str = "cross_encoder",
     top_k: int | None = DEFAULT_TOP_K,
+    rerank_cache=None,
+    first_stage_reranker=None,
+    first_stage_cache=None,
+    local_rerank_method: str = LOCAL_RERANK_METHOD,
 ) -> tuple[StageResult, pd.DataFrame]:
     """Stage 2: evaluate reranking for one test case.
 
+    *rerank_cache* (a ``RerankScoreCache``) lets re-runs with other
+    ``top_k`` or LLM settings reuse cross-encoder scores.  The ``cascade``
+    mode needs *first_stage_reranker* as well (*first_stage_cache* is its
+    score cache); ``local_llm`` uses *local_rerank_method* ("logits",
+    "generate" or "window").  The wall time of the ranking step is recorded as
+    ``elapsed_ms``.
+
     Returns (stage_result, reranked_df).
     """
     if case.parse_error or candidates_df.empty:
@@ -338,6 +375,7 @@ def evaluate_case_reranker(
         return candidates_df.iloc[:min(top_k, len(candidates_df))]
 
     rerank_raw_text: str | None = None
+    started = time.perf_counter()
 
     if ranking_mode == "semantic":
         reranked_df = semantic_fallback()
@@ -348,10 +386,30 @@ def evaluate_case_reranker(
             rerank_raw_text = "Cross-encoder missing; used semantic order."
         else:
             try:
-                reranked_df = rerank_candidates(reranker, case.query, candidates_df, top_k=top_k)
+                reranked_df = rerank_candidates(
+                    reranker, case.query, candidates_df, top_k=top_k, score_cache=rerank_cache,
+                )
             except Exception as error:
                 reranked_df = semantic_fallback()
                 rerank_raw_text = f"Cross-encoder failed; used semantic order. ({error})"
+    elif ranking_mode == "cascade":
+        if reranker is None or first_stage_reranker is None:
+            reranked_df = semantic_fallback()
+            rerank_raw_text = "Cascade reranker missing; used semantic order."
+        else:
+            try:
+                reranked_df = cascade_rerank_candidates(
+                    first_stage_reranker,
+                    reranker,
+                    case.query,
+                    candidates_df,
+                    top_k=top_k,
+                    score_cache=rerank_cache,
+                    first_stage_cache=first_stage_cache,
+                )
+            except Exception as error:
+                reranked_df = semantic_fallback()
+                rerank_raw_text = f"Cascade reranker failed; used semantic order. ({error})"
     elif ranking_mode == "local_llm":
         if local_rerank_runtime is None:
             reranked_df = semantic_fallback()
@@ -363,18 +421,22 @@ def evaluate_case_reranker(
                     candidates_df,
                     rerank_runtime=local_rerank_runtime,
                     top_k=top_k,
+                    method=local_rerank_method,
                 )
             except Exception as error:
                 reranked_df = semantic_fallback()
                 rerank_raw_text = f"Local LLM reranker failed; used semantic order. ({error})"
     else:
         raise ValueError(f"Unsupported benchmark ranking mode: {ranking_mode}")
+    elapsed_ms = (time.perf_counter() - started) * 1000.0
 
     returned_ids = _normalize_course_ids(
         reranked_df["aine_kood"].tolist()
     ) if "aine_kood" in reranked_df.columns else []
 
-    return _build_stage_result(case, returned_ids, raw_text=rerank_raw_text), reranked_df
+    return _build_stage_result(
+        case, returned_ids, raw_text=rerank_raw_text, elapsed_ms=elapsed_ms,
+    ), reranked_df
 
 
 def evaluate_case_llm(
@@ -439,17 +501,33 @@ def run_benchmark_suite(
     top_k: int | None = DEFAULT_TOP_K,
     ranking_mode: str = "semantic",
     progress_callback=None,
+    rerank_cache=None,
+    vector_index=None,
+    first_stage_reranker=None,
+    first_stage_cache=None,
+    adaptive_pool: bool = False,
+    local_rerank_method: str = LOCAL_RERANK_METHOD,
 ) -> BenchmarkRunResult:
     """Run the full 3-stage benchmark on all (or a subset of) test cases.
 
     Performance optimizations applied:
-      1. All queries are batch-encoded in a single embedder.encode() call.
+      1. All queries are batch-encoded in a single embedder.encode() call;
+         with a ``CachedEmbedder`` only queries missing from the query
+         cache reach the model, so re-runs skip encoding entirely.
       2. Cosine similarity is computed as one matrix multiply for all queries.
-      3. A single OpenAI client is reused across all LLM calls.
+      3. Cross-encoder scores are reused from *rerank_cache* when given.
+      4. A single OpenAI client is reused across all LLM calls.
 
     Args:
         progress_callback: optional callable(completed, total, case, stage_name)
             called after each sub-step to update UI progress.
+        vector_index: the app's (possibly approximate or quantised) index;
+            its recall@CANDIDATE_POOL against exact search is reported.
+        first_stage_reranker: small cross-encoder for the ``cascade`` mode.
+        adaptive_pool: size each candidate pool from its cosine scores; the
+            run reports the mean pool size next to the retrieval recall.
+        local_rerank_method: method of the ``local_llm`` mode; "window"
+            retrieves a fixed pool of ``LOCAL_RERANK_WINDOW_POOL``.
     """
     selected = cases if case_limit is None else cases[:case_limit]
     total = len(selected)
@@ -464,12 +542,24 @@ def run_benchmark_suite(
     query_vectors = batch_encode_queries(embedder, queries)  # (N, D)
     sim_matrix = batch_cosine_similarity(query_vectors, embeddings)  # (N, M)
 
+    index_recall = None
+    if vector_index is not None:
+        valid = [i for i, case in enumerate(selected) if not case.parse_error]
+        index_recall = recall_at_k(
+            vector_index, query_vectors[valid], embeddings, CANDIDATE_POOL,
+            exact_scores=sim_matrix[valid],
+        )
+
     # --- Pre-compute: reusable OpenAI client --------------------------------
     from openai import OpenAI
     from app_logic.config import OPENROUTER_BASE_URL
 
     llm_client = OpenAI(base_url=OPENROUTER_BASE_URL, api_key=api_key, timeout=60.0)
 
+    # The windowed local LLM ranks a larger fixed pool.
+    windowed = ranking_mode == "local_llm" and local_rerank_method == "window"
+    candidate_pool = LOCAL_RERANK_WINDOW_POOL if windowed else CANDIDATE_POOL
+
     # --- Per-case evaluation loop -------------------------------------------
     for idx, case in enumerate(selected):
         # Stage 1: Vector search (from pre-computed scores)
@@ -478,7 +568,9 @@ def run_benchmark_suite(
 
         retrieval_result, candidates_df = evaluate_case_retrieval(
             case, embedder, courses_df, embeddings,
+            candidate_pool=candidate_pool,
             precomputed_scores=sim_matrix[idx],
+            adaptive_pool=adaptive_pool and not windowed,
         )
 
         # Stage 2: Reranker
@@ -492,6 +584,10 @@ def run_benchmark_suite(
             local_rerank_runtime=local_rerank_runtime,
             ranking_mode=ranking_mode,
             top_k=top_k,
+            rerank_cache=rerank_cache,
+            first_stage_reranker=first_stage_reranker,
+            first_stage_cache=first_stage_cache,
+            local_rerank_method=local_rerank_method,
         )
 
         # Stage 3: LLM (reuse client)
@@ -509,7 +605,7 @@ def run_benchmark_suite(
             llm=llm_result,
         ))
 
-        if ranking_mode in ("cross_encoder", "local_llm"):
+        if ranking_mode in ("cross_encoder", "cascade", "local_llm"):
             _cleanup_after_case()
 
         if progress_callback is not None:
@@ -528,6 +624,11 @@ def run_benchmark_suite(
         llm_correct=llm_correct,
         llm_incorrect=total - llm_correct,
         case_results=case_results,
+        index_kind=getattr(vector_index, "kind", None),
+        index_recall=index_recall,
+        ranking_mode=ranking_mode,
+        pool_mode="adaptive" if adaptive_pool and not windowed else "fixed",
+        local_rerank_method=local_rerank_method if ranking_mode == "local_llm" else None,
     )
 
 
@@ -572,6 +673,11 @@ def deserialize_benchmark_run(payload: dict) -> tuple[BenchmarkRunResult, str |
         llm_correct=rp["llm_correct"],
         llm_incorrect=rp["llm_incorrect"],
         case_results=[_case_result_from_dict(item) for item in rp["case_results"]],
+        index_kind=rp.get("index_kind"),
+        index_recall=rp.get("index_recall"),
+        ranking_mode=rp.get("ranking_mode"),
+        pool_mode=rp.get("pool_mode"),
+        local_rerank_method=rp.get("local_rerank_method"),
     )
     return results, payload.get("saved_at")
 
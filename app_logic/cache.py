@@ -0,0 +1,341 @@
+"""Two-tier caches for expensive model outputs.
+
+``PersistentLRUCache`` keeps recently used entries in an in-memory LRU and
+optionally mirrors every entry to a SQLite file, so values survive app
+restarts and are shared by all Streamlit sessions of one process.
+``CachedEmbedder`` puts such a cache in front of a SentenceTransformer and
+``RerankScoreCache`` does the same for cross-encoder pair scores.
+``SemanticResponseCache`` reuses chat LLM answers for near-identical
+questions.
+"""
+
+import hashlib
+import pickle
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+
+def normalize_cache_text(text: str) -> str:
+    """Normalise text for cache keys: NFC unicode, collapsed whitespace.
+
+    Case is preserved because the embedding and reranker tokenizers are
+    case-sensitive, so differently cased queries may give different vectors.
+    """
+    text = unicodedata.normalize("NFC", str(text))
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def cache_key(*parts) -> str:
+    """Stable hex digest for a tuple of key parts."""
+    joined = "\x1f".join(str(part) for part in parts)
+    return hashlib.sha1(joined.encode("utf-8")).hexdigest()
+
+
+class PersistentLRUCache:
+    """Thread-safe LRU cache with an optional SQLite tier on disk."""
+
+    def __init__(self, max_items: int, path: str | None = None):
+        self.max_items = int(max_items)
+        self.path = path
+        self._memory: OrderedDict[str, object] = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db = None
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL)"
+            )
+            self._db.commit()
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def _remember(self, key: str, value) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str):
+        """Return the cached value or None (memory first, then disk)."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value FROM cache WHERE key = ?", (key,),
+                ).fetchone()
+                if row is not None:
+                    value = pickle.loads(row[0])
+                    self._remember(key, value)
+                    self.disk_hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value) -> None:
+        self.put_many({key: value})
+
+    def put_many(self, items: dict) -> None:
+        with self._lock:
+            for key, value in items.items():
+                self._remember(key, value)
+            if self._db is not None and items:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)",
+                    [(key, pickle.dumps(value)) for key, value in items.items()],
+                )
+                self._db.commit()
+
+    def clear(self) -> None:
+        """Drop all entries from both tiers and reset the counters."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM cache")
+                self._db.commit()
+            self.memory_hits = self.disk_hits = self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        hits = self.memory_hits + self.disk_hits
+        return {
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_items": len(self._memory),
+        }
+
+
+# Encode options that do not change the returned vectors.
+_NON_OUTPUT_ENCODE_KWARGS = {"batch_size", "show_progress_bar"}
+
+
+class CachedEmbedder:
+    """SentenceTransformer wrapper that serves repeated queries from a cache.
+
+    ``encode`` keeps the SentenceTransformer call signature; only texts that
+    are not cached are sent to the model, in one batch.  Keys combine the
+    model name with the normalised text; an embedder with a ``model_key``
+    (the model-server wrappers) supplies the name itself.  Any other
+    attribute is delegated to the wrapped model.
+    """
+
+    def __init__(self, embedder, model_name: str, cache: PersistentLRUCache):
+        self.embedder = embedder
+        self.model_name = model_name
+        self.cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self.embedder, name)
+
+    def encode(self, sentences, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        options = sorted(
+            (name, repr(value)) for name, value in kwargs.items()
+            if name not in _NON_OUTPUT_ENCODE_KWARGS
+        )
+        def text_keys() -> list[str]:
+            model_name = getattr(self.embedder, "model_key", None) or self.model_name
+            return [cache_key(model_name, options, normalize_cache_text(text)) for text in texts]
+
+        keys = text_keys()
+        vectors = {key: self.cache.get(key) for key in dict.fromkeys(keys)}
+        missing = [key for key, value in vectors.items() if value is None]
+        if missing:
+            key_to_text = dict(zip(keys, texts))
+            encoded = self.embedder.encode([key_to_text[key] for key in missing], **kwargs)
+            fresh = {key: np.asarray(vec) for key, vec in zip(missing, encoded)}
+            # A server wrapper may have fallen back to a local model during the call.
+            stored_keys = dict(zip(keys, text_keys()))
+            self.cache.put_many({stored_keys[key]: vec for key, vec in fresh.items()})
+            vectors.update(fresh)
+
+        stacked = np.stack([vectors[key] for key in keys]) if keys else np.empty((0, 0))
+        return stacked[0] if single else stacked
+
+
+class RerankScoreCache:
+    """Cross-encoder pair-score cache keyed by (query, course, model).
+
+    Keys combine the model name, the normalised query, the course
+    ``aine_kood`` and a hash of the description text, so an edited course
+    description is re-scored automatically.  On a repeated query only the
+    pairs missing from the cache are sent to the model.  A reranker with a
+    ``model_key`` (the model-server wrappers) supplies the model name.
+    """
+
+    def __init__(self, model_name: str, cache: PersistentLRUCache):
+        self.model_name = model_name
+        self.cache = cache
+
+    def _key(self, model_name: str, query: str, course_id: str, description: str) -> str:
+        description_hash = hashlib.sha1(description.encode("utf-8")).hexdigest()
+        return cache_key(
+            model_name, normalize_cache_text(query), str(course_id), description_hash,
+        )
+
+    def score(
+        self,
+        reranker,
+        query: str,
+        course_ids: list[str],
+        descriptions: list[str],
+    ) -> np.ndarray:
+        """Return one cross-encoder score per (query, description) pair."""
+        def pair_keys() -> list[str]:
+            model_name = getattr(reranker, "model_key", None) or self.model_name
+            return [
+                self._key(model_name, query, course_id, description)
+                for course_id, description in zip(course_ids, descriptions)
+            ]
+
+        keys = pair_keys()
+        scores = [self.cache.get(key) for key in keys]
+        missing = [i for i, value in enumerate(scores) if value is None]
+        if missing:
+            predicted = reranker.predict([[query, descriptions[i]] for i in missing])
+            for i, value in zip(missing, predicted):
+                scores[i] = float(value)
+            # A server wrapper may have fallen back to a local model during the call.
+            stored_keys = pair_keys()
+            self.cache.put_many({stored_keys[i]: scores[i] for i in missing})
+        return np.asarray(scores, dtype=float)
+
+    def stats(self) -> dict[str, int]:
+        return self.cache.stats()
+
+
+class SemanticResponseCache:
+    """Chat LLM answers reused for near-identical questions.
+
+    A cached answer is returned when the course context (the set of
+    ``aine_kood`` values), the active filter string, the response language
+    and the earlier conversation turns sent with the question (*history*,
+    ``{"role", "content"}`` dicts) match exactly and the query embedding is
+    within *threshold* cosine similarity of the stored one.  Entries expire
+    *ttl_seconds* after they are stored; beyond *max_items* the least
+    recently used entry is dropped.  Memory only, shared by the sessions of one process.
+    """
+
+    def __init__(
+        self,
+        max_items: int,
+        ttl_seconds: float,
+        threshold: float,
+        clock=time.monotonic,
+    ):
+        self.max_items = int(max_items)
+        self.ttl_seconds = float(ttl_seconds)
+        self.threshold = float(threshold)
+        self._clock = clock
+        self._entries: OrderedDict[int, dict] = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.tokens_saved = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _context_key(course_ids, filters: str, language: str, history) -> str:
+        turns = cache_key(*(f"{turn['role']}:{turn['content']}" for turn in history))
+        return cache_key(sorted({str(code) for code in course_ids}), filters, language, turns)
+
+    @staticmethod
+    def _unit(query_vector) -> np.ndarray:
+        vector = np.asarray(query_vector, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm > 0 else vector
+
+    def _drop_expired(self, now: float) -> None:
+        stale = [
+            entry_id for entry_id, entry in self._entries.items()
+            if now - entry["stored_at"] > self.ttl_seconds
+        ]
+        for entry_id in stale:
+            del self._entries[entry_id]
+        self.expired += len(stale)
+
+    def get(self, query_vector, course_ids, filters: str, language: str, history) -> dict | None:
+        """Return the best matching entry (with its ``similarity``) or None."""
+        context = self._context_key(course_ids, filters, language, history)
+        vector = self._unit(query_vector)
+        with self._lock:
+            self._drop_expired(self._clock())
+            best_id, best_similarity = None, self.threshold
+            for entry_id, entry in self._entries.items():
+                if entry["context"] != context:
+                    continue
+                similarity = float(entry["vector"] @ vector)
+                if similarity >= best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+            if best_id is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            entry = self._entries[best_id]
+            self.hits += 1
+            self.tokens_saved += entry["tokens"]
+            return {"response": entry["response"], "tokens": entry["tokens"], "similarity": best_similarity}
+
+    def put(
+        self,
+        query_vector,
+        course_ids,
+        filters: str,
+        language: str,
+        history,
+        response: str,
+        tokens: int = 0,
+    ) -> None:
+        """Store *response*; *tokens* is what a later hit saves (input + output)."""
+        entry = {
+            "context": self._context_key(course_ids, filters, language, history),
+            "vector": self._unit(query_vector),
+            "response": response,
+            "tokens": int(tokens),
+        }
+        with self._lock:
+            entry["stored_at"] = self._clock()
+            self._entries[self._next_id] = entry
+            self._next_id += 1
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.expired = self.tokens_saved = 0
+
+    def stats(self) -> dict[str, int | float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "expired": self.expired,
+            "tokens_saved": self.tokens_saved,
+            "items": len(self._entries),
+        }
@@ -1,7 +1,15 @@
 # ---------- Paths ----------
 FEEDBACK_LOG_PATH = "tagasiside_log.csv"
 DATA_PATH = "andmed/puhastatud_andmed.csv"
-EMBEDDINGS_PATH = "andmed/embeddings.pkl"
+IDS_PATH = "andmed/ids.csv"                 # course_code -> latest_version_uuid
+EMBEDDING_STORE_DIR = "andmed/embeddings"   # matrix.npy + manifest.json
+TEXT_VECTOR_STORE_PATH = "andmed/embeddings/text_vectors.sqlite"  # text hash -> vector
+BUILD_SHARD_DIR = "andmed/embeddings/shards"  # build_embeddings.py checkpoints
+VECTOR_INDEX_PATH = "andmed/vector_index.pkl"
+QUERY_CACHE_PATH = "andmed/cache/query_embeddings.sqlite"
+RERANK_CACHE_PATH = "andmed/cache/rerank_scores.sqlite"   # None = memory only
+ONNX_EMBEDDER_DIR = "andmed/onnx/bge-m3"   # written by export_onnx.py
+ONNX_RERANKER_DIR = "andmed/onnx/bge-reranker-v2-m3"
 BENCHMARK_CASES_PATH = "Testjuhtumid.csv"
 BENCHMARK_RUNS_PATH = "benchmark_data/benchmark_runs.json"
 
@@ -12,9 +20,106 @@ LOCAL_RERANK_MODEL = "Qwen/Qwen3-0.6B"
 LLM_MODEL = "google/gemma-3-27b-it"
 OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 
+# ---------- Model runtime ----------
+EMBEDDER_BACKEND = "torch"     # "torch", "onnx" or "onnx-int8" (falls back to torch if not exported)
+RERANKER_BACKEND = "torch"     # "torch", "torch-int8", "onnx" or "onnx-int8"
+ONNX_MAX_LENGTH = 512          # query tokens kept by the ONNX embedder
+ONNX_PARITY_MIN_COSINE = 0.99  # export_onnx.py fails below this cosine vs. PyTorch
+RERANK_PARITY_MAX_DIFF = 0.05  # ... and above this reranker score difference (scores in 0..1)
+
 # ---------- Retrieval defaults ----------
 DEFAULT_TOP_K = 5
 CANDIDATE_POOL = 20
+CANDIDATE_POOL_MODE = "fixed"  # "fixed" (CANDIDATE_POOL) or "adaptive" (sized from the cosine scores)
+ADAPTIVE_POOL_MIN = 8          # adaptive pool bounds
+ADAPTIVE_POOL_MAX = 40
+ADAPTIVE_POOL_GAP = 0.05       # cosine drop between neighbours that ends the pool
+ADAPTIVE_POOL_MASS = 0.95      # softmax mass of the cosine scores the pool must cover
+ADAPTIVE_POOL_TEMPERATURE = 0.02
+SCORING_BLOCK_SIZE = 256       # queries per matmul block in batch scoring
+MASKED_GATHER_RATIO = 4        # filters keeping < 1/N of rows gather them instead of full scan
+MATRIX_ROW_BLOCK = 65536       # rows upcast per step when scoring float16 matrices
+EMBEDDING_STORE_DTYPE = "float32"  # "float16" halves the store size
+BUILD_SHARD_SIZE = 256         # descriptions per checkpointed build shard
+BUILD_MAX_BATCH_TOKENS = 16384 # padded tokens (longest * count) per encode batch
+BUILD_MAX_BATCH_SIZE = 128     # upper bound on texts per batch, however short
+LOOKUP_MIN_PREFIX_CHARS = 6    # shorter title queries must match a title exactly
+LOOKUP_MAX_PREFIX_MATCHES = 5  # more title-prefix hits than this -> semantic search
+
+# ---------- Cascade reranking ----------
+# A small multilingual cross-encoder scores the whole candidate pool; the
+# large reranker only sees the top CASCADE_KEEP plus near-ties.
+CASCADE_FIRST_STAGE_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+CASCADE_KEEP = 6               # always passed to the large reranker
+CASCADE_MARGIN = 1.0           # first-stage logits (no sigmoid) below the last kept score still ambiguous
+CASCADE_MAX_SURVIVORS = 10     # cap on candidates reaching the large reranker
+
+# ---------- Local LLM reranker ----------
+# "logits": one forward pass per candidate prompt, score = logit(yes) - logit(no).
+# "generate": the model writes a JSON list of ranked indices (slower, can fail to parse).
+# "window": "generate" over overlapping windows of a larger pool (LOCAL_RERANK_WINDOW_POOL).
+LOCAL_RERANK_METHOD = "logits"
+LOCAL_RERANK_DOC_CHARS = 600           # description characters per scored candidate
+LOCAL_RERANK_SCORE_BATCH_TOKENS = 4096 # padded prompt tokens per forward pass
+LOCAL_RERANK_SCORE_BATCH_SIZE = 16
+LOCAL_RERANK_PREFIX_CACHE = True       # reuse the KV cache of the fixed prompt prefix
+LOCAL_RERANK_WINDOW = 10               # candidates per listwise prompt of the "window" method
+LOCAL_RERANK_WINDOW_STRIDE = 5         # neighbouring windows overlap by WINDOW - STRIDE
+LOCAL_RERANK_WINDOW_BATCH = 4          # windows per batched generate() call; bounds memory
+LOCAL_RERANK_WINDOW_POOL = 60          # candidates retrieved for the "window" method
+LOCAL_RERANK_BACKEND = "torch"         # "torch" (fp16 on GPU, fp32 on CPU) or "cpu-int8"
+LOCAL_RERANK_CPU_THREADS = 4           # torch threads for "cpu-int8" (process-wide; 0 = torch default)
+LOCAL_RERANK_PAD_MULTIPLE = 64         # "cpu-int8" prompt widths are padded up to a multiple of this
+
+# ---------- Inference scheduler ----------
+# Embedder and reranker calls from all sessions share micro-batches
+# (app_logic/scheduler.py).
+SCHEDULER_ENABLED = True
+SCHEDULER_MAX_WAIT_MS = 2.0    # extra wait for more requests once one is taken
+SCHEDULER_MAX_BATCH_ITEMS = 64 # texts or pairs per coalesced batch
+SCHEDULER_IDLE_SECONDS = 30.0  # worker thread exits after this long without work
+
+# ---------- Model server ----------
+# model_server.py loads the models once for all app processes.  Empty URL
+# (or no server answering) = models are loaded in-process.  The
+# MODEL_SERVER_URL environment variable overrides this.
+MODEL_SERVER_URL = ""          # e.g. "http://127.0.0.1:8765"
+MODEL_SERVER_HOST = "127.0.0.1"
+MODEL_SERVER_PORT = 8765
+MODEL_SERVER_TIMEOUT = 60.0    # seconds per request
+
+# ---------- Reranker inputs ----------
+# Descriptions are tokenised once at load time (app_logic/rerank_input.py).
+RERANK_PRETOKENIZE = True
+RERANK_MAX_DOC_TOKENS = 384    # description tokens per pair; bounds worst-case latency
+RERANK_MAX_QUERY_TOKENS = 64
+RERANK_MAX_BATCH_TOKENS = 8192 # padded tokens (longest * count) per reranker batch
+RERANK_MAX_BATCH_SIZE = 32
+
+# ---------- Vector index ----------
+VECTOR_INDEX_KIND = "ivf"      # "exact", "ivf", "hnsw" (needs hnswlib), "int8" or "binary"
+IVF_NPROBE = 8                 # clusters scanned per query; higher = better recall
+HNSW_EF_SEARCH = 64            # HNSW search breadth; higher = better recall
+# The quantised indexes save memory, not time.  perf_benchmark.py quantized
+# (20k x 1024 synthetic, top-20): int8 keeps recall 1.00 from x2 but scans at
+# ~0.3x the exact float32 speed; binary needs x100 for recall ~0.87 and is
+# then no faster than the exact scan (x10: recall ~0.45).
+INT8_OVERSAMPLE = 4            # int8 shortlist = k * N rows rescored at full precision
+BINARY_OVERSAMPLE = 100        # binary shortlist = k * N rows rescored at full precision
+QUANTIZED_SCAN_BLOCK = 4096    # int8 code rows upcast per step (fits in CPU cache)
+
+# ---------- Caches ----------
+QUERY_CACHE_MAX_ITEMS = 2048   # query vectors kept in memory (disk tier is unbounded)
+RERANK_CACHE_MAX_ITEMS = 20000 # (query, course) scores kept in memory
+
+# ---------- Response cache ----------
+# Chat answers are reused when the context courses, filters, language and
+# earlier conversation turns match exactly and the query embedding is this
+# close to a cached one.
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_THRESHOLD = 0.93    # query cosine similarity needed for a hit
+RESPONSE_CACHE_TTL_SECONDS = 6 * 3600
+RESPONSE_CACHE_MAX_ITEMS = 512
 
 # ---------- Benchmark ----------
 DEFAULT_EMPTY_CONTEXT = "Sobivaid kursusi ei leitud."
@@ -1,9 +1,8 @@
-import pickle
-
 import numpy as np
 import pandas as pd
 
-from app_logic.config import DATA_PATH, EMBEDDINGS_PATH
+from app_logic.config import DATA_PATH, EMBEDDING_STORE_DIR, IDS_PATH
+from app_logic.embedding_store import open_embedding_store
 
 
 def load_courses(path: str = DATA_PATH) -> pd.DataFrame:
@@ -17,7 +16,19 @@ def load_courses(path: str = DATA_PATH) -> pd.DataFrame:
     return df
 
 
-def load_embeddings(path: str = EMBEDDINGS_PATH) -> np.ndarray:
-    """Load pre-computed course embeddings from a pickle file."""
-    with open(path, "rb") as f:
-        return pickle.load(f)
+def load_course_versions(courses_df: pd.DataFrame, path: str = IDS_PATH) -> list[str | None]:
+    """Latest OIS version uuid of every catalogue row (None if unknown).
+
+    ``aine_kood`` values are matched on their base code (before ``_``).
+    """
+    ids = pd.read_csv(path, dtype=str)
+    versions = dict(zip(ids["course_code"].str.strip().str.upper(), ids["latest_version_uuid"]))
+    return [
+        versions.get(str(code).strip().upper().split("_")[0])
+        for code in courses_df["aine_kood"].fillna("")
+    ]
+
+
+def load_embeddings(path: str = EMBEDDING_STORE_DIR) -> np.ndarray:
+    """Memory-map pre-computed, L2-normalised course embeddings (read-only)."""
+    return open_embedding_store(path).matrix
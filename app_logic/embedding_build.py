@@ -0,0 +1,258 @@
+"""Sharded, resumable encoding of course descriptions.
+
+``ShardedEncoder`` splits the texts into fixed-size shards and encodes them
+either in-process (one worker) or in a process pool.  Every worker pins its
+own thread budget so ``workers * threads`` does not oversubscribe the CPU.
+Each finished shard is checkpointed to ``shard_dir`` under a name derived
+from its texts, so an interrupted build resumes with the shards that are
+still missing and a changed input never reuses a stale shard.
+
+Texts are tokenized up front and sorted by token length before sharding.
+Within a shard, batches are cut by a total-token budget (``max_len *
+batch_size <= max_batch_tokens``) instead of a fixed count: short texts go
+in large batches, long ones in small batches, and little time is spent on
+padding.  Results are returned in the original order.
+"""
+
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+
+from app_logic.batching import plan_token_batches
+from app_logic.config import (
+    BUILD_MAX_BATCH_SIZE,
+    BUILD_MAX_BATCH_TOKENS,
+    BUILD_SHARD_DIR,
+    BUILD_SHARD_SIZE,
+)
+
+_THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+# Per-process model, loaded by ``_init_worker`` (or lazily in-process).
+_worker_model = None
+
+
+def _set_thread_budget(threads: int) -> None:
+    """Limit torch intra-op threads of the current process."""
+    try:
+        torch = __import__("torch")
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def _init_worker(model_name: str, threads: int) -> None:
+    global _worker_model
+    _set_thread_budget(threads)
+    from sentence_transformers import SentenceTransformer
+
+    _worker_model = SentenceTransformer(model_name)
+
+
+def token_lengths(model_name: str, texts: list[str]) -> np.ndarray:
+    """Token count of every text, capped at the model's maximum length."""
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    max_length = tokenizer.model_max_length
+    encoded = tokenizer(texts, add_special_tokens=True, truncation=True, max_length=max_length)
+    return np.array([len(ids) for ids in encoded["input_ids"]], dtype=np.int64)
+
+
+def fixed_batches(n_texts: int, batch_size: int) -> list[np.ndarray]:
+    """Unsorted fixed-count batches, the pre-bucketing behaviour."""
+    return [np.arange(i, min(i + batch_size, n_texts)) for i in range(0, n_texts, batch_size)]
+
+
+def padding_report(lengths: np.ndarray, batches: list[np.ndarray]) -> dict[str, float]:
+    """Real vs. padded token counts of a batch plan."""
+    real = int(lengths.sum())
+    padded = int(sum(lengths[batch].max() * len(batch) for batch in batches if len(batch)))
+    return {
+        "batches": len(batches),
+        "real_tokens": real,
+        "padded_tokens": padded,
+        "waste": 1.0 - real / padded if padded else 0.0,
+        "peak_batch_tokens": int(max((lengths[b].max() * len(b) for b in batches if len(b)), default=0)),
+    }
+
+
+def _shard_name(shard_id: int, texts: list[str]) -> str:
+    digest = hashlib.sha1("\x1f".join(texts).encode("utf-8")).hexdigest()[:16]
+    return f"shard_{shard_id:05d}_{digest}.npy"
+
+
+def _encode_shard(
+    shard_id: int,
+    texts: list[str],
+    lengths: np.ndarray,
+    path: str,
+    max_batch_tokens: int,
+    encode_kwargs: dict,
+):
+    """Encode one shard in token-budgeted batches and checkpoint it atomically.
+
+    Returns (shard_id, text_count, seconds).
+    """
+    t0 = time.time()
+    vectors = None
+    for batch in plan_token_batches(lengths, max_batch_tokens, BUILD_MAX_BATCH_SIZE):
+        encoded = np.asarray(
+            _worker_model.encode([texts[i] for i in batch], batch_size=len(batch), **encode_kwargs),
+            dtype=np.float32,
+        )
+        if vectors is None:
+            vectors = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+        vectors[batch] = encoded
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, vectors)
+    os.replace(tmp_path, path)
+    return shard_id, len(texts), time.time() - t0
+
+
+class ShardedEncoder:
+    """``encode``-compatible wrapper that encodes in checkpointed shards.
+
+    The model is only loaded once there is a shard to encode, so a rebuild
+    with nothing new to encode never loads it.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        workers: int = 1,
+        threads_per_worker: int | None = None,
+        shard_size: int = BUILD_SHARD_SIZE,
+        shard_dir: str = BUILD_SHARD_DIR,
+        max_batch_tokens: int = BUILD_MAX_BATCH_TOKENS,
+    ):
+        self.model_name = model_name
+        self.workers = max(1, int(workers))
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // self.workers)
+        self.shard_size = int(shard_size)
+        self.shard_dir = Path(shard_dir)
+        self.max_batch_tokens = int(max_batch_tokens)
+        self.shard_stats: list[tuple[int, int, float]] = []
+
+    def _run_in_process(self, pending, encode_kwargs):
+        global _worker_model
+        if _worker_model is None:
+            print(f"Loading embedding model '{self.model_name}' ({self.threads_per_worker} threads) ...")
+            _init_worker(self.model_name, self.threads_per_worker)
+        for shard_id, texts, lengths, path in pending:
+            yield _encode_shard(shard_id, texts, lengths, path, self.max_batch_tokens, encode_kwargs)
+
+    def _run_in_pool(self, pending, encode_kwargs):
+        print(
+            f"Starting {self.workers} workers x {self.threads_per_worker} threads "
+            f"(each loads '{self.model_name}') ..."
+        )
+        # Spawned workers inherit the environment, so their BLAS/OpenMP pools
+        # start with the budget before numpy or torch is imported.  The
+        # parent's own values are restored once the pool is done.
+        saved = {name: os.environ.get(name) for name in _THREAD_ENV_VARS}
+        for name in _THREAD_ENV_VARS:
+            os.environ[name] = str(self.threads_per_worker)
+        try:
+            # spawn: torch and tokenizers are not fork-safe once initialised.
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_name, self.threads_per_worker),
+            ) as pool:
+                futures = [
+                    pool.submit(
+                        _encode_shard, shard_id, texts, lengths, path, self.max_batch_tokens, encode_kwargs,
+                    )
+                    for shard_id, texts, lengths, path in pending
+                ]
+                for future in as_completed(futures):
+                    yield future.result()
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+    def report_padding(self, lengths: np.ndarray, baseline_batch_size: int = 8) -> None:
+        """Print padding waste of fixed-count batches vs. the token-budget plan."""
+        before = padding_report(lengths, fixed_batches(len(lengths), baseline_batch_size))
+        order = np.argsort(lengths, kind="stable")
+        after_batches = []
+        for start in range(0, len(order), self.shard_size):
+            shard = order[start:start + self.shard_size]
+            after_batches.extend(
+                shard[batch]
+                for batch in plan_token_batches(lengths[shard], self.max_batch_tokens, BUILD_MAX_BATCH_SIZE)
+            )
+        after = padding_report(lengths, after_batches)
+        print(f"  Padding ({before['real_tokens']} real tokens):")
+        for label, report in (
+            (f"fixed batches of {baseline_batch_size}", before),
+            (f"<= {self.max_batch_tokens} tokens per batch", after),
+        ):
+            print(
+                f"    {label:<32} {report['batches']:5d} batches, "
+                f"{report['padded_tokens']:9d} padded tokens, {report['waste']:6.1%} waste, "
+                f"peak {report['peak_batch_tokens']} tokens/batch"
+            )
+
+    def encode(self, texts, **kwargs) -> np.ndarray:
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        self.shard_dir.mkdir(parents=True, exist_ok=True)
+
+        lengths = token_lengths(self.model_name, texts)
+        self.report_padding(lengths)
+        order = np.argsort(lengths, kind="stable")
+        shards = []
+        for shard_id, start in enumerate(range(0, len(texts), self.shard_size)):
+            rows = order[start:start + self.shard_size]
+            shards.append((shard_id, [texts[i] for i in rows], lengths[rows]))
+        paths = [str(self.shard_dir / _shard_name(shard_id, chunk)) for shard_id, chunk, _ in shards]
+        pending = [
+            (shard_id, chunk, chunk_lengths, path)
+            for (shard_id, chunk, chunk_lengths), path in zip(shards, paths)
+            if not os.path.exists(path)
+        ]
+        print(
+            f"  {len(texts)} texts in {len(shards)} shards of <= {self.shard_size}; "
+            f"{len(shards) - len(pending)} already checkpointed"
+        )
+
+        if pending:
+            t0 = time.time()
+            encode_kwargs = {key: value for key, value in kwargs.items() if key != "batch_size"}
+            if self.workers > 1:
+                encode_kwargs["show_progress_bar"] = False
+                results = self._run_in_pool(pending, encode_kwargs)
+            else:
+                results = self._run_in_process(pending, encode_kwargs)
+            for done, (shard_id, count, seconds) in enumerate(results, start=1):
+                self.shard_stats.append((shard_id, count, seconds))
+                print(
+                    f"  shard {shard_id + 1}/{len(shards)}: {count} texts in {seconds:.1f}s "
+                    f"({count / max(seconds, 1e-9):.1f} texts/s)  [{done}/{len(pending)}]"
+                )
+            encoded = sum(len(chunk) for _, chunk, _, _ in pending)
+            elapsed = time.time() - t0
+            print(f"  Encoded {encoded} texts in {elapsed:.1f}s ({encoded / max(elapsed, 1e-9):.1f} texts/s overall)")
+
+        merged = np.concatenate([np.load(path) for path in paths])
+        vectors = np.empty_like(merged)
+        vectors[order] = merged
+        return vectors
+
+    def clear_checkpoints(self) -> None:
+        """Remove shard files once their vectors are safely stored."""
+        for path in self.shard_dir.glob("shard_*"):
+            path.unlink()
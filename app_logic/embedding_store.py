@@ -0,0 +1,184 @@
+"""Versioned on-disk store for course embeddings.
+
+Layout of a store directory (default ``andmed/embeddings/``):
+
+    matrix.npy     (rows, dim) L2-normalised vectors, float32 or float16
+    manifest.json  model name, dim, dtype, row count, SHA-256 of the source
+                   CSV and, in row order, the ``aine_kood``, OIS version
+                   uuid and description SHA-256 of every row
+
+The matrix is opened read-only with ``np.load(..., mmap_mode="r")``, so
+startup does not read the file and every app worker process maps the same
+page-cache pages instead of holding a private copy.
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app_logic.config import EMBEDDING_STORE_DIR
+from app_logic.scoring import normalize_embeddings
+
+STORE_FORMAT_VERSION = 1
+MATRIX_FILE = "matrix.npy"
+MANIFEST_FILE = "manifest.json"
+SUPPORTED_DTYPES = ("float32", "float16")
+
+
+@dataclass
+class EmbeddingStore:
+    matrix: np.ndarray
+    manifest: dict
+
+    @property
+    def course_ids(self) -> list[str]:
+        return self.manifest["aine_kood"]
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of a file's bytes, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _course_id_list(courses_df: pd.DataFrame) -> list[str]:
+    return courses_df["aine_kood"].fillna("").astype(str).tolist()
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(str(text).encode("utf-8")).hexdigest()
+
+
+def description_hashes(courses_df: pd.DataFrame) -> list[str]:
+    """SHA-256 of every row's embedded ``description`` text."""
+    return [text_sha256(text) for text in courses_df["description"].fillna("").astype(str)]
+
+
+def write_embedding_store(
+    embeddings: np.ndarray,
+    courses_df: pd.DataFrame,
+    model_name: str,
+    source_path: str,
+    store_dir: str = EMBEDDING_STORE_DIR,
+    dtype: str = "float32",
+    version_uuids: list[str | None] | None = None,
+) -> dict:
+    """Normalise, cast and write embeddings plus manifest; returns the manifest.
+
+    Files are written under temporary names and swapped in with
+    ``os.replace`` so a running app never maps a half-written matrix.
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+    if len(embeddings) != len(courses_df):
+        raise ValueError(
+            f"Embeddings ({len(embeddings)}) and courses ({len(courses_df)}) differ in length."
+        )
+
+    matrix = normalize_embeddings(embeddings).astype(dtype)
+    manifest = {
+        "format_version": STORE_FORMAT_VERSION,
+        "model_name": model_name,
+        "rows": int(matrix.shape[0]),
+        "dim": int(matrix.shape[1]),
+        "dtype": dtype,
+        "normalized": True,
+        "source_path": str(source_path),
+        "source_sha256": file_sha256(source_path),
+        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "aine_kood": _course_id_list(courses_df),
+        "version_uuid": version_uuids or [None] * len(courses_df),
+        "text_sha256": description_hashes(courses_df),
+    }
+
+    directory = Path(store_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    matrix_tmp = directory / f"{MATRIX_FILE}.tmp"
+    manifest_tmp = directory / f"{MANIFEST_FILE}.tmp"
+    with open(matrix_tmp, "wb") as f:
+        np.save(f, matrix)
+    with open(manifest_tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(matrix_tmp, directory / MATRIX_FILE)
+    os.replace(manifest_tmp, directory / MANIFEST_FILE)
+    return manifest
+
+
+def open_embedding_store(store_dir: str = EMBEDDING_STORE_DIR) -> EmbeddingStore:
+    """Memory-map the store matrix read-only and load its manifest."""
+    directory = Path(store_dir)
+    with open(directory / MANIFEST_FILE, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != STORE_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported embedding store version: {manifest.get('format_version')}"
+        )
+
+    matrix = np.load(directory / MATRIX_FILE, mmap_mode="r")
+    expected_shape = (manifest["rows"], manifest["dim"])
+    if matrix.shape != expected_shape or str(matrix.dtype) != manifest["dtype"]:
+        raise ValueError(
+            f"Embedding matrix {matrix.shape}/{matrix.dtype} does not match manifest "
+            f"{expected_shape}/{manifest['dtype']}."
+        )
+    return EmbeddingStore(matrix=matrix, manifest=manifest)
+
+
+def validate_embedding_store(store: EmbeddingStore, courses_df: pd.DataFrame) -> None:
+    """Raise ValueError if store rows are not aligned with the course catalogue.
+
+    Checks the row count and the row-by-row ``aine_kood`` ordering.
+    """
+    if store.manifest["rows"] != len(courses_df):
+        raise ValueError(
+            f"Embedding store has {store.manifest['rows']} rows, "
+            f"course catalogue has {len(courses_df)}."
+        )
+    if store.course_ids != _course_id_list(courses_df):
+        raise ValueError("Embedding store aine_kood order does not match the course catalogue.")
+
+
+def diff_embedding_store(
+    store: EmbeddingStore,
+    courses_df: pd.DataFrame,
+    version_uuids: list[str | None],
+) -> dict[str, list[str]]:
+    """Compare a store with the current catalogue by version uuid and text hash.
+
+    Returns ``aine_kood`` lists under ``new``, ``changed`` (version or
+    description differs), ``removed`` and ``unchanged``.
+    """
+    manifest = store.manifest
+    previous = {
+        course_id: (version, text_hash)
+        for course_id, version, text_hash in zip(
+            manifest["aine_kood"], manifest["version_uuid"], manifest["text_sha256"],
+        )
+    }
+    current_ids = _course_id_list(courses_df)
+    diff = {"new": [], "changed": [], "removed": [], "unchanged": []}
+    for course_id, version, text_hash in zip(
+        current_ids, version_uuids, description_hashes(courses_df),
+    ):
+        if course_id not in previous:
+            diff["new"].append(course_id)
+        elif previous[course_id] == (version, text_hash):
+            diff["unchanged"].append(course_id)
+        else:
+            diff["changed"].append(course_id)
+    diff["removed"] = sorted(set(previous) - set(current_ids))
+    return diff
+
+
+def is_store_stale(store: EmbeddingStore, source_path: str) -> bool:
+    """True if the course CSV changed since the store was built (SHA-256)."""
+    return store.manifest["source_sha256"] != file_sha256(source_path)
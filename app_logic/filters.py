@@ -1,8 +1,161 @@
 import re
+from dataclasses import dataclass, field
 
+import numpy as np
 import pandas as pd
 
 
+# ---------------------------------------------------------------------------
+# Precomputed filter index
+# ---------------------------------------------------------------------------
+def _value_masks(series: pd.Series) -> dict[str, np.ndarray]:
+    """Map every distinct value of a string series to its boolean row mask."""
+    codes, uniques = pd.factorize(series)
+    return {value: codes == i for i, value in enumerate(uniques)}
+
+
+def _contains_mask(series: pd.Series, pattern: str) -> np.ndarray:
+    return series.str.contains(pattern, case=False, na=False).to_numpy(dtype=bool)
+
+
+@dataclass
+class FilterIndex:
+    """Per-value row masks for every sidebar facet, built once per catalogue.
+
+    Combining a filter selection then costs a few numpy OR/AND operations
+    instead of re-scanning the DataFrame columns on every chat message.
+    Substring facets (language, study level) are memoised per selected value,
+    so values outside the precomputed options still match exactly like
+    ``str.contains`` would.
+    """
+
+    index: pd.Index
+    semester: dict[str, np.ndarray]
+    eap_sorted: np.ndarray
+    eap_order: np.ndarray
+    is_eristav: np.ndarray
+    city: dict[str, np.ndarray]
+    teaching_method: dict[str, np.ndarray]
+    domain: dict[str, np.ndarray]
+    language_column: pd.Series
+    level_column: pd.Series
+    language: dict[str, np.ndarray] = field(default_factory=dict)
+    level: dict[str, np.ndarray] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def _any_of(self, masks: dict[str, np.ndarray], values: list[str]) -> np.ndarray:
+        result = np.zeros(len(self), dtype=bool)
+        for value in values:
+            value_mask = masks.get(value)
+            if value_mask is not None:
+                result |= value_mask
+        return result
+
+    def _language_mask(self, lang: str) -> np.ndarray:
+        if lang not in self.language:
+            self.language[lang] = _contains_mask(self.language_column, lang)
+        return self.language[lang]
+
+    def _level_mask(self, level: str) -> np.ndarray:
+        if level not in self.level:
+            self.level[level] = _contains_mask(self.level_column, re.escape(level))
+        return self.level[level]
+
+    def eap_mask(self, low: float, high: float) -> np.ndarray:
+        """Rows with low <= eap <= high, via binary search on sorted EAP values."""
+        start = np.searchsorted(self.eap_sorted, low, side="left")
+        stop = np.searchsorted(self.eap_sorted, high, side="right")
+        mask = np.zeros(len(self), dtype=bool)
+        mask[self.eap_order[start:stop]] = True
+        return mask
+
+    def mask(
+        self,
+        semesters: list[str],
+        eap_range: tuple[float, float],
+        grading_choice: str,
+        languages: list[str] | None = None,
+        cities: list[str] | None = None,
+        study_levels: list[str] | None = None,
+        teaching_methods: list[str] | None = None,
+        domains: list[str] | None = None,
+    ) -> pd.Series:
+        """Same contract as ``apply_filters``, answered from the index."""
+        semesters_clean = [s.strip().lower() for s in semesters if s.strip()]
+        if semesters_clean:
+            mask = self._any_of(self.semester, semesters_clean)
+        else:
+            mask = np.ones(len(self), dtype=bool)
+
+        mask &= self.eap_mask(eap_range[0], eap_range[1])
+
+        if grading_choice != "Koik":
+            if grading_choice == "Eristav":
+                mask &= self.is_eristav
+            else:
+                mask &= ~self.is_eristav
+
+        if languages:
+            lang_mask = np.zeros(len(self), dtype=bool)
+            for lang in languages:
+                lang_mask |= self._language_mask(lang)
+            mask &= lang_mask
+
+        if cities:
+            mask &= self._any_of(self.city, cities)
+
+        if study_levels:
+            level_mask = np.zeros(len(self), dtype=bool)
+            for level in study_levels:
+                level_mask |= self._level_mask(level)
+            mask &= level_mask
+
+        if teaching_methods:
+            mask &= self._any_of(self.teaching_method, teaching_methods)
+
+        if domains:
+            mask &= self._any_of(self.domain, domains)
+
+        return pd.Series(mask, index=self.index)
+
+
+def build_filter_index(df: pd.DataFrame) -> FilterIndex:
+    """Precompute facet masks for ``df``; rebuild whenever the catalogue changes."""
+    eap_values = pd.to_numeric(df["eap"], errors="coerce").to_numpy(dtype=float)
+    valid_rows = np.flatnonzero(~np.isnan(eap_values))
+    eap_order = valid_rows[np.argsort(eap_values[valid_rows], kind="stable")]
+
+    filter_index = FilterIndex(
+        index=df.index,
+        semester=_value_masks(df["semester"].astype(str).str.lower()),
+        eap_sorted=eap_values[eap_order],
+        eap_order=eap_order,
+        is_eristav=_contains_mask(df["hindamisskaala"], "Eristav"),
+        city=_value_masks(df["linn"].astype(str)),
+        teaching_method=_value_masks(df["oppeviis"].astype(str)),
+        domain=_value_masks(df["valdkond"].astype(str)),
+        language_column=df["oppekeeled"],
+        level_column=df["oppeaste"],
+    )
+
+    # Warm the substring facets with every comma-separated value in the data.
+    warmers = (
+        ("oppekeeled", filter_index._language_mask),
+        ("oppeaste", filter_index._level_mask),
+    )
+    for column, warm in warmers:
+        tokens = df[column].dropna().astype(str).str.split(",").explode().str.strip()
+        for token in tokens[tokens != ""].unique():
+            warm(token)
+
+    return filter_index
+
+
+# ---------------------------------------------------------------------------
+# Public filter API
+# ---------------------------------------------------------------------------
 def apply_filters(
     df: pd.DataFrame,
     semesters: list[str],
@@ -13,8 +166,23 @@ def apply_filters(
     study_levels: list[str] | None = None,
     teaching_methods: list[str] | None = None,
     domains: list[str] | None = None,
+    filter_index: FilterIndex | None = None,
 ) -> pd.Series:
-    """Return a boolean mask based on sidebar filters."""
+    """Return a boolean mask based on sidebar filters.
+
+    If *filter_index* (from ``build_filter_index(df)``) is given, the mask is
+    combined from precomputed facet masks instead of scanning ``df``.
+    """
+    if filter_index is not None:
+        return filter_index.mask(
+            semesters, eap_range, grading_choice,
+            languages=languages,
+            cities=cities,
+            study_levels=study_levels,
+            teaching_methods=teaching_methods,
+            domains=domains,
+        )
+
     semester_series = df["semester"].astype(str).str.lower()
     semesters_clean = [s.strip().lower() for s in semesters if s.strip()]
     if semesters_clean:
@@ -0,0 +1,116 @@
+"""Direct course lookup by course code or title.
+
+Queries that are just course codes (``LTAT.03.001``) or a course title do
+not need the embedding model: ``CourseLookupIndex`` answers them from
+dictionaries and a sorted title list built once when the catalogue loads.
+"""
+
+import bisect
+import re
+import unicodedata
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from app_logic.config import LOOKUP_MAX_PREFIX_MATCHES, LOOKUP_MIN_PREFIX_CHARS
+
+# Separators allowed between course codes in a code-only query.
+_CODE_SEPARATORS = re.compile(r"[\s,;]+")
+
+
+def normalize_title(text: str) -> str:
+    """Casefold, drop punctuation and collapse whitespace (diacritics kept)."""
+    text = unicodedata.normalize("NFC", str(text)).casefold()
+    text = re.sub(r"[^\w]+", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _code_key(token: str) -> str:
+    return token.strip(".?!:").upper()
+
+
+@dataclass
+class CourseLookupIndex:
+    """Course code and title lookup tables over catalogue row positions."""
+
+    codes: dict[str, list[int]] = field(default_factory=dict)
+    base_codes: dict[str, list[int]] = field(default_factory=dict)
+    titles: dict[str, list[int]] = field(default_factory=dict)
+    # Sorted (title, row) pairs for prefix search with bisect.
+    title_keys: list[str] = field(default_factory=list)
+    title_rows: list[int] = field(default_factory=list)
+
+    def _code_rows(self, token: str) -> list[int]:
+        key = _code_key(token)
+        return self.codes.get(key) or self.base_codes.get(key, [])
+
+    def find_codes(self, query: str) -> list[int] | None:
+        """Rows for a query made only of course codes, else None."""
+        tokens = [token for token in _CODE_SEPARATORS.split(query) if token]
+        if not tokens:
+            return None
+        rows: list[int] = []
+        for token in tokens:
+            matched = self._code_rows(token)
+            if not matched:
+                return None
+            rows.extend(matched)
+        return rows
+
+    def find_title(self, query: str) -> list[int]:
+        """Rows whose title equals the query, else unambiguous prefix matches."""
+        key = normalize_title(query)
+        if not key:
+            return []
+        if key in self.titles:
+            return self.titles[key]
+        if len(key) < LOOKUP_MIN_PREFIX_CHARS:
+            return []
+
+        start = bisect.bisect_left(self.title_keys, key)
+        stop = bisect.bisect_left(self.title_keys, key + "\U0010ffff")
+        rows = list(dict.fromkeys(self.title_rows[start:stop]))
+        return rows if len(rows) <= LOOKUP_MAX_PREFIX_MATCHES else []
+
+    def lookup(self, query: str, row_mask: np.ndarray | pd.Series | None = None) -> np.ndarray:
+        """Row positions answering *query* directly (empty if none).
+
+        Code-only queries win over titles.  *row_mask* (the sidebar filter)
+        removes rows; an empty result means the caller should fall back to
+        semantic search.
+        """
+        rows = self.find_codes(query)
+        if rows is None:
+            rows = self.find_title(query)
+        rows = np.asarray(list(dict.fromkeys(rows)), dtype=np.int64)
+        if row_mask is not None and len(rows):
+            allowed = np.asarray(row_mask, dtype=bool)
+            rows = rows[allowed[rows]]
+        return rows
+
+
+def build_course_lookup(df: pd.DataFrame) -> CourseLookupIndex:
+    """Build the lookup tables; row ids are positions in *df*."""
+    index = CourseLookupIndex()
+    for row, code in enumerate(df["aine_kood"].fillna("").astype(str)):
+        code = code.strip().upper()
+        if not code:
+            continue
+        index.codes.setdefault(code, []).append(row)
+        index.base_codes.setdefault(code.split("_")[0], []).append(row)
+
+    pairs: set[tuple[str, int]] = set()
+    for column in ("nimi_et", "nimi_en"):
+        if column not in df.columns:
+            continue
+        for row, title in enumerate(df[column].fillna("").astype(str)):
+            key = normalize_title(title)
+            if key and key != "nan":
+                pairs.add((key, row))
+
+    for key, row in sorted(pairs):
+        index.titles.setdefault(key, []).append(row)
+        index.title_keys.append(key)
+        index.title_rows.append(row)
+    return index
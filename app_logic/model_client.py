@@ -0,0 +1,181 @@
+"""Thin client for the shared model server (``model_server.py``).
+
+``RemoteEmbedder`` and ``RemoteCrossEncoder`` expose the ``encode`` and
+``predict`` calls of the in-process models, and ``remote_local_rerank_runtime``
+returns a local-LLM rerank runtime, so the retrieval code and the
+benchmark do not know whether the models run in this process or in the
+server.  Each wrapper takes a *fallback* factory: if the server becomes
+unreachable, the model is loaded in-process and used from then on.  The
+wrappers' ``model_key`` is the server's cache key until then and the local
+model's key afterwards, so the caches never mix two backends.
+
+Wire format: JSON over localhost HTTP; embedding matrices travel as
+base64-encoded float32 bytes plus shape.
+"""
+
+import base64
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+from app_logic.config import MODEL_SERVER_TIMEOUT
+
+
+def encode_array(array: np.ndarray) -> dict:
+    array = np.ascontiguousarray(array, dtype=np.float32)
+    return {"shape": list(array.shape), "data": base64.b64encode(array.tobytes()).decode("ascii")}
+
+
+def decode_array(payload: dict) -> np.ndarray:
+    data = base64.b64decode(payload["data"])
+    return np.frombuffer(data, dtype=np.float32).reshape(payload["shape"]).copy()
+
+
+class ModelServerClient:
+    """JSON-over-HTTP calls to a running ``model_server.py``."""
+
+    def __init__(self, base_url: str, timeout: float = MODEL_SERVER_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = float(timeout)
+        self.info: dict = {}
+
+    def _request(self, path: str, payload: dict | None = None) -> dict:
+        data = None if payload is None else json.dumps(payload).encode("utf-8")
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=data,
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read().decode("utf-8"))
+        except urllib.error.HTTPError as error:
+            detail = error.read().decode("utf-8", errors="replace")
+            raise RuntimeError(f"Model server {path} failed ({error.code}): {detail}") from None
+
+    def health(self) -> dict:
+        """Loaded models and their score-cache keys."""
+        self.info = self._request("/health")
+        return self.info
+
+    def encode(self, sentences: list[str], **options) -> np.ndarray:
+        response = self._request("/encode", {"sentences": list(sentences), "options": options})
+        return decode_array(response["vectors"])
+
+    def rerank(self, pairs: list, model: str = "reranker", **options) -> np.ndarray:
+        response = self._request(
+            "/rerank", {"pairs": [list(pair) for pair in pairs], "model": model, "options": options},
+        )
+        return np.asarray(response["scores"], dtype=np.float32)
+
+    def generate_local_rerank(self, model_name: str, prompt: str) -> str:
+        return self._request("/local-rerank", {"model": model_name, "prompt": prompt})["text"]
+
+    def score_local_rerank(self, model_name: str, query: str, documents: list[str]) -> np.ndarray:
+        response = self._request(
+            "/local-score", {"model": model_name, "query": query, "documents": list(documents)},
+        )
+        return np.asarray(response["scores"], dtype=np.float32)
+
+
+def connect_model_server(url: str, timeout: float = MODEL_SERVER_TIMEOUT) -> ModelServerClient | None:
+    """Client for *url*, or None if no URL is set or the server does not answer."""
+    if not url:
+        return None
+    client = ModelServerClient(url, timeout=timeout)
+    try:
+        client.health()
+    except (OSError, RuntimeError, ValueError):
+        return None
+    return client
+
+
+class _RemoteWithFallback:
+    """Call the server; after the first connection failure use a local model.
+
+    *fallback* returns (model, cache model key) of the in-process model.
+    """
+
+    def __init__(self, fallback=None, model_key: str | None = None):
+        self.fallback = fallback
+        self.model_key = model_key
+        self._local = None
+        self._lock = threading.Lock()
+
+    def _call(self, remote, local):
+        if self._local is None:
+            try:
+                return remote()
+            except OSError:
+                if self.fallback is None:
+                    raise
+                with self._lock:
+                    if self._local is None:
+                        self._local, self.model_key = self.fallback()
+        return local(self._local)
+
+
+class RemoteEmbedder(_RemoteWithFallback):
+    """``encode``-compatible embedder served by the model server."""
+
+    def __init__(self, client: ModelServerClient, fallback=None):
+        super().__init__(fallback, client.info.get("embedder_key"))
+        self.client = client
+
+    def encode(self, sentences, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        vectors = self._call(
+            lambda: self.client.encode(texts, **kwargs),
+            lambda model: np.asarray(model.encode(texts, **kwargs)),
+        )
+        return vectors[0] if single else vectors
+
+
+class RemoteCrossEncoder(_RemoteWithFallback):
+    """``predict``-compatible cross-encoder served by the model server.
+
+    *model* selects the server's "reranker" or "first_stage" model.
+    """
+
+    def __init__(self, client: ModelServerClient, model: str = "reranker", fallback=None):
+        super().__init__(fallback, client.info.get(f"{model}_key"))
+        self.client = client
+        self.model = model
+
+    def predict(self, sentences, **kwargs) -> np.ndarray:
+        pairs = [list(pair) for pair in sentences]
+        return self._call(
+            lambda: self.client.rerank(pairs, model=self.model, **kwargs),
+            lambda model: np.asarray(model.predict(pairs, **kwargs)),
+        )
+
+
+def remote_local_rerank_runtime(client: ModelServerClient, model_name: str, fallback=None) -> dict:
+    """Local-LLM rerank runtime whose model runs in the model server.
+
+    ``generate_local_rerank_response`` and ``local_llm_relevance_scores``
+    call its ``generate`` and ``score`` entries instead of running a model;
+    with *fallback* the runtime is loaded in-process after a connection
+    failure.
+    """
+    from app_logic.retrieval import generate_local_rerank_response, local_llm_relevance_scores
+
+    remote = _RemoteWithFallback(fallback and (lambda: (fallback(), model_name)))
+
+    def generate(prompt: str) -> str:
+        return remote._call(
+            lambda: client.generate_local_rerank(model_name, prompt),
+            lambda runtime: generate_local_rerank_response(runtime, prompt),
+        )
+
+    def score(query: str, documents: list[str]) -> np.ndarray:
+        return remote._call(
+            lambda: client.score_local_rerank(model_name, query, documents),
+            lambda runtime: local_llm_relevance_scores(runtime, query, documents),
+        )
+
+    return {"model_name": model_name, "generate": generate, "score": score}
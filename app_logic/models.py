@@ -0,0 +1,109 @@
+"""Construction of the retrieval models from the runtime configuration.
+
+Shared by the Streamlit app (in-process models) and ``model_server.py``,
+so both pick the same backend and use the same score-cache keys.
+"""
+
+import inspect
+
+from app_logic.config import (
+    CASCADE_FIRST_STAGE_MODEL,
+    EMBED_MODEL,
+    EMBEDDER_BACKEND,
+    ONNX_EMBEDDER_DIR,
+    ONNX_RERANKER_DIR,
+    RERANK_MAX_DOC_TOKENS,
+    RERANK_PRETOKENIZE,
+    RERANKER_BACKEND,
+    RERANKER_MODEL,
+)
+from app_logic.onnx_models import OnnxCrossEncoder, OnnxEmbedder, load_int8_cross_encoder
+from app_logic.rerank_input import PretokenizedReranker
+
+
+def load_embedding_model(backend: str = EMBEDDER_BACKEND):
+    """Query embedder for *backend*; returns (model, cache model key).
+
+    A missing ONNX export falls back to the fp16 SentenceTransformer.
+    """
+    if backend.startswith("onnx"):
+        try:
+            model = OnnxEmbedder(ONNX_EMBEDDER_DIR, quantized=backend == "onnx-int8")
+            # Backend in the key: cached torch and ONNX vectors differ slightly.
+            return model, f"{EMBED_MODEL}:{backend}"
+        except (FileNotFoundError, ImportError):
+            pass
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(EMBED_MODEL, model_kwargs={"torch_dtype": "float16"}), EMBED_MODEL
+
+
+def rerank_model_key(model_name: str, backend: str = "torch", truncated: bool = RERANK_PRETOKENIZE) -> str:
+    """Score-cache key of a cross-encoder configuration.
+
+    *truncated* says whether descriptions are capped at
+    ``RERANK_MAX_DOC_TOKENS`` (a ``PretokenizedReranker`` is in use).
+    """
+    # Backend and document cap in the key: both change the scores slightly.
+    key = model_name if backend == "torch" else f"{model_name}:{backend}"
+    return f"{key}:doc{RERANK_MAX_DOC_TOKENS}" if truncated else key
+
+
+def pretokenized(cross_encoder, descriptions=None):
+    """Wrap *cross_encoder* with cached description tokens when enabled.
+
+    Returns (model, applied); *applied* is False when the plain
+    cross-encoder is returned, e.g. for tokenizers the wrapper does not
+    support.
+    """
+    if not RERANK_PRETOKENIZE or descriptions is None:
+        return cross_encoder, False
+    try:
+        return PretokenizedReranker(cross_encoder, descriptions), True
+    except (ValueError, ImportError):
+        return cross_encoder, False
+
+
+def load_reranker_model(backend: str = RERANKER_BACKEND, descriptions=None):
+    """bge-reranker for *backend*; returns (model, cache model key).
+
+    *backend* is "torch", "torch-int8", "onnx" or "onnx-int8".
+    *descriptions* (the catalogue texts) are pre-tokenised when
+    ``RERANK_PRETOKENIZE`` is on.  A missing ONNX export falls back to the
+    fp16 PyTorch model, and the key names the backend actually loaded.
+    """
+    from sentence_transformers import CrossEncoder
+
+    if backend.startswith("onnx"):
+        try:
+            model, truncated = pretokenized(
+                OnnxCrossEncoder(ONNX_RERANKER_DIR, quantized=backend == "onnx-int8"), descriptions,
+            )
+            return model, rerank_model_key(RERANKER_MODEL, backend, truncated)
+        except (FileNotFoundError, ImportError):
+            backend = "torch"
+    if backend == "torch-int8":
+        model = load_int8_cross_encoder(RERANKER_MODEL)
+    else:
+        backend = "torch"
+        model = CrossEncoder(RERANKER_MODEL, model_kwargs={"torch_dtype": "float16"})
+    model, truncated = pretokenized(model, descriptions)
+    return model, rerank_model_key(RERANKER_MODEL, backend, truncated)
+
+
+def load_first_stage_model(descriptions=None):
+    """Small cross-encoder of the cascade mode; returns (model, cache model key).
+
+    It runs without the default sigmoid, so its scores are raw logits, the
+    scale ``CASCADE_MARGIN`` is set in.
+    """
+    torch = __import__("torch")
+    from sentence_transformers import CrossEncoder
+
+    # sentence-transformers < 4 names the argument default_activation_function.
+    parameters = inspect.signature(CrossEncoder.__init__).parameters
+    argument = "activation_fn" if "activation_fn" in parameters else "default_activation_function"
+    model, truncated = pretokenized(
+        CrossEncoder(CASCADE_FIRST_STAGE_MODEL, **{argument: torch.nn.Identity()}), descriptions,
+    )
+    return model, rerank_model_key(CASCADE_FIRST_STAGE_MODEL, truncated=truncated)
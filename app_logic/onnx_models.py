@@ -0,0 +1,259 @@
+"""CPU inference backends (ONNX Runtime, dynamic int8) for the retrieval models.
+
+``export_embedder`` writes the bge-m3 encoder as an ONNX graph (plus a
+dynamically int8-quantised copy) together with its tokenizer;
+``OnnxEmbedder`` runs it behind the SentenceTransformer ``encode`` call, so
+``CachedEmbedder``, ``get_index_candidates`` and ``batch_encode_queries``
+use it unchanged.  ``export_reranker`` and ``OnnxCrossEncoder`` do the same
+for the bge-reranker cross-encoder behind ``CrossEncoder.predict``;
+``load_int8_cross_encoder`` is the PyTorch-only alternative.
+
+Model directory layout (``andmed/onnx/bge-m3/``, ``andmed/onnx/bge-reranker-v2-m3/``):
+
+    model.onnx       fp32 graph (weights may sit in external data files)
+    model_int8.onnx  dynamic int8 weights, produced by ``quantize_dynamic``
+    tokenizer files  saved with ``save_pretrained``
+
+``onnxruntime`` and ``transformers`` are optional and imported lazily.
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+from app_logic.config import ONNX_EMBEDDER_DIR, ONNX_MAX_LENGTH, ONNX_RERANKER_DIR
+from app_logic.scoring import normalize_embeddings
+
+FP32_FILE = "model.onnx"
+INT8_FILE = "model_int8.onnx"
+
+
+def _import_onnxruntime():
+    try:
+        return __import__("onnxruntime")
+    except ImportError as exc:
+        raise ImportError(
+            "ONNX backend requires the optional 'onnxruntime' package (pip install onnxruntime)."
+        ) from exc
+
+
+def quantize_onnx_int8(source_path: str, target_path: str) -> None:
+    """Dynamic int8 quantisation of an ONNX graph's weights."""
+    _import_onnxruntime()
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(
+        source_path,
+        target_path,
+        weight_type=QuantType.QInt8,
+        use_external_data_format=True,
+    )
+
+
+def _export_graph(
+    model,
+    tokenizer,
+    out_dir: str,
+    output_name: str,
+    output_axes: dict,
+    quantize: bool,
+) -> list[str]:
+    """Export a (input_ids, attention_mask) model plus tokenizer to *out_dir*."""
+    torch = __import__("torch")
+
+    directory = Path(out_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    tokenizer.save_pretrained(directory)
+
+    dummy = tokenizer(["tere", "kursus"], ["kirjeldus", "tekst"], padding=True, return_tensors="pt")
+    fp32_path = str(directory / FP32_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model.eval(),
+            (dummy["input_ids"], dummy["attention_mask"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=[output_name],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                output_name: output_axes,
+            },
+            opset_version=17,
+        )
+    paths = [fp32_path]
+    if quantize:
+        int8_path = str(directory / INT8_FILE)
+        quantize_onnx_int8(fp32_path, int8_path)
+        paths.append(int8_path)
+    return paths
+
+
+def export_embedder(model_name: str, out_dir: str = ONNX_EMBEDDER_DIR, quantize: bool = True) -> list[str]:
+    """Export a Hugging Face encoder to ONNX; returns the written graph paths."""
+    from transformers import AutoModel, AutoTokenizer
+
+    return _export_graph(
+        AutoModel.from_pretrained(model_name),
+        AutoTokenizer.from_pretrained(model_name),
+        out_dir,
+        "last_hidden_state",
+        {0: "batch", 1: "sequence"},
+        quantize,
+    )
+
+
+def export_reranker(model_name: str, out_dir: str = ONNX_RERANKER_DIR, quantize: bool = True) -> list[str]:
+    """Export a sequence-classification cross-encoder to ONNX."""
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    return _export_graph(
+        AutoModelForSequenceClassification.from_pretrained(model_name),
+        AutoTokenizer.from_pretrained(model_name),
+        out_dir,
+        "logits",
+        {0: "batch"},
+        quantize,
+    )
+
+
+def create_session(model_path: str, threads: int | None = None):
+    """CPU InferenceSession with full graph optimisations."""
+    ort = _import_onnxruntime()
+    if not Path(model_path).exists():
+        raise FileNotFoundError(model_path)
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads:
+        options.intra_op_num_threads = int(threads)
+    return ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+
+
+class OnnxEmbedder:
+    """bge-m3 query embedder on ONNX Runtime with SentenceTransformer's interface.
+
+    Pooling matches the bge-m3 SentenceTransformer config: the [CLS] token
+    state, L2-normalised.
+    """
+
+    def __init__(
+        self,
+        model_dir: str = ONNX_EMBEDDER_DIR,
+        quantized: bool = True,
+        max_length: int = ONNX_MAX_LENGTH,
+        threads: int | None = None,
+    ):
+        from transformers import AutoTokenizer
+
+        self.model_path = str(Path(model_dir) / (INT8_FILE if quantized else FP32_FILE))
+        self.session = create_session(self.model_path, threads)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.max_length = int(max_length)
+
+    def encode(
+        self,
+        sentences,
+        batch_size: int = 32,
+        **kwargs,
+    ) -> np.ndarray:
+        """Encode texts like ``SentenceTransformer.encode`` (numpy output).
+
+        Extra SentenceTransformer options (progress bar, output format) are
+        accepted and ignored; vectors are always normalised, as bge-m3's own
+        pipeline does.
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        chunks = []
+        for start in range(0, len(texts), batch_size):
+            tokens = self.tokenizer(
+                texts[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            hidden = self.session.run(
+                ["last_hidden_state"],
+                {
+                    "input_ids": tokens["input_ids"].astype(np.int64),
+                    "attention_mask": tokens["attention_mask"].astype(np.int64),
+                },
+            )[0]
+            chunks.append(hidden[:, 0])
+        if not chunks:
+            return np.empty((0, 0), dtype=np.float32)
+        vectors = normalize_embeddings(np.concatenate(chunks))
+        return vectors[0] if single else vectors
+
+
+def sigmoid(logits: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(logits, -30.0, 30.0)))
+
+
+class OnnxCrossEncoder:
+    """Cross-encoder on ONNX Runtime with ``CrossEncoder.predict``'s interface.
+
+    Returns one sigmoid-activated relevance score per pair, as
+    ``CrossEncoder.predict`` does for a single-label model, so switching
+    ``RERANKER_BACKEND`` does not change the score scale.
+    """
+
+    def __init__(
+        self,
+        model_dir: str = ONNX_RERANKER_DIR,
+        quantized: bool = True,
+        max_length: int | None = None,
+        threads: int | None = None,
+    ):
+        from transformers import AutoTokenizer
+
+        self.model_path = str(Path(model_dir) / (INT8_FILE if quantized else FP32_FILE))
+        self.session = create_session(self.model_path, threads)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.max_length = int(max_length or self.tokenizer.model_max_length)
+
+    def score_tokens(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """Relevance scores of one already tokenised, padded batch."""
+        logits = self.session.run(
+            ["logits"],
+            {
+                "input_ids": input_ids.astype(np.int64),
+                "attention_mask": attention_mask.astype(np.int64),
+            },
+        )[0]
+        return sigmoid(logits[:, 0].astype(np.float32))
+
+    def predict(self, sentences, batch_size: int = 32, **kwargs) -> np.ndarray:
+        """Score ``[query, document]`` pairs; extra CrossEncoder options are ignored."""
+        pairs = list(sentences)
+        scores = []
+        for start in range(0, len(pairs), batch_size):
+            batch = pairs[start:start + batch_size]
+            tokens = self.tokenizer(
+                [pair[0] for pair in batch],
+                [pair[1] for pair in batch],
+                padding=True,
+                truncation="only_second",
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            scores.append(self.score_tokens(tokens["input_ids"], tokens["attention_mask"]))
+        return np.concatenate(scores).astype(np.float32) if scores else np.array([], dtype=np.float32)
+
+
+def load_int8_cross_encoder(model_name: str):
+    """fp32 ``CrossEncoder`` with its Linear layers dynamically quantised to int8."""
+    torch = __import__("torch")
+    from sentence_transformers import CrossEncoder
+
+    cross_encoder = CrossEncoder(model_name, device="cpu")
+    cross_encoder.model = torch.quantization.quantize_dynamic(
+        cross_encoder.model, {torch.nn.Linear}, dtype=torch.qint8,
+    )
+    return cross_encoder
+
+
+def cosine_parity(reference: np.ndarray, candidate: np.ndarray) -> np.ndarray:
+    """Row-wise cosine similarity between two (N, D) embedding matrices."""
+    return np.sum(normalize_embeddings(reference) * normalize_embeddings(candidate), axis=1)
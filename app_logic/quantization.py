@@ -0,0 +1,63 @@
+"""Compact codes for the course embeddings.
+
+Two codecs over L2-normalised vectors:
+
+  * int8 scalar quantisation – each dimension is scaled by its largest
+    absolute value to [-127, 127]; 4x smaller than float32.
+  * 1-bit sign quantisation – one bit per dimension packed with
+    ``np.packbits``; 32x smaller.  Similarity is the negated Hamming
+    distance between sign patterns.
+
+Both are only used to pick an oversampled shortlist; the shortlist is
+rescored with the full-precision vectors (see ``app_logic.vector_index``).
+"""
+
+import numpy as np
+
+from app_logic.config import QUANTIZED_SCAN_BLOCK
+from app_logic.scoring import normalize_embeddings
+
+# Set bits per byte value, for numpy versions without ``np.bitwise_count``.
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def quantize_int8(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-dimension int8 quantisation.
+
+    Returns:
+        (codes, scale) with ``codes * scale`` approximating *vectors*.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scale = np.abs(vectors).max(axis=0) / 127.0
+    scale[scale == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scale), -127, 127).astype(np.int8)
+    return codes, scale.astype(np.float32)
+
+
+def int8_scores(codes: np.ndarray, scale: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Approximate dot products of one normalised query against int8 codes.
+
+    The per-dimension scale is folded into the query, so codes are only
+    upcast in cache-sized blocks and never dequantised whole.  numpy has no
+    int8 matmul, so the gain over float32 is memory, not scan speed.
+    """
+    scaled_query = (np.asarray(query, dtype=np.float32) * scale).astype(np.float32)
+    scores = np.empty(len(codes), dtype=np.float32)
+    for start in range(0, len(codes), QUANTIZED_SCAN_BLOCK):
+        block = codes[start:start + QUANTIZED_SCAN_BLOCK].astype(np.float32)
+        scores[start:start + len(block)] = block @ scaled_query
+    return scores
+
+
+def binarize(vectors: np.ndarray) -> np.ndarray:
+    """Pack the sign of every dimension into bits: (N, D) -> (N, ceil(D / 8)) uint8."""
+    vectors = normalize_embeddings(vectors)
+    return np.packbits(vectors > 0, axis=1)
+
+
+def hamming_distances(codes: np.ndarray, query_code: np.ndarray) -> np.ndarray:
+    """Hamming distance from one packed query code to every packed row."""
+    xor = np.bitwise_xor(codes, query_code.reshape(1, -1))
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(xor).sum(axis=1, dtype=np.int32)
+    return _POPCOUNT_TABLE[xor].sum(axis=1, dtype=np.int32)
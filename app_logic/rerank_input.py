@@ -0,0 +1,125 @@
+"""Pre-tokenised, length-capped inputs for cross-encoder rerankers.
+
+``PretokenizedReranker`` wraps a ``CrossEncoder`` (or ``OnnxCrossEncoder``)
+behind the same ``predict`` call.  Course descriptions are tokenised once,
+when the catalogue loads, and truncated to ``max_doc_tokens``; a query only
+tokenises the query itself.  Pair sequences are assembled from the cached
+ids with the tokenizer's special tokens, sorted by length and cut into
+token-budgeted batches (``plan_token_batches``), so padding is minimal and
+the longest possible batch is bounded by the caps.
+
+Scores differ slightly from ``CrossEncoder.predict`` on descriptions longer
+than the cap, so score caches must include the cap in their model key.
+"""
+
+import numpy as np
+
+from app_logic.batching import plan_token_batches
+from app_logic.config import (
+    RERANK_MAX_BATCH_SIZE,
+    RERANK_MAX_BATCH_TOKENS,
+    RERANK_MAX_DOC_TOKENS,
+    RERANK_MAX_QUERY_TOKENS,
+)
+
+
+def _torch_scorer(cross_encoder):
+    """(input_ids, attention_mask) -> scores for a sentence-transformers CrossEncoder.
+
+    Applies the same activation as ``CrossEncoder.predict``.
+    """
+    torch = __import__("torch")
+    model = cross_encoder.model
+    activation = (
+        getattr(cross_encoder, "activation_fn", None)
+        or getattr(cross_encoder, "default_activation_function", None)
+    )
+
+    def score(input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        with torch.inference_mode():
+            logits = model(
+                input_ids=torch.from_numpy(input_ids).to(model.device),
+                attention_mask=torch.from_numpy(attention_mask).to(model.device),
+            ).logits
+            if activation is not None:
+                logits = activation(logits)
+        return logits[:, 0].float().cpu().numpy()
+
+    return score
+
+
+class PretokenizedReranker:
+    """``predict``-compatible cross-encoder over cached description token ids."""
+
+    def __init__(
+        self,
+        cross_encoder,
+        descriptions=(),
+        max_doc_tokens: int = RERANK_MAX_DOC_TOKENS,
+        max_query_tokens: int = RERANK_MAX_QUERY_TOKENS,
+        max_batch_tokens: int = RERANK_MAX_BATCH_TOKENS,
+        max_batch_size: int = RERANK_MAX_BATCH_SIZE,
+    ):
+        self.model = cross_encoder
+        self.tokenizer = cross_encoder.tokenizer
+        if "token_type_ids" in self.tokenizer.model_input_names:
+            raise ValueError("PretokenizedReranker supports tokenizers without token_type_ids only.")
+        if hasattr(cross_encoder, "score_tokens"):
+            self._score = cross_encoder.score_tokens
+        else:
+            self._score = _torch_scorer(cross_encoder)
+        self.max_doc_tokens = int(max_doc_tokens)
+        self.max_query_tokens = int(max_query_tokens)
+        self.max_batch_tokens = int(max_batch_tokens)
+        self.max_batch_size = int(max_batch_size)
+        self.doc_tokens: dict[str, list[int]] = {}
+        self.add_documents(descriptions)
+
+    def _tokenize(self, texts: list[str], max_length: int) -> list[list[int]]:
+        return self.tokenizer(
+            texts, add_special_tokens=False, truncation=True, max_length=max_length,
+        )["input_ids"]
+
+    def add_documents(self, texts) -> int:
+        """Tokenise and cache texts not seen before; returns how many were added."""
+        missing = [text for text in dict.fromkeys(texts) if text not in self.doc_tokens]
+        if missing:
+            self.doc_tokens.update(zip(missing, self._tokenize(missing, self.max_doc_tokens)))
+        return len(missing)
+
+    def pair_ids(self, query: str, descriptions: list[str]) -> list[list[int]]:
+        """Model input ids of every (query, description) pair."""
+        self.add_documents(descriptions)
+        query_ids = self._tokenize([query], self.max_query_tokens)[0]
+        return [
+            self.tokenizer.build_inputs_with_special_tokens(query_ids, self.doc_tokens[text])
+            for text in descriptions
+        ]
+
+    def predict(self, sentences, batch_size: int | None = None, **kwargs) -> np.ndarray:
+        """Score ``[query, document]`` pairs like ``CrossEncoder.predict``.
+
+        Batches are cut by padded token count, not *batch_size*; other
+        CrossEncoder options are ignored.
+        """
+        pairs = list(sentences)
+        sequences: list[list[int]] = [[] for _ in pairs]
+        by_query: dict[str, list[int]] = {}
+        for position, (query, _) in enumerate(pairs):
+            by_query.setdefault(query, []).append(position)
+        for query, positions in by_query.items():
+            for position, ids in zip(positions, self.pair_ids(query, [pairs[i][1] for i in positions])):
+                sequences[position] = ids
+
+        lengths = np.array([len(ids) for ids in sequences], dtype=np.int64)
+        scores = np.empty(len(sequences), dtype=np.float32)
+        pad_id = self.tokenizer.pad_token_id or 0
+        for batch in plan_token_batches(lengths, self.max_batch_tokens, self.max_batch_size):
+            width = int(lengths[batch].max())
+            input_ids = np.full((len(batch), width), pad_id, dtype=np.int64)
+            attention_mask = np.zeros((len(batch), width), dtype=np.int64)
+            for row, position in enumerate(batch):
+                input_ids[row, :lengths[position]] = sequences[position]
+                attention_mask[row, :lengths[position]] = 1
+            scores[batch] = self._score(input_ids, attention_mask)
+        return scores
@@ -1,11 +1,35 @@
+import copy
 import json
 import re
 
 import numpy as np
 import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
 
-from app_logic.config import CANDIDATE_POOL, DEFAULT_TOP_K
+from app_logic.batching import plan_token_batches
+from app_logic.config import (
+    ADAPTIVE_POOL_GAP,
+    ADAPTIVE_POOL_MASS,
+    ADAPTIVE_POOL_MAX,
+    ADAPTIVE_POOL_MIN,
+    ADAPTIVE_POOL_TEMPERATURE,
+    CANDIDATE_POOL,
+    CASCADE_KEEP,
+    CASCADE_MARGIN,
+    CASCADE_MAX_SURVIVORS,
+    DEFAULT_TOP_K,
+    LOCAL_RERANK_BACKEND,
+    LOCAL_RERANK_CPU_THREADS,
+    LOCAL_RERANK_DOC_CHARS,
+    LOCAL_RERANK_METHOD,
+    LOCAL_RERANK_PAD_MULTIPLE,
+    LOCAL_RERANK_PREFIX_CACHE,
+    LOCAL_RERANK_SCORE_BATCH_SIZE,
+    LOCAL_RERANK_SCORE_BATCH_TOKENS,
+    LOCAL_RERANK_WINDOW,
+    LOCAL_RERANK_WINDOW_BATCH,
+    LOCAL_RERANK_WINDOW_STRIDE,
+)
+from app_logic.scoring import as_row_ids, dot_scores, search_top_k, select_top_k
 
 
 SMART_MIN_RESULTS = 3
@@ -14,6 +38,20 @@ SMART_MIN_PROB_FLOOR = 0.40
 SMART_RELATIVE_TO_BEST = 0.75
 SMART_MASS_TARGET = 0.82
 
+LOCAL_RANK_SYSTEM_PROMPT = (
+    "You rank course candidates and respond ONLY with JSON: {\"ranked_indices\": [..]}."
+)
+# Fixed start of every "generate" prompt; its KV cache is computed once per runtime.
+LOCAL_RANK_INSTRUCTIONS = (
+    "Rank these University of Tartu courses by relevance to the user query.\n"
+    "Return ONLY JSON in this format: {\"ranked_indices\": [3,1,2,...]}\n"
+    "Use each index at most once and include only listed indices.\n\n"
+)
+LOCAL_SCORE_SYSTEM_PROMPT = (
+    "Judge whether the University of Tartu course matches the student's query. "
+    "Answer only \"yes\" or \"no\"."
+)
+
 
 def _field(label: str, value: str) -> str | None:
     """Return 'Label: value' only if value is non-empty and not 'nan'."""
@@ -64,33 +102,203 @@ def build_course_context(df: pd.DataFrame) -> str:
     return "\n\n---\n\n".join(parts)
 
 
+def adaptive_pool_size(
+    scores: np.ndarray,
+    min_pool: int = ADAPTIVE_POOL_MIN,
+    max_pool: int = ADAPTIVE_POOL_MAX,
+    gap: float = ADAPTIVE_POOL_GAP,
+    mass: float = ADAPTIVE_POOL_MASS,
+    temperature: float = ADAPTIVE_POOL_TEMPERATURE,
+) -> int:
+    """Candidate count for best-first cosine *scores*, within [min_pool, max_pool].
+
+    Like ``_adaptive_keep_count`` two criteria are combined, but here the
+    smaller count wins because every extra candidate costs a reranker call:
+
+      * gap  – the pool ends before the first drop of at least *gap*
+        between neighbours (after *min_pool*);
+      * mass – the pool covers *mass* of the softmax(score / temperature)
+        weight.  Flat scores spread the mass and keep the pool large.
+    """
+    scores = np.asarray(scores, dtype=float)[:max_pool]
+    if len(scores) <= min_pool:
+        return len(scores)
+
+    weights = np.exp((scores - scores[0]) / temperature)
+    cumulative = np.cumsum(weights) / weights.sum()
+    keep_by_mass = int(np.searchsorted(cumulative, mass) + 1)
+
+    drops = scores[min_pool - 1:-1] - scores[min_pool:]
+    gaps = np.flatnonzero(drops >= gap)
+    keep_by_gap = int(gaps[0] + min_pool) if gaps.size else len(scores)
+
+    return int(np.clip(min(keep_by_mass, keep_by_gap), min_pool, len(scores)))
+
+
+def _pool_request(candidate_pool: int, adaptive_pool: bool) -> int:
+    return ADAPTIVE_POOL_MAX if adaptive_pool else candidate_pool
+
+
+def _trim_adaptive_pool(
+    top_ids: np.ndarray,
+    candidate_scores: np.ndarray,
+    adaptive_pool: bool,
+) -> tuple[np.ndarray, np.ndarray]:
+    if not adaptive_pool:
+        return top_ids, candidate_scores
+    keep = adaptive_pool_size(candidate_scores)
+    return top_ids[:keep], candidate_scores[:keep]
+
+
 def get_semantic_candidates(
     embedder,
     query: str,
-    filtered_df: pd.DataFrame,
-    filtered_embeddings: np.ndarray,
+    courses_df: pd.DataFrame,
+    embeddings: np.ndarray,
     candidate_pool: int = CANDIDATE_POOL,
-) -> tuple[pd.DataFrame, np.ndarray]:
+    row_mask: np.ndarray | pd.Series | None = None,
+    return_row_ids: bool = False,
+    adaptive_pool: bool = False,
+) -> tuple[pd.DataFrame, np.ndarray] | tuple[pd.DataFrame, np.ndarray, np.ndarray]:
     """Encode query, compute cosine similarity, return top-N candidates.
 
+    *embeddings* must be L2-normalised float32 rows (as returned by
+    ``load_embeddings``), so cosine similarity is a single dot product.
+    Pass the full catalogue plus *row_mask* (boolean mask or row positions)
+    to filter without slicing the matrix or the DataFrame; only the winning
+    rows are materialised.  With *adaptive_pool* the top ``ADAPTIVE_POOL_MAX``
+    are searched and cut to ``adaptive_pool_size`` (*candidate_pool* is
+    ignored).
+
     Returns:
-        (candidates_df, cosine_scores_for_candidates)
+        (candidates_df, cosine_scores_for_candidates) and, if
+        *return_row_ids*, the winners' row positions in *courses_df*.
     """
     query_vec = embedder.encode([query])
-    sem_scores = cosine_similarity(query_vec, filtered_embeddings)[0]
-    candidate_k = min(candidate_pool, len(filtered_df))
-    top_indices = np.argsort(sem_scores)[::-1][:candidate_k]
-    candidates_df = filtered_df.iloc[top_indices].reset_index(drop=True)
-    candidate_scores = sem_scores[top_indices]
+    top_ids, candidate_scores = search_top_k(
+        query_vec, embeddings, _pool_request(candidate_pool, adaptive_pool),
+        row_mask=_mask_values(row_mask),
+    )
+    top_ids, candidate_scores = _trim_adaptive_pool(top_ids, candidate_scores, adaptive_pool)
+    candidates_df = courses_df.iloc[top_ids].reset_index(drop=True)
+    if return_row_ids:
+        return candidates_df, candidate_scores, top_ids
     return candidates_df, candidate_scores
 
 
+def get_index_candidates(
+    embedder,
+    query: str,
+    courses_df: pd.DataFrame,
+    vector_index,
+    row_mask: np.ndarray | pd.Series | None = None,
+    candidate_pool: int = CANDIDATE_POOL,
+    adaptive_pool: bool = False,
+) -> tuple[pd.DataFrame, np.ndarray]:
+    """Encode query and fetch top-N candidates from a vector index.
+
+    Args:
+        courses_df: the full course DataFrame the index was built over.
+        vector_index: index from ``app_logic.vector_index``.
+        row_mask: optional filter mask (or row positions) over *courses_df*.
+        adaptive_pool: size the pool with ``adaptive_pool_size``.
+
+    Returns:
+        (candidates_df, cosine_scores_for_candidates)
+    """
+    query_vec = embedder.encode([query])[0]
+    top_ids, candidate_scores = vector_index.search(
+        query_vec, _pool_request(candidate_pool, adaptive_pool), row_mask=_mask_values(row_mask),
+    )
+    top_ids, candidate_scores = _trim_adaptive_pool(
+        np.asarray(top_ids), np.asarray(candidate_scores, dtype=float), adaptive_pool,
+    )
+    candidates_df = courses_df.iloc[top_ids].reset_index(drop=True)
+    return candidates_df, np.asarray(candidate_scores, dtype=float)
+
+
+def _mask_values(row_mask: np.ndarray | pd.Series | None) -> np.ndarray | None:
+    """Unwrap a filter mask to numpy; an all-True mask means no filtering."""
+    if row_mask is None:
+        return None
+    values = row_mask.to_numpy() if isinstance(row_mask, pd.Series) else np.asarray(row_mask)
+    if values.dtype == bool and values.all():
+        return None
+    return values
+
+
+def _cross_encoder_scores(reranker, query: str, candidates_df: pd.DataFrame, score_cache=None) -> np.ndarray:
+    """One cross-encoder logit per candidate, through *score_cache* if given."""
+    descriptions = candidates_df["description"].fillna("").astype(str).tolist()
+    if score_cache is not None:
+        return score_cache.score(
+            reranker, query, candidates_df["aine_kood"].astype(str).tolist(), descriptions,
+        )
+    return np.asarray(reranker.predict([[query, desc] for desc in descriptions]), dtype=float)
+
+
+def cascade_survivors(
+    scores: np.ndarray,
+    keep: int = CASCADE_KEEP,
+    margin: float = CASCADE_MARGIN,
+    max_survivors: int = CASCADE_MAX_SURVIVORS,
+) -> np.ndarray:
+    """Positions passed on from the first cascade stage, best first.
+
+    The top *keep* always survive; candidates within *margin* logits of the
+    last kept score are too close to call and survive too, up to
+    *max_survivors*.
+    """
+    scores = np.asarray(scores, dtype=float)
+    if len(scores) == 0:
+        return np.array([], dtype=np.int64)
+    order = np.argsort(scores)[::-1]
+    keep = min(max(1, keep), len(order))
+    threshold = scores[order[keep - 1]] - margin
+    survivors = order[scores[order] >= threshold]
+    return survivors[:max(keep, max_survivors)]
+
+
+def cascade_rerank_candidates(
+    first_stage,
+    reranker,
+    query: str,
+    candidates_df: pd.DataFrame,
+    top_k: int | None = DEFAULT_TOP_K,
+    return_scores: bool = False,
+    score_cache=None,
+    first_stage_cache=None,
+) -> pd.DataFrame | tuple[pd.DataFrame, np.ndarray]:
+    """Two-stage rerank: a small cross-encoder prunes, the large one decides.
+
+    *first_stage* scores the whole pool; only ``cascade_survivors`` reach
+    *reranker*, so the result (and its confidence scores) is exactly what
+    ``rerank_candidates`` returns for that shortlist.
+
+    Args:
+        first_stage: small CrossEncoder-compatible model.
+        reranker: the full cross-encoder.
+        score_cache / first_stage_cache: optional ``RerankScoreCache`` per model.
+    """
+    first_scores = _cross_encoder_scores(first_stage, query, candidates_df, first_stage_cache)
+    survivors = cascade_survivors(first_scores, keep=max(CASCADE_KEEP, top_k or 0))
+    return rerank_candidates(
+        reranker,
+        query,
+        candidates_df.iloc[survivors],
+        top_k=top_k,
+        return_scores=return_scores,
+        score_cache=score_cache,
+    )
+
+
 def rerank_candidates(
     reranker,
     query: str,
     candidates_df: pd.DataFrame,
     top_k: int | None = DEFAULT_TOP_K,
     return_scores: bool = False,
+    score_cache=None,
 ) -> pd.DataFrame | tuple[pd.DataFrame, np.ndarray]:
     """Re-rank candidates with a cross-encoder and return the best ones.
 
@@ -100,12 +308,9 @@ def rerank_candidates(
         candidates_df: pre-filtered candidates from semantic search.
         top_k: if set, return exactly this many; if None, use smart confidence cutoff.
         return_scores: if True, also return selected confidence scores (0..1).
+        score_cache: optional ``RerankScoreCache``; only uncached pairs are scored.
     """
-    pairs = [
-        [query, desc]
-        for desc in candidates_df["description"].fillna("").tolist()
-    ]
-    rerank_scores = reranker.predict(pairs)
+    rerank_scores = _cross_encoder_scores(reranker, query, candidates_df, score_cache)
     sorted_idx = np.argsort(rerank_scores)[::-1]
 
     if top_k is not None:
@@ -124,44 +329,92 @@ def rerank_candidates(
     return selected_df, selected_confidence
 
 
+def local_rerank_document(row: pd.Series, max_chars: int = LOCAL_RERANK_DOC_CHARS) -> str:
+    """Course text judged by the local LLM in the ``logits`` method."""
+    title = f"{row.get('aine_kood', '')} {row.get('nimi_et', '')}".strip()
+    return f"{title}\n{str(row.get('description', ''))[:max_chars]}"
+
+
+def local_rank_prompt(query: str, candidates_df: pd.DataFrame) -> str:
+    """User prompt of the ``generate`` method: instructions, query, candidate JSON."""
+    payload: list[dict[str, str | int]] = []
+    for idx, (_, row) in enumerate(candidates_df.iterrows(), start=1):
+        payload.append({
+            "index": idx,
+            "aine_kood": str(row.get("aine_kood", "")),
+            "nimi_et": str(row.get("nimi_et", "")),
+            "description": str(row.get("description", ""))[:260],
+        })
+    return (
+        LOCAL_RANK_INSTRUCTIONS
+        + f"Query: {query}\n\n"
+        + f"Candidates: {json.dumps(payload, ensure_ascii=False)}"
+    )
+
+
 def rerank_candidates_with_local_llm(
     query: str,
     candidates_df: pd.DataFrame,
     rerank_runtime,
     top_k: int | None = DEFAULT_TOP_K,
     return_candidate_indices: bool = False,
-) -> pd.DataFrame | tuple[pd.DataFrame, np.ndarray]:
+    method: str = LOCAL_RERANK_METHOD,
+    return_scores: bool = False,
+) -> pd.DataFrame | tuple:
     """Re-rank candidates with a small local Transformers model.
 
-    The model receives a compact JSON list of candidate snippets and returns
-    an ordered list of candidate indices. If parsing fails, falls back to
-    the original semantic order.
+    ``method="logits"`` scores every candidate with a yes/no relevance
+    judgement read from one batched forward pass
+    (``local_llm_relevance_scores``) and sorts by it.  ``method="generate"``
+    gives the model a compact JSON list of candidate snippets and parses
+    the ordered list of indices it writes; if parsing fails, the original
+    semantic order is kept.  ``method="window"`` does the same over
+    overlapping windows of the pool (``windowed_rank_with_local_llm``), so
+    pools larger than one prompt can be ranked.
+
+    With *return_candidate_indices* the positions of the selected rows in
+    *candidates_df* are returned as well; with *return_scores* also their
+    relevance probabilities (None for the listwise methods).
     """
-    if candidates_df.empty:
+    def result(selected_indices: np.ndarray, confidence: np.ndarray | None = None):
+        selected_df = prepared_df.iloc[selected_indices]
+        extras = []
         if return_candidate_indices:
-            return candidates_df, np.array([], dtype=int)
-        return candidates_df
+            extras.append(selected_indices)
+        if return_scores:
+            extras.append(confidence)
+        return (selected_df, *extras) if extras else selected_df
+
+    prepared_df = candidates_df.reset_index(drop=True)
+    if candidates_df.empty:
+        return result(np.array([], dtype=int), np.array([], dtype=float) if method == "logits" else None)
 
     limit = len(candidates_df) if top_k is None else top_k
     limit = min(limit, len(candidates_df))
-    prepared_df = candidates_df.reset_index(drop=True)
+    model_name = rerank_runtime.get("model_name", "unknown")
 
-    payload: list[dict[str, str | int]] = []
-    for idx, (_, row) in enumerate(prepared_df.iterrows(), start=1):
-        payload.append({
-            "index": idx,
-            "aine_kood": str(row.get("aine_kood", "")),
-            "nimi_et": str(row.get("nimi_et", "")),
-            "description": str(row.get("description", ""))[:260],
-        })
+    if method == "logits":
+        documents = [local_rerank_document(row) for _, row in prepared_df.iterrows()]
+        try:
+            scores = local_llm_relevance_scores(rerank_runtime, query, documents)
+        except Exception as exc:
+            raise RuntimeError(
+                f"Kohalik Transformers rerank ebaõnnestus ({model_name}): {exc}"
+            ) from exc
+        selected_indices = np.argsort(-scores, kind="stable")[:limit]
+        return result(selected_indices, _to_confidence(scores[selected_indices], score_kind="logit"))
+    if method == "window":
+        try:
+            order = windowed_rank_with_local_llm(query, prepared_df, rerank_runtime)
+        except Exception as exc:
+            raise RuntimeError(
+                f"Kohalik Transformers rerank ebaõnnestus ({model_name}): {exc}"
+            ) from exc
+        return result(np.asarray(order[:limit], dtype=int))
+    if method != "generate":
+        raise ValueError(f"Unsupported local rerank method: {method}")
 
-    prompt = (
-        "Rank these University of Tartu courses by relevance to the user query.\n"
-        "Return ONLY JSON in this format: {\"ranked_indices\": [3,1,2,...]}\n"
-        "Use each index at most once and include only listed indices.\n\n"
-        f"Query: {query}\n\n"
-        f"Candidates: {json.dumps(payload, ensure_ascii=False)}"
-    )
+    prompt = local_rank_prompt(query, prepared_df)
 
     try:
         text = generate_local_rerank_response(
@@ -169,25 +422,76 @@ def rerank_candidates_with_local_llm(
             prompt,
         )
     except Exception as exc:
-        model_name = rerank_runtime.get("model_name", "unknown")
         raise RuntimeError(
             f"Kohalik Transformers rerank ebaõnnestus ({model_name}): {exc}"
         ) from exc
 
     ranked_indices = _parse_ranked_indices(text, len(prepared_df))
     if not ranked_indices:
-        selected_indices = np.arange(limit, dtype=int)
-        selected_df = prepared_df.iloc[selected_indices]
-        if return_candidate_indices:
-            return selected_df, selected_indices
-        return selected_df
+        return result(np.arange(limit, dtype=int))
 
     zero_based = [i - 1 for i in ranked_indices]
-    selected_indices = np.asarray(zero_based[:limit], dtype=int)
-    selected_df = prepared_df.iloc[selected_indices]
-    if return_candidate_indices:
-        return selected_df, selected_indices
-    return selected_df
+    return result(np.asarray(zero_based[:limit], dtype=int))
+
+
+def _window_starts(n_items: int, window: int, stride: int) -> list[int]:
+    """Start offsets of windows of *window* items every *stride*; the last ends at *n_items*."""
+    if n_items <= window:
+        return [0]
+    return sorted(set(range(0, n_items - window, stride)) | {n_items - window})
+
+
+def _rank_windows(query: str, candidates_df: pd.DataFrame, windows: list[list[int]], rerank_runtime) -> list[list[int]]:
+    """Listwise ranking of each window (positions in *candidates_df*), best first."""
+    prompts = [local_rank_prompt(query, candidates_df.iloc[members]) for members in windows]
+    texts: list[str] = []
+    for start in range(0, len(prompts), LOCAL_RERANK_WINDOW_BATCH):
+        texts.extend(generate_local_rerank_responses(
+            rerank_runtime, prompts[start:start + LOCAL_RERANK_WINDOW_BATCH],
+        ))
+    rankings = []
+    for members, text in zip(windows, texts):
+        ranked = _parse_ranked_indices(text, len(members))
+        rankings.append([members[i - 1] for i in ranked] if ranked else list(members))
+    return rankings
+
+
+def windowed_rank_with_local_llm(
+    query: str,
+    candidates_df: pd.DataFrame,
+    rerank_runtime,
+    window: int = LOCAL_RERANK_WINDOW,
+    stride: int = LOCAL_RERANK_WINDOW_STRIDE,
+) -> list[int]:
+    """Rank a large pool with listwise prompts of at most *window* candidates.
+
+    Each level covers the current order with windows every *stride*
+    candidates, so neighbouring windows overlap and a candidate that wins
+    its lower window is compared again in the next one.  All windows of a
+    level are independent and go to ``generate`` in batches.  A candidate's
+    level rank is its best rank in any window holding it (ties keep the
+    current order); the better half moves on until one window is left,
+    whose ranking heads the result.  Candidates dropped at later levels
+    rank above those dropped earlier.
+
+    Returns positions in *candidates_df*, best first.  Prompt length is
+    bounded by *window*; the number of prompts is about 4n / window.
+    """
+    order = list(range(len(candidates_df)))
+    dropped: list[list[int]] = []
+    while len(order) > window:
+        windows = [order[start:start + window] for start in _window_starts(len(order), window, stride)]
+        best_rank: dict[int, int] = {}
+        for ranking in _rank_windows(query, candidates_df, windows, rerank_runtime):
+            for rank, position in enumerate(ranking):
+                best_rank[position] = min(best_rank.get(position, rank), rank)
+        current = {position: i for i, position in enumerate(order)}
+        merged = sorted(order, key=lambda position: (best_rank[position], current[position]))
+        keep = max(window, (len(order) + 1) // 2)
+        dropped.append(merged[keep:])
+        order = merged[:keep]
+    final = _rank_windows(query, candidates_df, [order], rerank_runtime)[0] if order else []
+    return final + [position for level in reversed(dropped) for position in level]
 
 
 def select_semantic_results(
@@ -253,8 +557,26 @@ def _to_confidence(scores: np.ndarray, score_kind: str) -> np.ndarray:
     raise ValueError(f"Unsupported score_kind: {score_kind}")
 
 
-def load_local_transformers_reranker(model_name: str):
-    """Load a small causal LM for local list reranking."""
+def load_local_transformers_reranker(
+    model_name: str,
+    reuse_prefix: bool = LOCAL_RERANK_PREFIX_CACHE,
+    backend: str = LOCAL_RERANK_BACKEND,
+):
+    """Load a small causal LM for local list reranking.
+
+    With *reuse_prefix* the KV cache of the fixed chat prefix of every
+    ``generate`` prompt (system message and ranking instructions) is computed
+    here once, and the ``logits`` method prefills each query's shared prefix
+    once for all its candidates (``reuse_query_prefix``, only when the
+    model's KV cache can be expanded to a batch).
+
+    ``backend="cpu-int8"`` runs on the CPU with the Linear layers
+    dynamically quantised to int8, torch limited to
+    ``LOCAL_RERANK_CPU_THREADS`` threads (process-wide) and prompt widths
+    padded up to multiples of ``LOCAL_RERANK_PAD_MULTIPLE``, so repeated
+    calls reuse the same few input shapes (prompts continuing the cached
+    prefix are not padded).
+    """
     torch = __import__("torch")
     transformers = __import__("transformers", fromlist=["AutoTokenizer", "AutoModelForCausalLM"])
 
@@ -262,14 +584,22 @@ def load_local_transformers_reranker(model_name: str):
     AutoModelForCausalLM = getattr(transformers, "AutoModelForCausalLM")
 
     tokenizer = AutoTokenizer.from_pretrained(model_name)
+    if tokenizer.pad_token_id is None and tokenizer.eos_token_id is not None:
+        tokenizer.pad_token_id = tokenizer.eos_token_id
 
     model_kwargs: dict = {"low_cpu_mem_usage": True}
-    if torch.cuda.is_available() or torch.backends.mps.is_available():
+    cpu_int8 = backend == "cpu-int8"
+    if cpu_int8:
+        if LOCAL_RERANK_CPU_THREADS:
+            torch.set_num_threads(LOCAL_RERANK_CPU_THREADS)
+    elif torch.cuda.is_available() or torch.backends.mps.is_available():
         model_kwargs["torch_dtype"] = torch.float16
 
     model = AutoModelForCausalLM.from_pretrained(model_name, **model_kwargs)
 
-    if torch.cuda.is_available():
+    if cpu_int8:
+        device = "cpu"
+    elif torch.cuda.is_available():
         device = "cuda"
     elif torch.backends.mps.is_available():
         device = "mps"
@@ -279,69 +609,260 @@ def load_local_transformers_reranker(model_name: str):
     model = model.to(device)
     model.eval()
 
-    if tokenizer.pad_token_id is None and tokenizer.eos_token_id is not None:
-        tokenizer.pad_token_id = tokenizer.eos_token_id
-
-    return {
+    runtime = {
         "tokenizer": tokenizer,
         "model": model,
         "device": device,
         "model_name": model_name,
+        "reuse_prefix": reuse_prefix,
     }
+    if cpu_int8:
+        # The quantised LM head has no indexable weight; keep the two answer rows.
+        runtime["answer_head"] = _answer_head(model, tokenizer)
+        runtime["model"] = model = torch.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True,
+        )
+        runtime["pad_multiple"] = LOCAL_RERANK_PAD_MULTIPLE
+    if reuse_prefix:
+        prefix_text = _chat_prefix(tokenizer, LOCAL_RANK_SYSTEM_PROMPT, LOCAL_RANK_INSTRUCTIONS)
+        if prefix_text:
+            prefix_ids = tokenizer(prefix_text)["input_ids"]
+            runtime["prompt_prefix"] = {
+                "text": prefix_text,
+                "ids": prefix_ids,
+                "cache": _prefill(runtime, prefix_ids),
+            }
+        # The logits method expands each query's prefix cache to a whole batch,
+        # which legacy tuple caches cannot do; decide once instead of per query.
+        prompt_prefix = runtime.get("prompt_prefix")
+        runtime["reuse_query_prefix"] = bool(prompt_prefix) and hasattr(
+            prompt_prefix["cache"], "batch_repeat_interleave",
+        )
+    return runtime
 
 
-def generate_local_rerank_response(rerank_runtime, prompt: str) -> str:
-    """Generate local reranking output text with a cached Transformers model."""
-    torch = __import__("torch")
-    tokenizer = rerank_runtime["tokenizer"]
-    model = rerank_runtime["model"]
-    device = rerank_runtime["device"]
-
+def _chat_text(tokenizer, system: str, user: str, **template_options) -> str:
+    """Prompt text in the model's chat format (plain text if it has none)."""
     messages = [
-        {
-            "role": "system",
-            "content": (
-                "You rank course candidates and respond ONLY with JSON: "
-                "{\"ranked_indices\": [..]}."
-            ),
-        },
-        {"role": "user", "content": prompt},
+        {"role": "system", "content": system},
+        {"role": "user", "content": user},
     ]
-
     if hasattr(tokenizer, "apply_chat_template"):
         try:
-            model_input_text = tokenizer.apply_chat_template(
+            return tokenizer.apply_chat_template(
                 messages,
                 tokenize=False,
                 add_generation_prompt=True,
+                **template_options,
             )
         except Exception:
-            model_input_text = f"{messages[0]['content']}\n\n{messages[1]['content']}"
-    else:
-        model_input_text = f"{messages[0]['content']}\n\n{messages[1]['content']}"
+            pass
+    return f"{system}\n\n{user}"
 
-    encoded = tokenizer(
-        model_input_text,
-        return_tensors="pt",
-        truncation=True,
-        max_length=2048,
-    )
-    encoded = {key: value.to(device) for key, value in encoded.items()}
+
+def _chat_prefix(tokenizer, system: str, user_start: str, **template_options) -> str:
+    """Chat text up to the end of *user_start*, the fixed start of the user message."""
+    marker = "\u2063PROMPT\u2063"
+    text = _chat_text(tokenizer, system, user_start + marker, **template_options)
+    position = text.find(marker)
+    return text[:position] if position > 0 else ""
+
+
+def _prefill(rerank_runtime, ids: list[int]):
+    """KV cache of the token sequence *ids* (batch of one)."""
+    torch = __import__("torch")
+    with torch.inference_mode():
+        return rerank_runtime["model"](
+            input_ids=torch.tensor([ids], device=rerank_runtime["device"]),
+            use_cache=True,
+        ).past_key_values
+
+
+def _answer_token_ids(tokenizer) -> tuple[int, int]:
+    """First token ids of the answers "yes" and "no"."""
+    yes_ids = tokenizer.encode("yes", add_special_tokens=False)
+    no_ids = tokenizer.encode("no", add_special_tokens=False)
+    return yes_ids[0], no_ids[0]
+
+
+def _answer_head(model, tokenizer):
+    """(weight, bias) rows of the LM head for the answers "yes" and "no"."""
+    head = model.get_output_embeddings()
+    answer_ids = list(_answer_token_ids(tokenizer))
+    weight = head.weight[answer_ids].detach().clone()
+    bias = head.bias[answer_ids].detach().clone() if getattr(head, "bias", None) is not None else None
+    return weight, bias
+
+
+def local_llm_relevance_scores(rerank_runtime, query: str, documents: list[str]) -> np.ndarray:
+    """Log-odds that each document is relevant to *query*, without decoding.
+
+    Every (query, document) prompt ends where the model answers "yes" or
+    "no"; the score is logit(yes) - logit(no) of that next token.  Prompts
+    run in token-budgeted, length-sorted batches, and only the two answer
+    rows of the LM head are applied to the last hidden state.  With the
+    runtime's ``reuse_prefix`` the shared chat prefix is prefilled once per
+    query.  A runtime from ``remote_local_rerank_runtime`` scores in the
+    model server.
+    """
+    if "score" in rerank_runtime:
+        return np.asarray(rerank_runtime["score"](query, documents), dtype=np.float32)
+    if not documents:
+        return np.array([], dtype=np.float32)
+    torch = __import__("torch")
+    tokenizer = rerank_runtime["tokenizer"]
+    model = rerank_runtime["model"]
+    device = rerank_runtime["device"]
+
+    # enable_thinking is read by Qwen3 templates and ignored by others.
+    user_start = f"Query: {query}\n\nCourse:\n"
+    texts = [
+        _chat_text(tokenizer, LOCAL_SCORE_SYSTEM_PROMPT, user_start + document, enable_thinking=False)
+        for document in documents
+    ]
+
+    # All prompts of one query share everything up to the course text: prefill
+    # it once and run only the course suffixes against a copy of its cache.
+    prefix_cache, prefix_length = None, 0
+    prefix_text = ""
+    if rerank_runtime.get("reuse_prefix") and rerank_runtime.get("reuse_query_prefix"):
+        prefix_text = _chat_prefix(tokenizer, LOCAL_SCORE_SYSTEM_PROMPT, user_start, enable_thinking=False)
+    if prefix_text and all(text.startswith(prefix_text) for text in texts):
+        prefix_ids = tokenizer(prefix_text, add_special_tokens=False)["input_ids"]
+        prefix_cache = _prefill(rerank_runtime, prefix_ids)
+        texts = [text[len(prefix_text):] for text in texts]
+        prefix_length = len(prefix_ids)
+    sequences = tokenizer(texts, add_special_tokens=False)["input_ids"]
+    lengths = np.array([len(ids) for ids in sequences], dtype=np.int64)
+
+    weight, bias = rerank_runtime.get("answer_head") or _answer_head(model, tokenizer)
+
+    scores = np.empty(len(sequences), dtype=np.float32)
+    pad_id = tokenizer.pad_token_id or 0
+    batches = plan_token_batches(lengths, LOCAL_RERANK_SCORE_BATCH_TOKENS, LOCAL_RERANK_SCORE_BATCH_SIZE)
+    for batch in batches:
+        width = _padded_width(int(lengths[batch].max()), rerank_runtime.get("pad_multiple"))
+        input_ids = np.full((len(batch), width), pad_id, dtype=np.int64)
+        attention_mask = np.zeros((len(batch), width), dtype=np.int64)
+        for row, position in enumerate(batch):
+            # Right padding: each prompt's answer position is its own last token.
+            input_ids[row, :lengths[position]] = sequences[position]
+            attention_mask[row, :lengths[position]] = 1
+        past_key_values = None
+        if prefix_cache is not None:
+            past_key_values = copy.deepcopy(prefix_cache)
+            past_key_values.batch_repeat_interleave(len(batch))
+            attention_mask = np.concatenate(
+                [np.ones((len(batch), prefix_length), dtype=np.int64), attention_mask], axis=1,
+            )
+        with torch.inference_mode():
+            hidden = model.base_model(
+                input_ids=torch.from_numpy(input_ids).to(device),
+                attention_mask=torch.from_numpy(attention_mask).to(device),
+                past_key_values=past_key_values,
+                use_cache=past_key_values is not None,
+            ).last_hidden_state
+            last = hidden[
+                torch.arange(len(batch), device=hidden.device),
+                torch.from_numpy(lengths[batch] - 1).to(hidden.device),
+            ]
+            logits = last @ weight.T
+            if bias is not None:
+                logits = logits + bias
+        scores[batch] = (logits[:, 0] - logits[:, 1]).float().cpu().numpy()
+    return scores
+
+
+def _padded_width(length: int, multiple: int | None) -> int:
+    """*length* rounded up to a multiple of *multiple* (unchanged if unset)."""
+    return -(-length // multiple) * multiple if multiple else length
+
+
+def _generate_padded(rerank_runtime, texts: list[str], max_new_tokens: int) -> list[str]:
+    """Greedy replies to chat-formatted *texts* from one ``generate`` call.
+
+    Prompts are left-padded to a common width, rounded up to the runtime's
+    ``pad_multiple`` when it has one.
+    """
+    torch = __import__("torch")
+    tokenizer = rerank_runtime["tokenizer"]
+    model = rerank_runtime["model"]
+    device = rerank_runtime["device"]
+
+    sequences = tokenizer(texts, truncation=True, max_length=2048)["input_ids"]
+    width = _padded_width(max(len(ids) for ids in sequences), rerank_runtime.get("pad_multiple"))
+    input_ids = np.full((len(sequences), width), tokenizer.pad_token_id or 0, dtype=np.int64)
+    attention_mask = np.zeros((len(sequences), width), dtype=np.int64)
+    for row, ids in enumerate(sequences):
+        input_ids[row, width - len(ids):] = ids
+        attention_mask[row, width - len(ids):] = 1
 
     with torch.inference_mode():
         output = model.generate(
-            **encoded,
+            input_ids=torch.from_numpy(input_ids).to(device),
+            attention_mask=torch.from_numpy(attention_mask).to(device),
             do_sample=False,
-            max_new_tokens=96,
+            max_new_tokens=max_new_tokens,
             pad_token_id=tokenizer.pad_token_id,
             eos_token_id=tokenizer.eos_token_id,
         )
+    return [tokenizer.decode(row[width:], skip_special_tokens=True).strip() for row in output]
 
-    prompt_len = encoded["input_ids"].shape[1]
-    completion_ids = output[0][prompt_len:]
+
+def generate_local_rerank_response(rerank_runtime, prompt: str, max_new_tokens: int = 96) -> str:
+    """Generate local reranking output text with a cached Transformers model.
+
+    If *prompt* starts with ``LOCAL_RANK_INSTRUCTIONS`` and the runtime holds
+    their precomputed KV cache, only the rest of the prompt is prefilled.
+    A runtime from ``remote_local_rerank_runtime`` carries its own
+    ``generate`` callable (the model runs in the model server).
+    """
+    if "generate" in rerank_runtime:
+        return rerank_runtime["generate"](prompt)
+    tokenizer = rerank_runtime["tokenizer"]
+    model_input_text = _chat_text(tokenizer, LOCAL_RANK_SYSTEM_PROMPT, prompt)
+
+    prefix = rerank_runtime.get("prompt_prefix") if rerank_runtime.get("reuse_prefix") else None
+    if prefix is None or not model_input_text.startswith(prefix["text"]):
+        return _generate_padded(rerank_runtime, [model_input_text], max_new_tokens)[0]
+
+    torch = __import__("torch")
+    suffix_ids = tokenizer(
+        model_input_text[len(prefix["text"]):],
+        add_special_tokens=False,
+        truncation=True,
+        max_length=2048 - len(prefix["ids"]),
+    )["input_ids"]
+    input_ids = torch.tensor([prefix["ids"] + suffix_ids], device=rerank_runtime["device"])
+    with torch.inference_mode():
+        output = rerank_runtime["model"].generate(
+            input_ids=input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            # generate() extends the cache in place; the runtime keeps the original.
+            past_key_values=copy.deepcopy(prefix["cache"]),
+            do_sample=False,
+            max_new_tokens=max_new_tokens,
+            pad_token_id=tokenizer.pad_token_id,
+            eos_token_id=tokenizer.eos_token_id,
+        )
+    completion_ids = output[0][input_ids.shape[1]:]
     return tokenizer.decode(completion_ids, skip_special_tokens=True).strip()
 
 
+def generate_local_rerank_responses(rerank_runtime, prompts: list[str], max_new_tokens: int = 96) -> list[str]:
+    """Replies to several ranking prompts from one batched ``generate`` call.
+
+    Prompts are left-padded to a common length, so the cached prompt prefix
+    is not used; a single prompt goes through
+    ``generate_local_rerank_response`` (and its prefix cache) instead.
+    """
+    if "generate" in rerank_runtime or len(prompts) <= 1:
+        return [generate_local_rerank_response(rerank_runtime, prompt, max_new_tokens) for prompt in prompts]
+    tokenizer = rerank_runtime["tokenizer"]
+    texts = [_chat_text(tokenizer, LOCAL_RANK_SYSTEM_PROMPT, prompt) for prompt in prompts]
+    return _generate_padded(rerank_runtime, texts, max_new_tokens)
+
+
 def _parse_ranked_indices(text: str, n_items: int) -> list[int]:
     """Parse a ranked index list from LLM text and complete missing indices."""
     ranked: list[int] = []
@@ -443,18 +964,20 @@ def batch_cosine_similarity(
 
     Args:
         query_vectors: (N, D) array of encoded queries.
-        embeddings: (M, D) array of course embeddings.
+        embeddings: (M, D) array of L2-normalised course embeddings.
 
     Returns:
         (N, M) similarity matrix.
     """
-    return cosine_similarity(query_vectors, embeddings)
+    return dot_scores(query_vectors, embeddings)
 
 
 def get_semantic_candidates_from_scores(
     scores_row: np.ndarray,
-    filtered_df: pd.DataFrame,
+    courses_df: pd.DataFrame,
     candidate_pool: int = CANDIDATE_POOL,
+    row_mask: np.ndarray | pd.Series | None = None,
+    adaptive_pool: bool = False,
 ) -> tuple[pd.DataFrame, np.ndarray]:
     """Extract top-N candidates from a pre-computed similarity score row.
 
@@ -462,15 +985,19 @@ def get_semantic_candidates_from_scores(
     making benchmark loops much faster.
 
     Args:
-        scores_row: 1-D array of cosine similarities (length = len(filtered_df)).
-        filtered_df: the course DataFrame aligned with scores_row.
+        scores_row: 1-D array of cosine similarities (length = len(courses_df)).
+        courses_df: the course DataFrame aligned with scores_row.
         candidate_pool: how many top candidates to return.
+        row_mask: optional filter mask (or row positions) over *courses_df*.
+        adaptive_pool: size the pool with ``adaptive_pool_size``.
 
     Returns:
         (candidates_df, cosine_scores_for_candidates)
     """
-    candidate_k = min(candidate_pool, len(filtered_df))
-    top_indices = np.argsort(scores_row)[::-1][:candidate_k]
-    candidates_df = filtered_df.iloc[top_indices].reset_index(drop=True)
-    candidate_scores = scores_row[top_indices]
+    row_ids = as_row_ids(_mask_values(row_mask), len(scores_row))
+    top_indices = select_top_k(scores_row, _pool_request(candidate_pool, adaptive_pool), row_ids)
+    top_indices, candidate_scores = _trim_adaptive_pool(
+        top_indices, scores_row[top_indices], adaptive_pool,
+    )
+    candidates_df = courses_df.iloc[top_indices].reset_index(drop=True)
     return candidates_df, candidate_scores
@@ -0,0 +1,232 @@
+"""Cross-session micro-batching for the shared embedder and reranker.
+
+Every Streamlit session runs in its own script thread but shares the
+``st.cache_resource`` models.  ``MicroBatcher`` puts one worker thread in
+front of a model: requests from all sessions go into a queue and are
+answered through futures.  The worker takes the first waiting request,
+drains whatever else is already queued and runs them as one forward pass;
+requests arriving during a pass form the next batch.  Only while batches
+are actually shared does it also wait up to ``max_wait_ms`` for more, so a
+single user is not slowed down, while concurrent users share batches
+instead of competing for the cores with many tiny ones.
+
+``BatchedEmbedder`` and ``BatchedReranker`` expose the ``encode`` and
+``predict`` calls of the wrapped models (other attributes are delegated),
+so ``CachedEmbedder``, ``RerankScoreCache`` and the retrieval functions use
+them unchanged.
+"""
+
+import queue
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from app_logic.config import (
+    SCHEDULER_IDLE_SECONDS,
+    SCHEDULER_MAX_BATCH_ITEMS,
+    SCHEDULER_MAX_WAIT_MS,
+)
+
+# Live batchers by name, for the developer-view metrics.
+_BATCHERS: "weakref.WeakValueDictionary[str, MicroBatcher]" = weakref.WeakValueDictionary()
+
+
+@dataclass
+class _Request:
+    items: list
+    options: dict
+    key: tuple
+    future: Future = field(default_factory=Future)
+    queued_at: float = field(default_factory=time.perf_counter)
+
+
+class MicroBatcher:
+    """Coalesce concurrent ``fn(items, **options)`` calls into micro-batches.
+
+    *fn* takes a list of items and returns one result row per item.  Only
+    requests with equal keyword options share a batch.
+    """
+
+    def __init__(
+        self,
+        fn,
+        name: str = "model",
+        max_batch_items: int = SCHEDULER_MAX_BATCH_ITEMS,
+        max_wait_ms: float = SCHEDULER_MAX_WAIT_MS,
+        idle_seconds: float = SCHEDULER_IDLE_SECONDS,
+    ):
+        self.fn = fn
+        self.name = name
+        self.max_batch_items = int(max_batch_items)
+        self.max_wait = float(max_wait_ms) / 1000.0
+        self.idle_seconds = float(idle_seconds)
+        self._queue: queue.Queue[_Request] = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: threading.Thread | None = None
+        self._last_batch_requests = 0
+        _BATCHERS[name] = self
+        self._stats = {
+            "requests": 0,
+            "items": 0,
+            "batches": 0,
+            "max_batch_requests": 0,
+            "max_queue_depth": 0,
+            "wait_seconds": 0.0,
+        }
+
+    def submit(self, items: list, **options) -> Future:
+        """Queue *items*; the future resolves to their results (a numpy array)."""
+        key = tuple(sorted((name, repr(value)) for name, value in options.items()))
+        request = _Request(list(items), options, key)
+        with self._lock:
+            self._queue.put(request)
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._queue.qsize())
+            if self._worker is None:
+                # Started lazily; it exits after idle_seconds without work, so a
+                # model dropped from the Streamlit cache does not keep a thread.
+                self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._worker.start()
+        return request.future
+
+    def __call__(self, items: list, **options) -> np.ndarray:
+        return self.submit(items, **options).result()
+
+    def _collect(self, first: _Request, carry: deque) -> list[_Request]:
+        """First request plus compatible queued ones, within the item budget."""
+        batch = [first]
+        count = len(first.items)
+        for request in list(carry):
+            if request.key == first.key and count + len(request.items) <= self.max_batch_items:
+                carry.remove(request)
+                batch.append(request)
+                count += len(request.items)
+        # Wait for stragglers only under concurrent load.
+        wait = self.max_wait if self._last_batch_requests > 1 else 0.0
+        deadline = time.perf_counter() + wait
+        while count < self.max_batch_items:
+            timeout = deadline - time.perf_counter()
+            try:
+                request = self._queue.get_nowait() if timeout <= 0 else self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request.key != first.key or count + len(request.items) > self.max_batch_items:
+                carry.append(request)
+                if request.key == first.key:
+                    break
+                continue
+            batch.append(request)
+            count += len(request.items)
+        return batch
+
+    def _run(self) -> None:
+        carry: deque[_Request] = deque()
+        while True:
+            if carry:
+                first = carry.popleft()
+            else:
+                try:
+                    first = self._queue.get(timeout=self.idle_seconds)
+                except queue.Empty:
+                    with self._lock:
+                        if self._queue.empty():
+                            self._worker = None
+                            return
+                    continue
+            batch = self._collect(first, carry)
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: list[_Request]) -> None:
+        started = time.perf_counter()
+        items = [item for request in batch for item in request.items]
+        self._last_batch_requests = len(batch)
+        try:
+            results = np.asarray(self.fn(items, **batch[0].options))
+        except Exception as error:
+            for request in batch:
+                request.future.set_exception(error)
+            return
+        with self._lock:
+            self._stats["requests"] += len(batch)
+            self._stats["items"] += len(items)
+            self._stats["batches"] += 1
+            self._stats["max_batch_requests"] = max(self._stats["max_batch_requests"], len(batch))
+            self._stats["wait_seconds"] += sum(started - request.queued_at for request in batch)
+        start = 0
+        for request in batch:
+            request.future.set_result(results[start:start + len(request.items)])
+            start += len(request.items)
+
+    def stats(self) -> dict[str, float]:
+        """Queue depth and batch-size counters since start."""
+        with self._lock:
+            stats = dict(self._stats)
+        batches = max(stats["batches"], 1)
+        requests = max(stats["requests"], 1)
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": stats["max_queue_depth"],
+            "requests": stats["requests"],
+            "batches": stats["batches"],
+            "mean_batch_requests": stats["requests"] / batches,
+            "mean_batch_items": stats["items"] / batches,
+            "max_batch_requests": stats["max_batch_requests"],
+            "mean_wait_ms": stats["wait_seconds"] / requests * 1000.0,
+        }
+
+
+def scheduler_stats() -> dict[str, dict[str, float]]:
+    """``MicroBatcher.stats`` of every live batcher, by name."""
+    return {name: batcher.stats() for name, batcher in list(_BATCHERS.items())}
+
+
+class BatchedEmbedder:
+    """``encode``-compatible embedder whose calls share micro-batches."""
+
+    def __init__(self, model, name: str = "embedder", **batcher_options):
+        self.model = model
+        self.batcher = MicroBatcher(self._encode, name=name, **batcher_options)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def _encode(self, sentences: list[str], **kwargs) -> np.ndarray:
+        return np.asarray(self.model.encode(sentences, **kwargs))
+
+    def encode(self, sentences, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return self.model.encode(texts, **kwargs)
+        vectors = self.batcher(texts, **kwargs)
+        return vectors[0] if single else vectors
+
+    def stats(self) -> dict[str, float]:
+        return self.batcher.stats()
+
+
+class BatchedReranker:
+    """``predict``-compatible cross-encoder whose calls share micro-batches."""
+
+    def __init__(self, model, name: str = "reranker", **batcher_options):
+        self.model = model
+        self.batcher = MicroBatcher(self._predict, name=name, **batcher_options)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def _predict(self, pairs: list, **kwargs) -> np.ndarray:
+        return np.asarray(self.model.predict(pairs, **kwargs))
+
+    def predict(self, sentences, **kwargs) -> np.ndarray:
+        pairs = [list(pair) for pair in sentences]
+        if not pairs:
+            return np.array([], dtype=np.float32)
+        return self.batcher(pairs, **kwargs)
+
+    def stats(self) -> dict[str, float]:
+        return self.batcher.stats()
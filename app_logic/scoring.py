@@ -0,0 +1,131 @@
+"""Dot-product scoring kernel for pre-normalised embeddings.
+
+Course embeddings are L2-normalised and cast to float32 once at load time,
+so cosine similarity reduces to a single matrix product per query and the
+course matrix is never re-normalised on the hot path.  Top-k selection uses
+``np.argpartition`` (linear time) and only sorts the k winners.
+
+Matrices stored as float16 (see ``app_logic.embedding_store``) are upcast in
+row blocks, so a memory-mapped matrix is never copied whole.
+"""
+
+import numpy as np
+
+from app_logic.config import MASKED_GATHER_RATIO, MATRIX_ROW_BLOCK, SCORING_BLOCK_SIZE
+
+
+def normalize_embeddings(matrix: np.ndarray) -> np.ndarray:
+    """Return L2-normalised float32 rows (zero rows are left as zeros)."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _matrix_dot(matrix: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    """(Q, D) float32 queries against (M, D) rows -> (Q, M) float32 scores."""
+    if matrix.dtype == np.float32:
+        return queries @ matrix.T
+    scores = np.empty((len(queries), len(matrix)), dtype=np.float32)
+    for start in range(0, len(matrix), MATRIX_ROW_BLOCK):
+        block = np.asarray(matrix[start:start + MATRIX_ROW_BLOCK], dtype=np.float32)
+        scores[:, start:start + len(block)] = queries @ block.T
+    return scores
+
+
+def dot_scores(
+    query_vectors: np.ndarray,
+    normalized_embeddings: np.ndarray,
+    block_size: int = SCORING_BLOCK_SIZE,
+) -> np.ndarray:
+    """Cosine similarity of queries against pre-normalised course embeddings.
+
+    Args:
+        query_vectors: (D,) or (N, D) raw query embeddings; normalised here.
+        normalized_embeddings: (M, D) output of ``normalize_embeddings``.
+        block_size: queries scored per matmul, bounding the temporary size
+            when many queries are scored at once.
+
+    Returns:
+        (N, M) float32 similarity matrix.
+    """
+    queries = normalize_embeddings(query_vectors)
+    if len(queries) <= block_size:
+        return _matrix_dot(normalized_embeddings, queries)
+
+    scores = np.empty((len(queries), len(normalized_embeddings)), dtype=np.float32)
+    for start in range(0, len(queries), block_size):
+        stop = start + block_size
+        scores[start:stop] = _matrix_dot(normalized_embeddings, queries[start:stop])
+    return scores
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return indices of the k highest scores of a 1-D array, best first."""
+    k = min(int(k), len(scores))
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    if k < len(scores):
+        part = np.argpartition(scores, -k)[-k:]
+    else:
+        part = np.arange(len(scores))
+    return part[np.argsort(scores[part], kind="stable")[::-1]]
+
+
+def as_row_ids(row_mask: np.ndarray | None, n_rows: int) -> np.ndarray | None:
+    """Convert a boolean row mask or an index array into an array of row ids.
+
+    ``None`` (no filter) is passed through so callers can skip masking.
+    """
+    if row_mask is None:
+        return None
+    row_mask = np.asarray(row_mask)
+    if row_mask.dtype == bool:
+        if len(row_mask) != n_rows:
+            raise ValueError(
+                f"Row mask length ({len(row_mask)}) does not match row count ({n_rows})."
+            )
+        return np.flatnonzero(row_mask)
+    return row_mask.astype(np.int64, copy=False)
+
+
+def select_top_k(
+    scores: np.ndarray,
+    k: int,
+    row_ids: np.ndarray | None = None,
+) -> np.ndarray:
+    """Top-k global row ids from a full score row, restricted to *row_ids*."""
+    if row_ids is None:
+        return top_k_indices(scores, k)
+    return row_ids[top_k_indices(scores[row_ids], k)]
+
+
+def search_top_k(
+    query_vector: np.ndarray,
+    normalized_embeddings: np.ndarray,
+    k: int,
+    row_mask: np.ndarray | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Masked top-k search over the full embedding matrix without slicing it.
+
+    Broad filters are applied in the selection step: all rows are scored with
+    one matmul and only allowed rows compete for the top k.  Narrow filters
+    gather just the allowed rows, which is cheaper than scoring everything.
+
+    Returns:
+        (global_row_ids, cosine_scores), best first.
+    """
+    n_rows = len(normalized_embeddings)
+    row_ids = as_row_ids(row_mask, n_rows)
+    query = normalize_embeddings(query_vector)
+
+    if row_ids is not None and len(row_ids) * MASKED_GATHER_RATIO < n_rows:
+        scores = _matrix_dot(normalized_embeddings[row_ids], query)[0]
+        top = top_k_indices(scores, k)
+        return row_ids[top], scores[top]
+
+    scores = _matrix_dot(normalized_embeddings, query)[0]
+    top = select_top_k(scores, k, row_ids)
+    return top, scores[top]
@@ -0,0 +1,387 @@
+"""Vector indexes over the pre-computed course embeddings.
+
+All indexes share the same small interface so the app can swap them freely:
+
+    index.search(query_vector, k, row_mask=None) -> (row_ids, scores)
+
+``row_mask`` (a boolean mask or an array of row ids) restricts the search to
+a subset of catalogue rows (the sidebar filter result); returned ids are
+always global row positions in the course DataFrame and scores are cosine
+similarities.
+
+Backends:
+  * ``exact`` – brute-force scan, used for small catalogues and as fallback.
+  * ``ivf``   – inverted file index (k-means coarse quantiser); recall is
+                tuned with ``nprobe`` (number of clusters scanned per query).
+  * ``hnsw``  – graph index via the optional ``hnswlib`` package; recall is
+                tuned with ``ef_search``.
+  * ``int8``  – scans int8 codes, rescores an oversampled shortlist exactly.
+  * ``binary``– scans 1-bit sign codes by Hamming distance, then rescores.
+
+The exact, IVF and quantised indexes score against the shared (memory-mapped)
+embedding matrix and do not pickle it; ``load_vector_index`` re-attaches the
+matrix.
+"""
+
+import pickle
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import numpy as np
+from sklearn.cluster import KMeans
+
+from app_logic.config import (
+    BINARY_OVERSAMPLE,
+    HNSW_EF_SEARCH,
+    INT8_OVERSAMPLE,
+    IVF_NPROBE,
+    VECTOR_INDEX_PATH,
+)
+from app_logic.quantization import binarize, hamming_distances, int8_scores, quantize_int8
+from app_logic.scoring import (
+    as_row_ids,
+    dot_scores,
+    normalize_embeddings,
+    search_top_k,
+    top_k_indices,
+)
+
+
+class _MatrixBackedIndex:
+    """Base for indexes that read vectors from the shared embedding matrix."""
+
+    def _set_vectors(self, embeddings: np.ndarray, normalized: bool) -> None:
+        self.vectors = embeddings if normalized else normalize_embeddings(embeddings)
+        self.n_rows = len(self.vectors)
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["vectors"] = None
+        return state
+
+    def attach_vectors(self, embeddings: np.ndarray) -> None:
+        """Attach the L2-normalised matrix after unpickling."""
+        if len(embeddings) != self.n_rows:
+            raise ValueError(
+                f"Index was built over {self.n_rows} rows, embeddings have {len(embeddings)}."
+            )
+        self.vectors = embeddings
+
+
+class ExactIndex(_MatrixBackedIndex):
+    """Brute-force cosine search over the full embedding matrix."""
+
+    kind = "exact"
+
+    def __init__(self, embeddings: np.ndarray, normalized: bool = False):
+        self._set_vectors(embeddings, normalized)
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        k: int,
+        row_mask: np.ndarray | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        return search_top_k(query_vector, self.vectors, k, row_mask=row_mask)
+
+
+class IVFIndex(_MatrixBackedIndex):
+    """Inverted file index: k-means clusters with per-cluster posting lists.
+
+    A query is compared to the cluster centroids first and only the rows of
+    the ``nprobe`` closest clusters are scored exactly, so the scanned share
+    of the catalogue stays roughly ``nprobe / n_lists``.
+    """
+
+    kind = "ivf"
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        n_lists: int | None = None,
+        nprobe: int = IVF_NPROBE,
+        seed: int = 0,
+        normalized: bool = False,
+    ):
+        self._set_vectors(embeddings, normalized)
+        n_rows = self.n_rows
+        if n_lists is None:
+            n_lists = int(round(np.sqrt(n_rows)))
+        self.n_lists = int(max(1, min(n_lists, n_rows)))
+        self.nprobe = int(nprobe)
+
+        kmeans = KMeans(n_clusters=self.n_lists, n_init=1, random_state=seed)
+        assignments = kmeans.fit_predict(np.asarray(self.vectors, dtype=np.float32))
+        self.centroids = normalize_embeddings(kmeans.cluster_centers_)
+
+        # Posting lists stored CSR-style: rows of list i are
+        # list_rows[list_offsets[i]:list_offsets[i + 1]].
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=self.n_lists)
+        self.list_rows = order.astype(np.int64)
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    def _probe_rows(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        centroid_scores = self.centroids @ query
+        probed = top_k_indices(centroid_scores, nprobe)
+        return np.concatenate([
+            self.list_rows[self.list_offsets[i]:self.list_offsets[i + 1]]
+            for i in probed
+        ])
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        k: int,
+        row_mask: np.ndarray | None = None,
+        nprobe: int | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        query = normalize_embeddings(query_vector)[0]
+        nprobe = min(int(nprobe or self.nprobe), self.n_lists)
+
+        allowed = None
+        row_ids = as_row_ids(row_mask, len(self))
+        if row_ids is not None:
+            # A narrow filter is cheaper (and exact) to scan directly.
+            expected_scan = len(self) * nprobe / self.n_lists
+            if len(row_ids) <= expected_scan:
+                scores = self.vectors[row_ids] @ query
+                top = top_k_indices(scores, k)
+                return row_ids[top], scores[top]
+            allowed = np.zeros(len(self), dtype=bool)
+            allowed[row_ids] = True
+
+        # Widen the probe until enough allowed rows are found.
+        while True:
+            candidates = self._probe_rows(query, nprobe)
+            if allowed is not None:
+                candidates = candidates[allowed[candidates]]
+            if len(candidates) >= k or nprobe >= self.n_lists:
+                break
+            nprobe = min(nprobe * 2, self.n_lists)
+
+        scores = self.vectors[candidates] @ query
+        top = top_k_indices(scores, k)
+        return candidates[top], scores[top]
+
+
+class _QuantizedIndex(_MatrixBackedIndex, ABC):
+    """Base for indexes that shortlist on compact codes and rescore exactly.
+
+    The codes are scanned for ``k * oversample`` candidates; only those rows
+    of the full-precision matrix are read and rescored, so with a
+    memory-mapped store most of the float matrix is never paged in.  This
+    is a memory saving, not a speedup: on CPU the code scan is no faster
+    than the exact float32 scan (see the ``INT8_OVERSAMPLE`` notes in
+    config.py).
+    """
+
+    def __init__(self, embeddings: np.ndarray, oversample: int, normalized: bool):
+        self._set_vectors(embeddings, normalized)
+        self.oversample = int(oversample)
+
+    @abstractmethod
+    def _approximate_scores(self, query: np.ndarray, row_ids: np.ndarray | None) -> np.ndarray:
+        """Cheap code-space scores for all rows, or only ``row_ids``."""
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        k: int,
+        row_mask: np.ndarray | None = None,
+        oversample: int | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        query = normalize_embeddings(query_vector)[0]
+        row_ids = as_row_ids(row_mask, len(self))
+        approx = self._approximate_scores(query, row_ids)
+        shortlist = top_k_indices(approx, k * int(oversample or self.oversample))
+        if row_ids is not None:
+            shortlist = row_ids[shortlist]
+
+        # Sorted ids read the memory-mapped matrix front to back.
+        shortlist = np.sort(shortlist)
+        scores = np.asarray(self.vectors[shortlist], dtype=np.float32) @ query
+        top = top_k_indices(scores, k)
+        return shortlist[top], scores[top]
+
+
+class Int8Index(_QuantizedIndex):
+    """Int8 scalar-quantised scan with full-precision rescoring."""
+
+    kind = "int8"
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        oversample: int = INT8_OVERSAMPLE,
+        normalized: bool = False,
+    ):
+        super().__init__(embeddings, oversample, normalized)
+        self.codes, self.scale = quantize_int8(self.vectors)
+
+    def _approximate_scores(self, query: np.ndarray, row_ids: np.ndarray | None) -> np.ndarray:
+        codes = self.codes if row_ids is None else self.codes[row_ids]
+        return int8_scores(codes, self.scale, query)
+
+
+class BinaryIndex(_QuantizedIndex):
+    """1-bit sign codes scanned by Hamming distance, with exact rescoring."""
+
+    kind = "binary"
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        oversample: int = BINARY_OVERSAMPLE,
+        normalized: bool = False,
+    ):
+        super().__init__(embeddings, oversample, normalized)
+        self.codes = binarize(self.vectors)
+
+    def _approximate_scores(self, query: np.ndarray, row_ids: np.ndarray | None) -> np.ndarray:
+        codes = self.codes if row_ids is None else self.codes[row_ids]
+        return -hamming_distances(codes, binarize(query)[0])
+
+
+class HNSWIndex:
+    """Hierarchical navigable small-world graph index (requires ``hnswlib``)."""
+
+    kind = "hnsw"
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        m: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = HNSW_EF_SEARCH,
+        normalized: bool = False,
+    ):
+        # hnswlib keeps its own copy of the vectors inside the graph.
+        hnswlib = _import_hnswlib()
+        if normalized:
+            vectors = np.asarray(embeddings, dtype=np.float32)
+        else:
+            vectors = normalize_embeddings(embeddings)
+        self.n_rows, dim = vectors.shape
+        self.ef_search = int(ef_search)
+        self.graph = hnswlib.Index(space="ip", dim=dim)
+        self.graph.init_index(max_elements=self.n_rows, M=m, ef_construction=ef_construction)
+        self.graph.add_items(vectors, np.arange(self.n_rows))
+        self.graph.set_ef(self.ef_search)
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        k: int,
+        row_mask: np.ndarray | None = None,
+        ef_search: int | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        query = normalize_embeddings(query_vector)
+        row_ids = as_row_ids(row_mask, self.n_rows)
+        n_allowed = self.n_rows if row_ids is None else len(row_ids)
+        k = min(k, n_allowed)
+        if k == 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+
+        self.graph.set_ef(max(int(ef_search or self.ef_search), k))
+        filter_fn = None
+        if row_ids is not None:
+            allowed = set(row_ids.tolist())
+            filter_fn = allowed.__contains__
+
+        try:
+            labels, distances = self.graph.knn_query(query, k=k, filter=filter_fn)
+        except RuntimeError:
+            # A filtered graph walk can reach fewer than k allowed rows.
+            return self._exact_search(query, k, row_ids)
+        # hnswlib "ip" space returns 1 - inner product.
+        return labels[0].astype(np.int64), (1.0 - distances[0]).astype(np.float32)
+
+    def _exact_search(
+        self,
+        query: np.ndarray,
+        k: int,
+        row_ids: np.ndarray | None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Brute-force search over the vectors stored in the graph."""
+        ids = np.arange(self.n_rows, dtype=np.int64) if row_ids is None else row_ids
+        vectors = np.asarray(self.graph.get_items(ids), dtype=np.float32)
+        scores = vectors @ np.asarray(query, dtype=np.float32).reshape(-1)
+        best = top_k_indices(scores, k)
+        return ids[best].astype(np.int64), scores[best].astype(np.float32)
+
+
+def _import_hnswlib():
+    try:
+        return __import__("hnswlib")
+    except ImportError as exc:
+        raise ImportError(
+            "HNSW index requires the optional 'hnswlib' package (pip install hnswlib)."
+        ) from exc
+
+
+_INDEX_TYPES = {
+    "exact": ExactIndex,
+    "ivf": IVFIndex,
+    "hnsw": HNSWIndex,
+    "int8": Int8Index,
+    "binary": BinaryIndex,
+}
+
+
+def build_vector_index(embeddings: np.ndarray, kind: str = "ivf", **params):
+    """Build a vector index of the given kind over the embedding matrix."""
+    if kind not in _INDEX_TYPES:
+        raise ValueError(f"Unsupported vector index kind: {kind}")
+    return _INDEX_TYPES[kind](embeddings, **params)
+
+
+def recall_at_k(
+    index,
+    query_vectors: np.ndarray,
+    normalized_embeddings: np.ndarray,
+    k: int,
+    exact_scores: np.ndarray | None = None,
+    **search_params,
+) -> float:
+    """Mean share of the exact top-k rows that *index* also returns.
+
+    *exact_scores* (queries x rows cosine matrix) is reused when the caller
+    already has it; *search_params* are passed to ``index.search``.
+    """
+    if exact_scores is None:
+        exact_scores = dot_scores(query_vectors, normalized_embeddings)
+    overlaps = []
+    for query, scores in zip(query_vectors, exact_scores):
+        expected = top_k_indices(scores, k)
+        found, _ = index.search(query, k, **search_params)
+        overlaps.append(len(np.intersect1d(expected, found)) / max(len(expected), 1))
+    return float(np.mean(overlaps)) if overlaps else 1.0
+
+
+def save_vector_index(index, path: str = VECTOR_INDEX_PATH) -> None:
+    """Persist a vector index as a pickle file."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        pickle.dump(index, f)
+
+
+def load_vector_index(path: str = VECTOR_INDEX_PATH, embeddings: np.ndarray | None = None):
+    """Load a vector index written by ``save_vector_index``.
+
+    Matrix-backed indexes need *embeddings* (the normalised store matrix)
+    to be re-attached before they can search.
+    """
+    with open(path, "rb") as f:
+        index = pickle.load(f)
+    if isinstance(index, _MatrixBackedIndex):
+        if embeddings is None:
+            raise ValueError(f"{index.kind} index needs the embedding matrix to be attached.")
+        index.attach_vectors(embeddings)
+    return index
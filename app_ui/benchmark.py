@@ -15,7 +15,17 @@ from app_logic.benchmark import (
     run_benchmark_suite,
     save_benchmark_run,
 )
-from app_logic.config import BENCHMARK_CASES_PATH, BENCHMARK_RUNS_PATH, LOCAL_RERANK_MODEL
+from app_logic.config import (
+    BENCHMARK_CASES_PATH,
+    BENCHMARK_RUNS_PATH,
+    ADAPTIVE_POOL_MAX,
+    ADAPTIVE_POOL_MIN,
+    CANDIDATE_POOL,
+    CANDIDATE_POOL_MODE,
+    LOCAL_RERANK_METHOD,
+    LOCAL_RERANK_MODEL,
+    LOCAL_RERANK_WINDOW_POOL,
+)
 
 
 # ---------------------------------------------------------------------------
@@ -46,17 +56,24 @@ def get_benchmark_case_count() -> int:
 def render_benchmark_sidebar(
     api_key: str,
     benchmark_case_count: int,
-) -> tuple[bool, bool, int, str, str]:
+) -> tuple[bool, bool, int, str, str, bool, str]:
     """Render benchmark controls.
 
     Returns:
-        (run_clicked, load_clicked, benchmark_limit, ranking_mode, local_model_name)
+        (run_clicked, load_clicked, benchmark_limit, ranking_mode, local_model_name,
+        adaptive_pool, local_rerank_method)
     """
     ranking_mode_labels = {
         "semantic": "Ilma rerankerita (semantiline jarjekord)",
         "cross_encoder": "Cross-encoder reranker",
+        "cascade": "Kaskaad: vaike + suur cross-encoder",
         "local_llm": "Kohalik LLM reranker (Transformers)",
     }
+    local_method_labels = {
+        "logits": "Jah/ei skoor (uks labimine)",
+        "generate": "JSON-jarjestuse genereerimine",
+        "window": f"Libisevad aknad ({LOCAL_RERANK_WINDOW_POOL} kandidaati)",
+    }
 
     with st.sidebar:
         st.divider()
@@ -81,18 +98,34 @@ def render_benchmark_sidebar(
             format_func=lambda key: ranking_mode_labels[key],
             index=1,
             help=(
-                "Vali, kas benchmark kasutab semantilist jarjekorda, cross-encoderit "
-                "voi kohalikku LLM rerankerit."
+                "Vali, kas benchmark kasutab semantilist jarjekorda, cross-encoderit, "
+                "kaskaadi (vaike mudel eelvalib, suur mudel jarjestab) voi kohalikku LLM rerankerit."
             ),
         )
 
         local_rerank_model = LOCAL_RERANK_MODEL
+        local_rerank_method = LOCAL_RERANK_METHOD
         if ranking_mode == "local_llm":
             local_rerank_model = st.text_input(
                 "Benchmarki kohalik rerank mudel",
                 value=local_rerank_model,
                 help="Naide: Qwen/Qwen3-0.6B voi lokaalne mudelitee.",
             ).strip() or local_rerank_model
+            local_rerank_method = st.radio(
+                "Benchmarki kohaliku LLM-i meetod",
+                options=list(local_method_labels.keys()),
+                format_func=lambda key: local_method_labels[key],
+                index=list(local_method_labels).index(LOCAL_RERANK_METHOD),
+            )
+
+        adaptive_pool = st.checkbox(
+            "Adaptiivne kandidaatide arv",
+            value=CANDIDATE_POOL_MODE == "adaptive",
+            help=(
+                f"Kandidaatide arv ({ADAPTIVE_POOL_MIN}-{ADAPTIVE_POOL_MAX}) valitakse koosinusskooride "
+                f"jaotuse jargi; muidu alati {CANDIDATE_POOL}."
+            ),
+        )
 
         run_clicked = st.button(
             "Kaivita testikomplekt",
@@ -112,7 +145,10 @@ def render_benchmark_sidebar(
             use_container_width=True,
             help="Laeb viimasena faili salvestatud testikomplekti tulemuse.",
         )
-        return run_clicked, load_clicked, benchmark_limit, ranking_mode, local_rerank_model
+        return (
+            run_clicked, load_clicked, benchmark_limit, ranking_mode, local_rerank_model,
+            adaptive_pool, local_rerank_method,
+        )
 
 
 # ---------------------------------------------------------------------------
@@ -288,12 +324,31 @@ def render_benchmark_results(courses_df: pd.DataFrame) -> None:
         format_ratio_percentage(results.llm_correct, results.reranker_correct),
     )
 
+    pool_size = results.mean_pool_size()
+    if pool_size is not None:
+        st.caption(
+            f"Kandidaate päringu kohta keskmiselt {pool_size:.1f} "
+            f"({'adaptiivne' if results.pool_mode == 'adaptive' else 'fikseeritud'} kandidaatide arv)."
+        )
+
     # Metrics row 3
     row_three = st.columns(3)
+    if results.index_recall is not None:
+        row_three[0].metric(
+            f"Indeksi recall@{CANDIDATE_POOL} ({results.index_kind})",
+            f"{results.index_recall:.1%}",
+        )
     row_three[1].metric(
         "LLM kokku",
         format_ratio_percentage(results.llm_correct, results.total_cases),
     )
+    reranker_ms = results.mean_reranker_ms()
+    if reranker_ms is not None:
+        mode_name = results.ranking_mode
+        if mode_name and results.local_rerank_method:
+            mode_name = f"{mode_name}/{results.local_rerank_method}"
+        mode = f" ({mode_name})" if mode_name else ""
+        row_three[2].metric(f"Järjestamine päringu kohta{mode}", f"{reranker_ms:.0f} ms")
 
     # Tabs
     summary_tab, retrieval_tab, reranker_tab, llm_tab, rr_ok_llm_fail_tab = st.tabs([
@@ -339,6 +394,12 @@ def run_benchmark(
     embeddings,
     benchmark_limit: int,
     ranking_mode: str,
+    rerank_cache=None,
+    vector_index=None,
+    first_stage_reranker=None,
+    first_stage_cache=None,
+    adaptive_pool: bool = False,
+    local_rerank_method: str = LOCAL_RERANK_METHOD,
 ) -> None:
     """Orchestrate a full benchmark run with a live progress bar and ETA."""
     progress_bar = st.progress(0, text="Valmistan testikomplekti ette...")
@@ -410,6 +471,12 @@ def run_benchmark(
             case_limit=benchmark_limit,
             ranking_mode=ranking_mode,
             progress_callback=update_progress,
+            rerank_cache=rerank_cache,
+            vector_index=vector_index,
+            first_stage_reranker=first_stage_reranker,
+            first_stage_cache=first_stage_cache,
+            adaptive_pool=adaptive_pool,
+            local_rerank_method=local_rerank_method,
         )
         st.session_state.benchmark_last_run_at = save_benchmark_run(
             st.session_state.benchmark_results,
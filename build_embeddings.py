@@ -1,28 +1,66 @@
-"""Pre-compute embeddings for all courses and save as a pickle file.
+"""Pre-compute embeddings for all courses and build the vector index.
 
 Usage:
     conda activate oisi_projekt
-    python build_embeddings.py
-
-This reads toorandmed/puhastatud_andmed.csv, encodes the 'description'
-column with BAAI/bge-m3, and saves the resulting numpy array to
-toorandmed/embeddings.pkl.  Re-run this script whenever the CSV changes.
+    python build_embeddings.py                   # encode + build index
+    python build_embeddings.py --incremental     # encode only new/changed descriptions
+    python build_embeddings.py --workers 4       # 4 encoder processes, cores split between them
+    python build_embeddings.py --dtype float16   # half-size embedding store
+    python build_embeddings.py --index-only      # rebuild index from existing store
+    python build_embeddings.py --index-kind hnsw # pick index backend (exact/ivf/hnsw/int8/binary)
+    python build_embeddings.py --from-pickle andmed/embeddings.pkl  # migrate old pickle
+
+This reads andmed/puhastatud_andmed.csv, encodes the 'description' column
+with BAAI/bge-m3 and writes the embedding store andmed/embeddings/
+(matrix.npy + manifest.json, memory-mapped by the app).  It then builds the
+approximate nearest-neighbour index next to it (andmed/vector_index.pkl).
+Re-run this script whenever the CSV changes.
+
+Every encoded description is also kept in a content-addressed text -> vector
+store (andmed/embeddings/text_vectors.sqlite).  With --incremental only texts
+missing from it are encoded; identical descriptions are encoded once.  The
+new/changed/removed courses (by andmed/ids.csv version uuid and description
+hash) are reported against the previous store.
+
+Texts are encoded in shards (andmed/embeddings/shards/) that are
+checkpointed as they finish; re-running after a crash resumes with the
+missing shards.  Checkpoints are removed once the store is written.
 """
 
+import argparse
+import os
 import time
 import pickle
 
 import numpy as np
 import pandas as pd
-from sentence_transformers import SentenceTransformer
-
-DATA_PATH = "toorandmed/puhastatud_andmed.csv"
-OUTPUT_PATH = "toorandmed/embeddings.pkl"
-MODEL_NAME = "BAAI/bge-m3"
-BATCH_SIZE = 8         # keep very small to avoid OOM on CPU/limited-RAM machines
-
 
-def main() -> None:
+from app_logic.cache import CachedEmbedder, PersistentLRUCache
+from app_logic.config import (
+    BUILD_MAX_BATCH_TOKENS,
+    BUILD_SHARD_SIZE,
+    DATA_PATH,
+    EMBED_MODEL,
+    EMBEDDING_STORE_DIR,
+    EMBEDDING_STORE_DTYPE,
+    IDS_PATH,
+    TEXT_VECTOR_STORE_PATH,
+    VECTOR_INDEX_KIND,
+    VECTOR_INDEX_PATH,
+)
+from app_logic.data import load_course_versions
+from app_logic.embedding_build import ShardedEncoder
+from app_logic.embedding_store import (
+    diff_embedding_store,
+    open_embedding_store,
+    write_embedding_store,
+)
+from app_logic.vector_index import build_vector_index, save_vector_index
+
+MODEL_NAME = EMBED_MODEL
+
+
+def load_catalogue() -> pd.DataFrame:
     print(f"Loading data from {DATA_PATH} ...")
     df = pd.read_csv(DATA_PATH)
     print(f"  {len(df)} courses, {len(df.columns)} columns")
@@ -33,28 +71,166 @@ def main() -> None:
             "'description' column not found in CSV. "
             "Available columns: " + ", ".join(df.columns)
         )
+    return df
+
 
+def encode_catalogue(
+    df: pd.DataFrame,
+    encoder: ShardedEncoder,
+    incremental: bool = False,
+) -> np.ndarray:
     texts = df["description"].fillna("").astype(str).tolist()
 
     avg_len = sum(len(t) for t in texts) / len(texts)
     print(f"  Avg description length: {avg_len:.0f} chars")
 
-    print(f"Loading embedding model '{MODEL_NAME}' (this may take a few minutes on first run) ...")
-    model = SentenceTransformer(MODEL_NAME)
+    text_store = PersistentLRUCache(len(texts), TEXT_VECTOR_STORE_PATH)
+    if not incremental:
+        text_store.clear()
+    model = CachedEmbedder(encoder, MODEL_NAME, text_store)
 
-    print(f"Encoding {len(texts)} descriptions (batch_size={BATCH_SIZE}) ...")
+    print(f"Embedding {len(texts)} descriptions ({len(set(texts))} unique) ...")
     t0 = time.time()
-    embeddings = model.encode(texts, batch_size=BATCH_SIZE, show_progress_bar=True)
+    embeddings = model.encode(texts, show_progress_bar=False)
     elapsed = time.time() - t0
-    print(f"  Done in {elapsed:.1f}s  |  shape: {embeddings.shape}")
+    stats = text_store.stats()
+    print(
+        f"  Done in {elapsed:.1f}s  |  encoded {stats['misses']}, "
+        f"reused {stats['hits']}  |  shape: {embeddings.shape}"
+    )
 
     # Sanity check
     assert isinstance(embeddings, np.ndarray)
     assert embeddings.shape[0] == len(df)
+    return embeddings
+
+
+def course_versions(df: pd.DataFrame) -> list[str | None] | None:
+    if not os.path.exists(IDS_PATH):
+        print(f"  {IDS_PATH} not found; course versions are not tracked.")
+        return None
+    return load_course_versions(df, IDS_PATH)
+
+
+def report_changes(df: pd.DataFrame, version_uuids: list[str | None] | None) -> None:
+    """Print new/changed/removed courses against the previous store."""
+    try:
+        previous = open_embedding_store(EMBEDDING_STORE_DIR)
+    except (FileNotFoundError, ValueError):
+        print("  No previous embedding store; every course is new.")
+        return
+    diff = diff_embedding_store(previous, df, version_uuids or [None] * len(df))
+    print("  " + ", ".join(f"{name}: {len(ids)}" for name, ids in diff.items()))
+    for name in ("new", "changed", "removed"):
+        if diff[name]:
+            preview = ", ".join(diff[name][:10])
+            more = f" (+{len(diff[name]) - 10})" if len(diff[name]) > 10 else ""
+            print(f"    {name}: {preview}{more}")
+
+
+def save_store(
+    embeddings: np.ndarray,
+    df: pd.DataFrame,
+    dtype: str,
+    version_uuids: list[str | None] | None = None,
+) -> None:
+    print(f"Saving {dtype} embedding store to {EMBEDDING_STORE_DIR}/ ...")
+    manifest = write_embedding_store(
+        embeddings, df, MODEL_NAME, DATA_PATH, store_dir=EMBEDDING_STORE_DIR, dtype=dtype,
+        version_uuids=version_uuids,
+    )
+    print(f"  {manifest['rows']} x {manifest['dim']} {manifest['dtype']}")
+
+
+def build_index(embeddings: np.ndarray, kind: str) -> None:
+    print(f"Building '{kind}' vector index over {len(embeddings)} rows ...")
+    t0 = time.time()
+    index = build_vector_index(embeddings, kind=kind, normalized=True)
+    print(f"  Done in {time.time() - t0:.1f}s")
+
+    print(f"Saving vector index to {VECTOR_INDEX_PATH} ...")
+    save_vector_index(index, VECTOR_INDEX_PATH)
 
-    print(f"Saving embeddings to {OUTPUT_PATH} ...")
-    with open(OUTPUT_PATH, "wb") as f:
-        pickle.dump(embeddings, f)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--index-only",
+        action="store_true",
+        help="Skip encoding and rebuild the vector index from the existing store.",
+    )
+    parser.add_argument(
+        "--index-kind",
+        default=VECTOR_INDEX_KIND,
+        choices=["exact", "ivf", "hnsw", "int8", "binary"],
+        help="Vector index backend to build.",
+    )
+    parser.add_argument(
+        "--dtype",
+        default=EMBEDDING_STORE_DTYPE,
+        choices=["float32", "float16"],
+        help="Storage dtype of the embedding matrix.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Encode only descriptions missing from the text -> vector store.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Encoder processes; each loads its own model copy.",
+    )
+    parser.add_argument(
+        "--threads-per-worker",
+        type=int,
+        default=None,
+        help="Torch/BLAS threads per worker (default: CPU cores / workers).",
+    )
+    parser.add_argument(
+        "--shard-size",
+        type=int,
+        default=BUILD_SHARD_SIZE,
+        help="Descriptions per checkpointed shard.",
+    )
+    parser.add_argument(
+        "--max-batch-tokens",
+        type=int,
+        default=BUILD_MAX_BATCH_TOKENS,
+        help="Padded-token budget per encode batch (bounds peak memory).",
+    )
+    parser.add_argument(
+        "--from-pickle",
+        metavar="PATH",
+        help="Convert an old embeddings.pkl into the store instead of re-encoding.",
+    )
+    args = parser.parse_args()
+
+    if not args.index_only:
+        df = load_catalogue()
+        version_uuids = course_versions(df)
+        if args.from_pickle:
+            print(f"Loading legacy embeddings from {args.from_pickle} ...")
+            with open(args.from_pickle, "rb") as f:
+                embeddings = pickle.load(f)
+        else:
+            if args.incremental:
+                print("Changes since the previous store:")
+                report_changes(df, version_uuids)
+            encoder = ShardedEncoder(
+                MODEL_NAME,
+                workers=args.workers,
+                threads_per_worker=args.threads_per_worker,
+                shard_size=args.shard_size,
+                max_batch_tokens=args.max_batch_tokens,
+            )
+            embeddings = encode_catalogue(df, encoder, incremental=args.incremental)
+        save_store(embeddings, df, args.dtype, version_uuids)
+        if not args.from_pickle:
+            encoder.clear_checkpoints()
+
+    build_index(open_embedding_store(EMBEDDING_STORE_DIR).matrix, args.index_kind)
 
     print("Finished. You can now run: streamlit run app.py")
 
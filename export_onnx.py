@@ -0,0 +1,122 @@
+"""Export the retrieval models to ONNX (fp32 + dynamic int8) for CPU serving.
+
+Usage:
+    conda activate oisi_projekt
+    pip install onnxruntime
+    python export_onnx.py embedder            # andmed/onnx/bge-m3/
+    python export_onnx.py embedder --no-int8  # fp32 graph only
+    python export_onnx.py reranker            # andmed/onnx/bge-reranker-v2-m3/
+
+After exporting, every graph is checked against the PyTorch model on the
+benchmark queries: the export fails if any embedder query vector has cosine
+similarity below ONNX_PARITY_MIN_COSINE, or if any reranker score differs
+by more than RERANK_PARITY_MAX_DIFF.  Enable the backends with
+EMBEDDER_BACKEND / RERANKER_BACKEND in app_logic/config.py, and compare
+latency and ranking agreement with `python perf_benchmark.py embedder` and
+`python perf_benchmark.py reranker`.
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from app_logic.benchmark import load_benchmark_cases
+from app_logic.config import (
+    BENCHMARK_CASES_PATH,
+    DATA_PATH,
+    EMBED_MODEL,
+    ONNX_EMBEDDER_DIR,
+    ONNX_PARITY_MIN_COSINE,
+    ONNX_RERANKER_DIR,
+    RERANK_PARITY_MAX_DIFF,
+    RERANKER_MODEL,
+)
+from app_logic.data import load_courses
+from app_logic.onnx_models import (
+    OnnxCrossEncoder,
+    OnnxEmbedder,
+    cosine_parity,
+    export_embedder,
+    export_reranker,
+)
+
+# Course descriptions paired with every parity query in the reranker check.
+PARITY_DOCUMENTS = 8
+
+
+def parity_queries() -> list[str]:
+    return [case.query for case in load_benchmark_cases(BENCHMARK_CASES_PATH) if case.query]
+
+
+def export_embedder_command(args) -> int:
+    print(f"Exporting '{EMBED_MODEL}' to {args.out_dir}/ ...")
+    paths = export_embedder(EMBED_MODEL, args.out_dir, quantize=not args.no_int8)
+    for path in paths:
+        print(f"  wrote {path}")
+
+    from sentence_transformers import SentenceTransformer
+
+    queries = parity_queries()
+    print(f"Parity check on {len(queries)} benchmark queries (min cosine {ONNX_PARITY_MIN_COSINE}) ...")
+    reference = SentenceTransformer(EMBED_MODEL).encode(queries, show_progress_bar=False)
+    failed = False
+    for quantized in ([False] if args.no_int8 else [False, True]):
+        onnx_vectors = OnnxEmbedder(args.out_dir, quantized=quantized).encode(queries)
+        cosines = cosine_parity(reference, onnx_vectors)
+        ok = cosines.min() >= ONNX_PARITY_MIN_COSINE
+        failed |= not ok
+        label = "int8" if quantized else "fp32"
+        print(
+            f"  {label}: min {cosines.min():.4f}  mean {cosines.mean():.4f}  "
+            f"{'OK' if ok else 'FAILED'}"
+        )
+    return 1 if failed else 0
+
+
+def export_reranker_command(args) -> int:
+    print(f"Exporting '{RERANKER_MODEL}' to {args.out_dir}/ ...")
+    for path in export_reranker(RERANKER_MODEL, args.out_dir, quantize=not args.no_int8):
+        print(f"  wrote {path}")
+
+    from sentence_transformers import CrossEncoder
+
+    descriptions = load_courses(DATA_PATH)["description"].fillna("").astype(str)
+    documents = list(descriptions[descriptions.str.len() > 0].head(PARITY_DOCUMENTS))
+    pairs = [[query, document] for query in parity_queries() for document in documents]
+    print(f"Parity check on {len(pairs)} query-course pairs (max score difference {RERANK_PARITY_MAX_DIFF}) ...")
+    reference = CrossEncoder(RERANKER_MODEL).predict(pairs, show_progress_bar=False)
+    failed = False
+    for quantized in ([False] if args.no_int8 else [False, True]):
+        scores = OnnxCrossEncoder(args.out_dir, quantized=quantized).predict(pairs)
+        differences = np.abs(np.asarray(scores, dtype=float) - np.asarray(reference, dtype=float))
+        ok = differences.max() <= RERANK_PARITY_MAX_DIFF
+        failed |= not ok
+        label = "int8" if quantized else "fp32"
+        print(
+            f"  {label}: max diff {differences.max():.4f}  mean {differences.mean():.4f}  "
+            f"{'OK' if ok else 'FAILED'}"
+        )
+    return 1 if failed else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    embedder = sub.add_parser("embedder", help="bge-m3 query embedder.")
+    embedder.add_argument("--out-dir", default=ONNX_EMBEDDER_DIR)
+    embedder.add_argument("--no-int8", action="store_true", help="Skip the int8 graph.")
+    embedder.set_defaults(func=export_embedder_command)
+
+    reranker = sub.add_parser("reranker", help="bge-reranker-v2-m3 cross-encoder.")
+    reranker.add_argument("--out-dir", default=ONNX_RERANKER_DIR)
+    reranker.add_argument("--no-int8", action="store_true", help="Skip the int8 graph.")
+    reranker.set_defaults(func=export_reranker_command)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
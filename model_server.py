@@ -0,0 +1,178 @@
+"""Serve the retrieval models to every app process from one place.
+
+Usage:
+    conda activate oisi_projekt
+    python model_server.py                       # 127.0.0.1:8765, embedder + reranker
+    python model_server.py --cascade             # also the cascade first-stage model
+    python model_server.py --port 9000
+    MODEL_SERVER_URL=http://127.0.0.1:8765 streamlit run app.py
+
+Loads bge-m3 and bge-reranker-v2-m3 once (backends from
+app_logic/config.py) and answers localhost HTTP requests:
+
+    GET  /health        loaded models and their cache keys
+    POST /encode        {"sentences": [...], "options": {...}}
+    POST /rerank        {"pairs": [[query, text], ...], "model": "reranker" | "first_stage"}
+    POST /local-rerank  {"model": "Qwen/Qwen3-0.6B", "prompt": "..."}
+    POST /local-score   {"model": "Qwen/Qwen3-0.6B", "query": "...", "documents": [...]}
+
+Requests are handled in threads and coalesced into micro-batches per
+model (app_logic/scheduler.py), so several Streamlit workers share one set
+of loaded models.  The local LLM reranker is loaded on first use.  If the
+server is not running, the app loads its models in-process as before.
+"""
+
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from app_logic.config import (
+    CASCADE_FIRST_STAGE_MODEL,
+    DATA_PATH,
+    EMBEDDER_BACKEND,
+    MODEL_SERVER_HOST,
+    MODEL_SERVER_PORT,
+    RERANKER_BACKEND,
+    RERANKER_MODEL,
+)
+from app_logic.data import load_courses
+from app_logic.model_client import encode_array
+from app_logic.models import (
+    load_embedding_model,
+    load_first_stage_model,
+    load_reranker_model,
+)
+from app_logic.retrieval import (
+    generate_local_rerank_response,
+    load_local_transformers_reranker,
+    local_llm_relevance_scores,
+)
+from app_logic.scheduler import BatchedEmbedder, BatchedReranker, scheduler_stats
+
+
+class ModelRegistry:
+    """Models shared by all request threads."""
+
+    def __init__(self, cascade: bool):
+        descriptions = load_courses(DATA_PATH)["description"].fillna("").astype(str)
+
+        print(f"Loading embedder ({EMBEDDER_BACKEND}) ...")
+        embedder, embedder_key = load_embedding_model()
+        self.embedder = BatchedEmbedder(embedder)
+        print(f"Loading reranker '{RERANKER_MODEL}' ({RERANKER_BACKEND}) ...")
+        reranker, reranker_key = load_reranker_model(descriptions=descriptions)
+        self.rerankers = {"reranker": BatchedReranker(reranker)}
+        self.keys = {"embedder_key": embedder_key, "reranker_key": reranker_key}
+        if cascade:
+            print(f"Loading first-stage reranker '{CASCADE_FIRST_STAGE_MODEL}' ...")
+            first_stage, first_stage_key = load_first_stage_model(descriptions)
+            self.rerankers["first_stage"] = BatchedReranker(first_stage, name="first-stage reranker")
+            self.keys["first_stage_key"] = first_stage_key
+
+        self._local_runtime = None
+        # One local LLM at a time; its calls are not micro-batched.
+        self._local_lock = threading.Lock()
+
+    def _local_rerank_runtime(self, model_name: str) -> dict:
+        if self._local_runtime is None or self._local_runtime["model_name"] != model_name:
+            print(f"Loading local rerank model '{model_name}' ...")
+            self._local_runtime = None
+            self._local_runtime = load_local_transformers_reranker(model_name)
+        return self._local_runtime
+
+    def generate_local_rerank(self, model_name: str, prompt: str) -> str:
+        with self._local_lock:
+            return generate_local_rerank_response(self._local_rerank_runtime(model_name), prompt)
+
+    def score_local_rerank(self, model_name: str, query: str, documents: list[str]) -> np.ndarray:
+        with self._local_lock:
+            return local_llm_relevance_scores(self._local_rerank_runtime(model_name), query, documents)
+
+    def health(self) -> dict:
+        return {
+            "models": sorted(["embedder", *self.rerankers]),
+            "local_rerank_model": self._local_runtime["model_name"] if self._local_runtime else None,
+            "scheduler": scheduler_stats(),
+            **self.keys,
+        }
+
+
+def make_handler(registry: ModelRegistry):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:
+            if self.path == "/health":
+                self._send(200, registry.health())
+            else:
+                self._send(404, {"error": f"unknown path {self.path}"})
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if self.path == "/encode":
+                    vectors = registry.embedder.encode(request["sentences"], **request.get("options", {}))
+                    self._send(200, {"vectors": encode_array(vectors)})
+                elif self.path == "/rerank":
+                    reranker = registry.rerankers.get(request.get("model", "reranker"))
+                    if reranker is None:
+                        self._send(404, {"error": f"model not loaded: {request.get('model')}"})
+                        return
+                    scores = reranker.predict(request["pairs"], **request.get("options", {}))
+                    self._send(200, {"scores": [float(score) for score in scores]})
+                elif self.path == "/local-rerank":
+                    text = registry.generate_local_rerank(request["model"], request["prompt"])
+                    self._send(200, {"text": text})
+                elif self.path == "/local-score":
+                    scores = registry.score_local_rerank(request["model"], request["query"], request["documents"])
+                    self._send(200, {"scores": [float(score) for score in scores]})
+                else:
+                    self._send(404, {"error": f"unknown path {self.path}"})
+            except (KeyError, TypeError, ValueError) as error:
+                self._send(400, {"error": str(error)})
+            except Exception as error:
+                self._send(500, {"error": str(error)})
+
+        def log_message(self, format, *args) -> None:
+            pass
+
+    return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=MODEL_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=MODEL_SERVER_PORT)
+    parser.add_argument(
+        "--cascade",
+        action="store_true",
+        help="Also load the first-stage model of the cascade ranking mode.",
+    )
+    args = parser.parse_args()
+
+    registry = ModelRegistry(cascade=args.cascade)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(registry))
+    server.daemon_threads = True
+    print(f"Model server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
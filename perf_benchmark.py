@@ -0,0 +1,798 @@
+"""Micro-benchmarks for the retrieval pipeline's hot paths.
+
+Usage:
+    conda activate oisi_projekt
+    python perf_benchmark.py kernel                      # uses andmed/embeddings/
+    python perf_benchmark.py kernel --synthetic 20000    # random catalogue
+    python perf_benchmark.py masked --synthetic 50000    # filtered search allocations
+    python perf_benchmark.py filters                     # also verifies mask parity
+    python perf_benchmark.py quantized                   # int8/binary recall and latency
+    python perf_benchmark.py embedder                    # PyTorch vs ONNX query encoding
+    python perf_benchmark.py reranker                    # cross-encoder backends: latency + agreement
+    python perf_benchmark.py pool                        # fixed vs. adaptive candidate pool: size + recall
+    python perf_benchmark.py scheduler --clients 8       # concurrent load: direct vs. micro-batched models
+    python perf_benchmark.py cascade                     # cascade vs. single-stage rerank
+    python perf_benchmark.py local-llm                   # local LLM: generation vs. logits vs. windows
+    python perf_benchmark.py local-llm-cpu               # local LLM runtimes: tokens/s and peak RSS
+
+Each sub-command prints a small timing table.  These are not correctness
+tests for the recommender (see the developer view benchmark for that); they
+measure per-query latency of individual building blocks.
+"""
+
+import argparse
+import copy
+import time
+
+import numpy as np
+import pandas as pd
+
+from app_logic.config import (
+    ADAPTIVE_POOL_GAP,
+    ADAPTIVE_POOL_MASS,
+    ADAPTIVE_POOL_MAX,
+    BENCHMARK_CASES_PATH,
+    CANDIDATE_POOL,
+    CASCADE_KEEP,
+    DATA_PATH,
+    DEFAULT_TOP_K,
+    EMBED_MODEL,
+    EMBEDDING_STORE_DIR,
+    LOCAL_RERANK_CPU_THREADS,
+    LOCAL_RERANK_MODEL,
+    LOCAL_RERANK_WINDOW,
+    LOCAL_RERANK_WINDOW_POOL,
+    LOCAL_RERANK_WINDOW_STRIDE,
+    ONNX_EMBEDDER_DIR,
+    ONNX_PARITY_MIN_COSINE,
+    ONNX_RERANKER_DIR,
+    RERANK_MAX_DOC_TOKENS,
+    RERANK_PARITY_MAX_DIFF,
+    RERANKER_MODEL,
+)
+
+
+def _load_raw_embeddings(args) -> np.ndarray:
+    """Return the raw embedding matrix (or a synthetic one) for a benchmark."""
+    if args.synthetic:
+        rng = np.random.default_rng(args.seed)
+        print(f"Using synthetic catalogue: {args.synthetic} x {args.dim}")
+        return rng.normal(size=(args.synthetic, args.dim)).astype(np.float32)
+    from app_logic.data import load_embeddings
+
+    print(f"Loading embeddings from {EMBEDDING_STORE_DIR}/ ...")
+    return np.asarray(load_embeddings(EMBEDDING_STORE_DIR), dtype=np.float32)
+
+
+def _time_per_call(fn, repeats: int) -> float:
+    """Return mean wall-clock seconds per call after one warm-up call."""
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - t0) / repeats
+
+
+def _print_row(label: str, seconds: float, baseline: float | None = None) -> None:
+    speedup = f"{baseline / seconds:6.1f}x" if baseline else "      -"
+    print(f"  {label:<52} {seconds * 1000:9.3f} ms  {speedup}")
+
+
+# ---------------------------------------------------------------------------
+# kernel: sklearn cosine + argsort vs. pre-normalised dot + argpartition
+# ---------------------------------------------------------------------------
+def bench_kernel(args) -> None:
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    from app_logic.scoring import dot_scores, normalize_embeddings, top_k_indices
+
+    raw = _load_raw_embeddings(args)
+    normalized = normalize_embeddings(raw)
+    rng = np.random.default_rng(args.seed + 1)
+    queries = rng.normal(size=(args.queries, raw.shape[1])).astype(np.float32)
+    k = CANDIDATE_POOL
+
+    def old_single() -> None:
+        scores = cosine_similarity(queries[:1], raw)[0]
+        np.argsort(scores)[::-1][:k]
+
+    def new_single() -> None:
+        scores = dot_scores(queries[:1], normalized)[0]
+        top_k_indices(scores, k)
+
+    def old_batch() -> None:
+        cosine_similarity(queries, raw)
+
+    def new_batch() -> None:
+        dot_scores(queries, normalized)
+
+    # Same winners (ties aside) on every query.
+    old_top = np.argsort(cosine_similarity(queries, raw), axis=1)[:, ::-1][:, :k]
+    new_scores = dot_scores(queries, normalized)
+    agree = np.mean([
+        len(set(old_top[i]) & set(top_k_indices(new_scores[i], k))) / k
+        for i in range(len(queries))
+    ])
+
+    print(f"\nSingle query, top-{k} over {len(raw)} courses:")
+    baseline = _time_per_call(old_single, args.repeats)
+    _print_row("sklearn cosine_similarity + argsort", baseline)
+    _print_row("pre-normalised dot + argpartition", _time_per_call(new_single, args.repeats), baseline)
+
+    print(f"\nBatch of {len(queries)} queries (benchmark suite path), per query:")
+    baseline = _time_per_call(old_batch, args.repeats) / len(queries)
+    _print_row("sklearn cosine_similarity", baseline)
+    _print_row("blocked dot_scores", _time_per_call(new_batch, args.repeats) / len(queries), baseline)
+
+    print(f"\nTop-{k} agreement with the old path: {agree:.3f}")
+
+
+# ---------------------------------------------------------------------------
+# masked: slice-then-score vs. masked top-k over the full matrix
+# ---------------------------------------------------------------------------
+def _peak_allocation(fn) -> int:
+    """Peak bytes allocated by one call, as seen by tracemalloc."""
+    import tracemalloc
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def bench_masked(args) -> None:
+    from app_logic.scoring import dot_scores, normalize_embeddings, search_top_k, top_k_indices
+
+    normalized = normalize_embeddings(_load_raw_embeddings(args))
+    n_rows = len(normalized)
+    rng = np.random.default_rng(args.seed + 2)
+    courses_df = pd.DataFrame({
+        "aine_kood": [f"AINE.{i:05d}" for i in range(n_rows)],
+        "description": ["x" * 800] * n_rows,
+    })
+    query = rng.normal(size=(1, normalized.shape[1])).astype(np.float32)
+    k = CANDIDATE_POOL
+
+    print(f"\nFiltered top-{k} over {n_rows} courses, per query:")
+    for keep in (0.9, 0.5, 0.1):
+        mask = pd.Series(rng.random(n_rows) < keep)
+
+        def sliced() -> None:
+            filtered_df = courses_df[mask].copy()
+            scores = dot_scores(query, normalized[mask.values])[0]
+            filtered_df.iloc[top_k_indices(scores, k)]
+
+        def masked() -> None:
+            top_ids, _ = search_top_k(query, normalized, k, row_mask=mask.values)
+            courses_df.iloc[top_ids]
+
+        baseline = _time_per_call(sliced, args.repeats)
+        print(f"  filter keeps {keep:.0%} of rows:")
+        _print_row(f"df[mask].copy() + embeddings[mask] ({_peak_allocation(sliced) / 1e6:.1f} MB)", baseline)
+        _print_row(
+            f"masked search_top_k ({_peak_allocation(masked) / 1e6:.1f} MB)",
+            _time_per_call(masked, args.repeats),
+            baseline,
+        )
+
+
+# ---------------------------------------------------------------------------
+# filters: per-query pandas scans vs. precomputed filter index (+ parity check)
+# ---------------------------------------------------------------------------
+def _random_filter_selection(df, rng) -> dict:
+    """Draw a random sidebar filter combination, including unknown values."""
+
+    def pick(values: list[str]) -> list[str]:
+        n = int(rng.integers(0, min(3, len(values)) + 1))
+        return [str(v) for v in rng.choice(values, size=n, replace=False)] if n else []
+
+    eap = pd.to_numeric(df["eap"], errors="coerce").dropna()
+    low, high = sorted(rng.uniform(eap.min() - 1, eap.max() + 1, size=2).round(1))
+    return {
+        "semesters": pick(df["semester"].dropna().unique().tolist() + ["Kevad ", "talv", ""]),
+        "eap_range": (float(low), float(high)),
+        "grading_choice": str(rng.choice(["Koik", "Eristav", "Mitteeristav"])),
+        "languages": pick(["eesti keel", "inglise keel", "vene keel", "saksa keel", "Eesti"]),
+        "cities": pick(df["linn"].astype(str).unique().tolist() + ["Narva linn"]),
+        "study_levels": pick([
+            "bakalaureuseõpe", "magistriõpe", "doktoriõpe",
+            "rakenduskõrgharidusõpe", "integreeritud bakalaureuse- ja magistriõpe",
+        ]),
+        "teaching_methods": pick(df["oppeviis"].astype(str).unique().tolist()),
+        "domains": pick(df["valdkond"].astype(str).unique().tolist()),
+    }
+
+
+def bench_filters(args) -> None:
+    from app_logic.data import load_courses
+    from app_logic.filters import apply_filters, build_filter_index
+
+    print(f"Loading courses from {args.data} ...")
+    df = load_courses(args.data)
+    rng = np.random.default_rng(args.seed)
+
+    t0 = time.perf_counter()
+    filter_index = build_filter_index(df)
+    build_seconds = time.perf_counter() - t0
+
+    selections = [_random_filter_selection(df, rng) for _ in range(args.queries)]
+    for selection in selections:
+        expected = apply_filters(df, **selection)
+        actual = apply_filters(df, **selection, filter_index=filter_index)
+        pd.testing.assert_series_equal(actual, expected, check_names=False)
+    print(f"  Parity: {len(selections)} random filter combinations give identical masks.")
+
+    def scan() -> None:
+        for selection in selections:
+            apply_filters(df, **selection)
+
+    def indexed() -> None:
+        for selection in selections:
+            apply_filters(df, **selection, filter_index=filter_index)
+
+    print(f"\nFilter mask per query over {len(df)} courses (index build {build_seconds * 1000:.1f} ms):")
+    baseline = _time_per_call(scan, args.repeats) / len(selections)
+    _print_row("pandas scans (apply_filters)", baseline)
+    _print_row("precomputed FilterIndex", _time_per_call(indexed, args.repeats) / len(selections), baseline)
+
+
+# ---------------------------------------------------------------------------
+# quantized: exact scan vs. int8 / binary shortlists with exact rescoring
+# ---------------------------------------------------------------------------
+def bench_quantized(args) -> None:
+    from app_logic.scoring import normalize_embeddings
+    from app_logic.vector_index import build_vector_index, recall_at_k
+
+    normalized = normalize_embeddings(_load_raw_embeddings(args))
+    rng = np.random.default_rng(args.seed + 3)
+    # Queries near catalogue rows resemble real queries better than pure noise.
+    picks = rng.choice(len(normalized), size=args.queries)
+    noise = rng.normal(scale=0.5 / np.sqrt(normalized.shape[1]), size=(args.queries, normalized.shape[1]))
+    queries = normalized[picks] + noise
+    queries = normalize_embeddings(queries)
+    k = CANDIDATE_POOL
+
+    exact = build_vector_index(normalized, "exact", normalized=True)
+
+    def run(index, **params) -> None:
+        for query in queries:
+            index.search(query, k, **params)
+
+    print(f"\nTop-{k} over {len(normalized)} courses, per query (float32 matrix {normalized.nbytes / 1e6:.1f} MB):")
+    baseline = _time_per_call(lambda: run(exact), args.repeats) / len(queries)
+    _print_row("exact float32 scan", baseline)
+    for kind in ("int8", "binary"):
+        index = build_vector_index(normalized, kind, normalized=True)
+        for oversample in (2, 10, 25, 50, 100):
+            recall = recall_at_k(index, queries, normalized, k, oversample=oversample)
+            seconds = _time_per_call(lambda: run(index, oversample=oversample), args.repeats)
+            _print_row(
+                f"{kind} x{oversample} ({index.codes.nbytes / 1e6:.1f} MB, recall {recall:.3f})",
+                seconds / len(queries),
+                baseline,
+            )
+
+
+# ---------------------------------------------------------------------------
+# embedder: PyTorch fp32 / fp16 vs. ONNX Runtime fp32 / int8 query encoding
+# ---------------------------------------------------------------------------
+def _benchmark_queries() -> list[str]:
+    from app_logic.benchmark import load_benchmark_cases
+
+    return [case.query for case in load_benchmark_cases(BENCHMARK_CASES_PATH) if case.query]
+
+
+def bench_embedder(args) -> None:
+    from sentence_transformers import SentenceTransformer
+
+    from app_logic.onnx_models import OnnxEmbedder, cosine_parity
+
+    queries = _benchmark_queries()[:args.queries]
+    backends = {
+        "PyTorch fp32": lambda: SentenceTransformer(EMBED_MODEL),
+        "PyTorch fp16 (current app)": lambda: SentenceTransformer(
+            EMBED_MODEL, model_kwargs={"torch_dtype": "float16"},
+        ),
+        "ONNX Runtime fp32": lambda: OnnxEmbedder(ONNX_EMBEDDER_DIR, quantized=False),
+        "ONNX Runtime int8": lambda: OnnxEmbedder(ONNX_EMBEDDER_DIR, quantized=True),
+    }
+
+    print(f"\nSingle-query encode latency over {len(queries)} benchmark queries:")
+    reference = None
+    baseline = None
+    for label, load in backends.items():
+        try:
+            model = load()
+        except (FileNotFoundError, ImportError) as error:
+            print(f"  {label:<52} skipped ({error})")
+            continue
+        vectors = model.encode(queries, show_progress_bar=False)
+        if reference is None:
+            reference = vectors
+
+        def encode_each() -> None:
+            for query in queries:
+                model.encode([query], show_progress_bar=False)
+
+        seconds = _time_per_call(encode_each, args.repeats) / len(queries)
+        baseline = baseline or seconds
+        cosines = cosine_parity(reference, vectors)
+        status = "ok" if cosines.min() >= ONNX_PARITY_MIN_COSINE else "BELOW THRESHOLD"
+        _print_row(f"{label} (min cos {cosines.min():.4f}, {status})", seconds, baseline)
+
+
+# ---------------------------------------------------------------------------
+# reranker: current fp16 CrossEncoder vs. int8 / ONNX backends on the test cases
+# ---------------------------------------------------------------------------
+def _ranking_agreement(reference: np.ndarray, scores: np.ndarray, k: int) -> tuple[float, float, float]:
+    """(top-1 match, top-k overlap share, Spearman rank correlation)."""
+    ref_order = np.argsort(reference)[::-1]
+    order = np.argsort(scores)[::-1]
+    top_1 = float(ref_order[0] == order[0])
+    overlap = len(set(ref_order[:k]) & set(order[:k])) / min(k, len(order))
+    ref_ranks = np.argsort(ref_order)
+    ranks = np.argsort(order)
+    rho = float(np.corrcoef(ref_ranks, ranks)[0, 1]) if len(order) > 1 else 1.0
+    return top_1, overlap, rho
+
+
+def _benchmark_candidates(args, candidate_pool: int = CANDIDATE_POOL) -> list[tuple[str, pd.DataFrame]]:
+    """(query, top-*candidate_pool* candidates) for every benchmark query."""
+    from sentence_transformers import SentenceTransformer
+
+    from app_logic.data import load_courses, load_embeddings
+    from app_logic.retrieval import get_semantic_candidates
+
+    courses_df = load_courses(args.data)
+    embeddings = load_embeddings(EMBEDDING_STORE_DIR)
+    embedder = SentenceTransformer(EMBED_MODEL)
+    queries = _benchmark_queries()[:args.queries]
+    print(f"Retrieving top-{candidate_pool} candidates for {len(queries)} benchmark queries ...")
+    return [
+        (query, get_semantic_candidates(
+            embedder, query, courses_df, embeddings, candidate_pool=candidate_pool,
+        )[0])
+        for query in queries
+    ]
+
+
+def bench_reranker(args) -> None:
+    from sentence_transformers import CrossEncoder
+
+    from app_logic.onnx_models import OnnxCrossEncoder, load_int8_cross_encoder
+    from app_logic.rerank_input import PretokenizedReranker
+
+    pair_sets = [
+        [[query, text] for text in candidates_df["description"].fillna("").astype(str)]
+        for query, candidates_df in _benchmark_candidates(args)
+    ]
+    descriptions = [text for pairs in pair_sets for _, text in pairs]
+
+    backends = {
+        "PyTorch fp16 (current app)": lambda: CrossEncoder(
+            RERANKER_MODEL, model_kwargs={"torch_dtype": "float16"},
+        ),
+        f"PyTorch fp16, pre-tokenised (<= {RERANK_MAX_DOC_TOKENS} doc tokens)": lambda: PretokenizedReranker(
+            CrossEncoder(RERANKER_MODEL, model_kwargs={"torch_dtype": "float16"}), descriptions,
+        ),
+        "PyTorch fp32": lambda: CrossEncoder(RERANKER_MODEL),
+        "PyTorch dynamic int8": lambda: load_int8_cross_encoder(RERANKER_MODEL),
+        "ONNX Runtime fp32": lambda: OnnxCrossEncoder(ONNX_RERANKER_DIR, quantized=False),
+        "ONNX Runtime int8": lambda: OnnxCrossEncoder(ONNX_RERANKER_DIR, quantized=True),
+    }
+
+    print(f"\nRerank latency per query ({CANDIDATE_POOL} pairs); agreement with the current model:")
+    reference = None
+    baseline = None
+    for label, load in backends.items():
+        try:
+            model = load()
+        except (FileNotFoundError, ImportError, ValueError) as error:
+            print(f"  {label:<52} skipped ({error})")
+            continue
+        model.predict(pair_sets[0])  # warm-up
+        scores, timings = [], []
+        for pairs in pair_sets:
+            t0 = time.perf_counter()
+            scores.append(np.asarray(model.predict(pairs), dtype=float))
+            timings.append(time.perf_counter() - t0)
+        seconds = float(np.mean(timings))
+        baseline = baseline or seconds
+        if reference is None:
+            reference = scores
+        top_1, overlap, rho = np.mean(
+            [_ranking_agreement(ref, s, DEFAULT_TOP_K) for ref, s in zip(reference, scores)], axis=0,
+        )
+        # Same ranks are not enough: confidence cut-offs read the score values.
+        max_diff = max(float(np.abs(ref - s).max(initial=0.0)) for ref, s in zip(reference, scores))
+        _print_row(label, seconds, baseline)
+        print(
+            f"    worst query {max(timings) * 1000:.1f} ms  top-1 {top_1:.0%}  "
+            f"top-{DEFAULT_TOP_K} overlap {overlap:.0%}  spearman {rho:.3f}  "
+            f"max score diff {max_diff:.4f}"
+            + ("  SCORE MISMATCH" if max_diff > RERANK_PARITY_MAX_DIFF else "")
+        )
+
+
+# ---------------------------------------------------------------------------
+# pool: fixed vs. adaptive candidate-pool sizes, recall of the expected courses
+# ---------------------------------------------------------------------------
+def bench_pool(args) -> None:
+    from sentence_transformers import SentenceTransformer
+
+    from app_logic.benchmark import compare_ids, load_benchmark_cases
+    from app_logic.data import load_courses, load_embeddings
+    from app_logic.retrieval import adaptive_pool_size, batch_cosine_similarity, batch_encode_queries
+    from app_logic.scoring import top_k_indices
+
+    cases = [
+        case for case in load_benchmark_cases(BENCHMARK_CASES_PATH)
+        if case.expected_ids and not case.parse_error
+    ][:args.queries]
+    courses_df = load_courses(args.data)
+    course_ids = courses_df["aine_kood"].astype(str).to_numpy()
+    embeddings = load_embeddings(EMBEDDING_STORE_DIR)
+    embedder = SentenceTransformer(EMBED_MODEL)
+    scores = batch_cosine_similarity(batch_encode_queries(embedder, [c.query for c in cases]), embeddings)
+    ranked = [top_k_indices(row, ADAPTIVE_POOL_MAX) for row in scores]
+
+    settings = {f"fixed {size}": (lambda row, size=size: size) for size in (10, CANDIDATE_POOL, 30, ADAPTIVE_POOL_MAX)}
+    for gap in (0.03, ADAPTIVE_POOL_GAP, 0.08):
+        settings[f"adaptive (gap {gap}, mass {ADAPTIVE_POOL_MASS})"] = (
+            lambda row, gap=gap: adaptive_pool_size(row, gap=gap)
+        )
+
+    print(f"\nCandidate pool vs. recall of the expected courses ({len(cases)} test cases):")
+    print(f"  {'setting':<40} {'mean pool':>10} {'min':>5} {'max':>5} {'recall':>8}")
+    for label, pool_size in settings.items():
+        sizes, recalls = [], []
+        for case, row, top in zip(cases, scores, ranked):
+            size = pool_size(row[top])
+            missing = compare_ids(case.expected_ids, list(course_ids[top[:size]]), False).missing_ids
+            sizes.append(size)
+            recalls.append(1.0 - len(missing) / len(case.expected_ids))
+        print(
+            f"  {label:<40} {np.mean(sizes):10.1f} {min(sizes):5d} {max(sizes):5d} "
+            f"{np.mean(recalls):8.1%}"
+        )
+    print("  Pool size = cross-encoder pairs per query.")
+
+
+# ---------------------------------------------------------------------------
+# cascade: single-stage cross-encoder vs. small-model prefilter + cross-encoder
+# ---------------------------------------------------------------------------
+def bench_cascade(args) -> None:
+    from sentence_transformers import CrossEncoder
+
+    from app_logic.models import load_first_stage_model
+    from app_logic.retrieval import cascade_rerank_candidates, cascade_survivors, rerank_candidates
+
+    candidate_sets = _benchmark_candidates(args)
+    reranker = CrossEncoder(RERANKER_MODEL, model_kwargs={"torch_dtype": "float16"})
+    first_stage = load_first_stage_model()[0]
+    query, candidates_df = candidate_sets[0]
+    cascade_rerank_candidates(first_stage, reranker, query, candidates_df)  # warm-up
+
+    single_ids, cascade_ids, survivor_counts = [], [], []
+    t0 = time.perf_counter()
+    for query, candidates_df in candidate_sets:
+        single_ids.append(list(rerank_candidates(reranker, query, candidates_df)["aine_kood"]))
+    single_seconds = (time.perf_counter() - t0) / len(candidate_sets)
+    t0 = time.perf_counter()
+    for query, candidates_df in candidate_sets:
+        cascade_ids.append(list(
+            cascade_rerank_candidates(first_stage, reranker, query, candidates_df)["aine_kood"]
+        ))
+    cascade_seconds = (time.perf_counter() - t0) / len(candidate_sets)
+    for query, candidates_df in candidate_sets:
+        texts = candidates_df["description"].fillna("").astype(str)
+        scores = first_stage.predict([[query, text] for text in texts])
+        survivor_counts.append(len(cascade_survivors(scores, keep=max(CASCADE_KEEP, DEFAULT_TOP_K))))
+
+    overlap = np.mean([len(set(a) & set(b)) / max(len(a), 1) for a, b in zip(single_ids, cascade_ids)])
+    top_1 = np.mean([bool(a) and bool(b) and a[0] == b[0] for a, b in zip(single_ids, cascade_ids)])
+    print(f"\nRerank latency per query ({CANDIDATE_POOL} candidates, top-{DEFAULT_TOP_K}):")
+    _print_row("cross-encoder on the whole pool", single_seconds, single_seconds)
+    _print_row(f"cascade ({np.mean(survivor_counts):.1f} survivors on average)", cascade_seconds, single_seconds)
+    print(f"  Cascade vs. single stage: top-1 {top_1:.0%}, top-{DEFAULT_TOP_K} overlap {overlap:.0%}")
+    print("  (expected-course accuracy per mode: app benchmark, 'Kaskaad' ranking mode)")
+
+
+# ---------------------------------------------------------------------------
+# local-llm: JSON generation vs. yes/no logit scoring, with and without the
+# reused prompt-prefix KV cache; windowed listwise ranking of a larger pool
+# ---------------------------------------------------------------------------
+def _time_queries(fn, candidate_sets) -> tuple[float, float, list]:
+    """(mean seconds, worst seconds, results) of fn(query, candidates_df) per query."""
+    fn(*candidate_sets[0])  # warm-up
+    timings, results = [], []
+    for query, candidates_df in candidate_sets:
+        t0 = time.perf_counter()
+        results.append(fn(query, candidates_df))
+        timings.append(time.perf_counter() - t0)
+    return float(np.mean(timings)), float(np.max(timings)), results
+
+
+def bench_local_llm(args) -> None:
+    import torch
+
+    from app_logic.retrieval import (
+        generate_local_rerank_response,
+        load_local_transformers_reranker,
+        local_rank_prompt,
+        rerank_candidates_with_local_llm,
+    )
+
+    candidate_sets = _benchmark_candidates(args)
+    cached = load_local_transformers_reranker(args.model, reuse_prefix=True)
+    uncached = {**cached, "reuse_prefix": False}
+    prefix = cached.get("prompt_prefix")
+    print(f"\nCached prompt prefix: {len(prefix['ids']) if prefix else 0} tokens ({args.model})")
+
+    def first_token(runtime):
+        # Same prompt as the generate method; one new token = prefill time.
+        def call(query, candidates_df):
+            prompt = local_rank_prompt(query, candidates_df.reset_index(drop=True))
+            return generate_local_rerank_response(runtime, prompt, max_new_tokens=1)
+        return call
+
+    def ranking(runtime, method):
+        def call(query, candidates_df):
+            ranked_df = rerank_candidates_with_local_llm(query, candidates_df, runtime, top_k=None, method=method)
+            return list(ranked_df["aine_kood"])
+        return call
+
+    print(f"Per query ({CANDIDATE_POOL} candidates):")
+    rows = [
+        ("generate: time to first token, full prefill", first_token(uncached), "ttft"),
+        ("generate: time to first token, cached prefix", first_token(cached), "ttft"),
+        ("generate: JSON ranking, full prefill", ranking(uncached, "generate"), "generate"),
+        ("generate: JSON ranking, cached prefix", ranking(cached, "generate"), "generate"),
+        ("logits: yes/no scoring, full prompts", ranking(uncached, "logits"), "logits"),
+        ("logits: yes/no scoring, cached query prefix", ranking(cached, "logits"), "logits"),
+    ]
+    baselines: dict[str, float] = {}
+    ranked: dict[str, list] = {}
+    for label, fn, group in rows:
+        seconds, worst, results = _time_queries(fn, candidate_sets)
+        baselines.setdefault(group, seconds)
+        ranked.setdefault(group, results)
+        _print_row(label, seconds, baselines[group])
+        print(f"    worst query {worst * 1000:.1f} ms")
+
+    if prefix:
+        # Each generate call and each logits batch copies a prefix cache; that
+        # only pays off while the copy is cheaper than prefilling again.
+        print(f"\nPrefix KV cache per use ({len(prefix['ids'])} tokens, reuse_query_prefix={cached['reuse_query_prefix']}):")
+        copy_seconds = _time_per_call(lambda: copy.deepcopy(prefix["cache"]), args.repeats)
+        prefix_ids = torch.tensor([prefix["ids"]], device=cached["device"])
+
+        def prefill():
+            with torch.inference_mode():
+                cached["model"](input_ids=prefix_ids, use_cache=True)
+
+        prefill_seconds = _time_per_call(prefill, args.repeats)
+        _print_row("re-run prefix forward pass", prefill_seconds)
+        _print_row("copy.deepcopy of cached prefix", copy_seconds, prefill_seconds)
+
+    pairs = list(zip(ranked["generate"], ranked["logits"]))
+    top_1 = np.mean([bool(a) and bool(b) and a[0] == b[0] for a, b in pairs])
+    overlap = np.mean([
+        len(set(a[:DEFAULT_TOP_K]) & set(b[:DEFAULT_TOP_K])) / max(min(DEFAULT_TOP_K, len(a)), 1)
+        for a, b in pairs
+    ])
+    print(f"  Logits vs. generation: top-1 {top_1:.0%}, top-{DEFAULT_TOP_K} overlap {overlap:.0%}")
+    print("  (expected-course accuracy per method: app benchmark, local LLM ranking mode)")
+
+    large_sets = _benchmark_candidates(args, candidate_pool=args.pool)
+    print(f"\nPer query ({args.pool} candidates, windows of {LOCAL_RERANK_WINDOW} every {LOCAL_RERANK_WINDOW_STRIDE}):")
+    single_seconds, worst, single = _time_queries(ranking(cached, "generate"), large_sets)
+    _print_row("generate: one prompt (truncated at 2048 tokens)", single_seconds, single_seconds)
+    print(f"    worst query {worst * 1000:.1f} ms")
+    seconds, worst, windowed = _time_queries(ranking(cached, "window"), large_sets)
+    _print_row("window: overlapping listwise windows", seconds, single_seconds)
+    print(f"    worst query {worst * 1000:.1f} ms")
+    overlap = np.mean([
+        len(set(a[:DEFAULT_TOP_K]) & set(b[:DEFAULT_TOP_K])) / max(min(DEFAULT_TOP_K, len(a)), 1)
+        for a, b in zip(windowed, single)
+    ])
+    print(f"  Window vs. one prompt: top-{DEFAULT_TOP_K} overlap {overlap:.0%}")
+
+
+# ---------------------------------------------------------------------------
+# local-llm-cpu: local LLM runtimes compared on throughput and peak memory,
+# each in a fresh process so the peak RSS is its own
+# ---------------------------------------------------------------------------
+def _local_runtime_profile(model_name: str, backend: str, prompts: list[str], scoring: list) -> dict:
+    import resource
+
+    from app_logic.retrieval import (
+        generate_local_rerank_response,
+        load_local_transformers_reranker,
+        local_llm_relevance_scores,
+    )
+
+    t0 = time.perf_counter()
+    runtime = load_local_transformers_reranker(model_name, backend=backend)
+    load_seconds = time.perf_counter() - t0
+    tokenizer = runtime["tokenizer"]
+    generate_local_rerank_response(runtime, prompts[0], max_new_tokens=8)  # warm-up
+
+    t0 = time.perf_counter()
+    for prompt in prompts:
+        generate_local_rerank_response(runtime, prompt, max_new_tokens=1)
+    first_token_seconds = (time.perf_counter() - t0) / len(prompts)
+
+    new_tokens = 0
+    t0 = time.perf_counter()
+    for prompt in prompts:
+        reply = generate_local_rerank_response(runtime, prompt)
+        new_tokens += len(tokenizer(reply, add_special_tokens=False)["input_ids"])
+    generate_seconds = time.perf_counter() - t0
+
+    scored = 0
+    t0 = time.perf_counter()
+    for query, documents in scoring:
+        local_llm_relevance_scores(runtime, query, documents)
+        scored += len(documents)
+    scoring_seconds = time.perf_counter() - t0
+
+    return {
+        "load_seconds": load_seconds,
+        "first_token_seconds": first_token_seconds,
+        "tokens_per_second": new_tokens / generate_seconds,
+        "generate_seconds": generate_seconds / len(prompts),
+        "candidates_per_second": scored / scoring_seconds,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def bench_local_llm_cpu(args) -> None:
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import get_context
+
+    from app_logic.retrieval import local_rank_prompt, local_rerank_document
+
+    candidate_sets = _benchmark_candidates(args)
+    prompts = [local_rank_prompt(query, df.reset_index(drop=True)) for query, df in candidate_sets]
+    scoring = [(query, [local_rerank_document(row) for _, row in df.iterrows()]) for query, df in candidate_sets]
+
+    print(f"\nLocal LLM runtimes ({args.model}, {len(prompts)} queries, {CANDIDATE_POOL} candidates):")
+    print(
+        f"  {'runtime':<24} {'load s':>7} {'TTFT ms':>8} {'gen ms':>8} {'tok/s':>7} "
+        f"{'cand/s':>7} {'peak RSS MB':>12}"
+    )
+    for backend, label in (("torch", "current (torch)"),
+                           ("cpu-int8", f"cpu-int8, {LOCAL_RERANK_CPU_THREADS} threads")):
+        # Fresh process per runtime: ru_maxrss only ever grows.
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            try:
+                profile = pool.submit(_local_runtime_profile, args.model, backend, prompts, scoring).result()
+            except (ImportError, RuntimeError) as error:
+                print(f"  {label:<24} skipped ({error})")
+                continue
+        print(
+            f"  {label:<24} {profile['load_seconds']:7.1f} {profile['first_token_seconds'] * 1000:8.0f} "
+            f"{profile['generate_seconds'] * 1000:8.0f} {profile['tokens_per_second']:7.1f} "
+            f"{profile['candidates_per_second']:7.1f} {profile['peak_rss_mb']:12.0f}"
+        )
+    print("  (ranking agreement per runtime: app benchmark with LOCAL_RERANK_BACKEND switched)")
+
+
+# ---------------------------------------------------------------------------
+# scheduler: concurrent sessions on one shared model, direct vs. micro-batched
+# ---------------------------------------------------------------------------
+def _concurrent_load(call, work: list, clients: int) -> tuple[float, np.ndarray]:
+    """Run *work* items through *call* from *clients* threads.
+
+    Returns (wall seconds, per-call latencies in seconds).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def timed(item) -> float:
+        t0 = time.perf_counter()
+        call(item)
+        return time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        latencies = np.array(list(pool.map(timed, work)))
+    return time.perf_counter() - t0, latencies
+
+
+def bench_scheduler(args) -> None:
+    from sentence_transformers import CrossEncoder, SentenceTransformer
+
+    from app_logic.scheduler import BatchedEmbedder, BatchedReranker
+
+    candidate_sets = _benchmark_candidates(args)
+    queries = [query for query, _ in candidate_sets]
+    pair_sets = [
+        [[query, text] for text in candidates_df["description"].fillna("").astype(str)]
+        for query, candidates_df in candidate_sets
+    ]
+    models = {
+        "embedder": (SentenceTransformer(EMBED_MODEL), "encode", BatchedEmbedder, queries),
+        "reranker": (
+            CrossEncoder(RERANKER_MODEL, model_kwargs={"torch_dtype": "float16"}),
+            "predict", BatchedReranker, pair_sets,
+        ),
+    }
+    for name, (model, method, wrapper, work) in models.items():
+        batched = wrapper(model, name=name)
+        print(f"\n{name}: {len(work)} requests ({method})")
+        print(f"  {'clients / mode':<28} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+        for clients in (1, args.clients):
+            for label, target in (("direct", model), ("micro-batched", batched)):
+                call = getattr(target, method)
+                call(work[0])  # warm-up
+                seconds, latencies = _concurrent_load(
+                    (lambda item, call=call: call([item])) if name == "embedder" else call,
+                    work, clients,
+                )
+                print(
+                    f"  {f'{clients} x {label}':<28} {len(work) / seconds:8.1f} "
+                    f"{np.percentile(latencies, 50) * 1000:8.1f} {np.percentile(latencies, 95) * 1000:8.1f}"
+                )
+        stats = batched.stats()
+        print(
+            f"  batches: {stats['batches']} for {stats['requests']} requests "
+            f"(mean {stats['mean_batch_requests']:.1f}, max {stats['max_batch_requests']}), "
+            f"max queue depth {stats['max_queue_depth']}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N random course vectors.")
+    parser.add_argument("--dim", type=int, default=1024, help="Dimension for --synthetic.")
+    parser.add_argument("--queries", type=int, default=64, help="Number of random queries.")
+    parser.add_argument("--repeats", type=int, default=20, help="Timed repetitions.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data", default=DATA_PATH, help="Course CSV for data-driven benchmarks.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("kernel", help="Cosine scoring + top-k selection kernel.").set_defaults(
+        func=bench_kernel,
+    )
+    sub.add_parser("masked", help="Filtered search without slicing the matrix.").set_defaults(
+        func=bench_masked,
+    )
+    sub.add_parser("filters", help="Sidebar filter masks; also checks parity.").set_defaults(
+        func=bench_filters,
+    )
+    sub.add_parser("quantized", help="Int8 / binary search recall and latency.").set_defaults(
+        func=bench_quantized,
+    )
+    sub.add_parser("embedder", help="PyTorch vs ONNX query embedder latency and parity.").set_defaults(
+        func=bench_embedder,
+    )
+    sub.add_parser("reranker", help="Cross-encoder backends: latency and ranking agreement.").set_defaults(
+        func=bench_reranker,
+    )
+    sub.add_parser("pool", help="Fixed vs. adaptive candidate pool: size and recall.").set_defaults(
+        func=bench_pool,
+    )
+    scheduler = sub.add_parser("scheduler", help="Concurrent sessions: direct vs. micro-batched models.")
+    scheduler.add_argument("--clients", type=int, default=8, help="Concurrent client threads.")
+    scheduler.set_defaults(func=bench_scheduler)
+    sub.add_parser("cascade", help="Cascade vs. single-stage reranking: latency and agreement.").set_defaults(
+        func=bench_cascade,
+    )
+    local_llm = sub.add_parser("local-llm", help="Local LLM reranker: generation vs. logits, with/without prefix cache.")
+    local_llm.add_argument("--model", default=LOCAL_RERANK_MODEL, help="Causal LM for local reranking.")
+    local_llm.add_argument(
+        "--pool", type=int, default=LOCAL_RERANK_WINDOW_POOL, help="Candidate pool for the window method.",
+    )
+    local_llm.set_defaults(func=bench_local_llm)
+    local_llm_cpu = sub.add_parser("local-llm-cpu", help="Local LLM runtimes: tokens/s and peak RSS.")
+    local_llm_cpu.add_argument("--model", default=LOCAL_RERANK_MODEL, help="Causal LM for local reranking.")
+    local_llm_cpu.set_defaults(func=bench_local_llm_cpu)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
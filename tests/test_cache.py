@@ -0,0 +1,138 @@
+import numpy as np
+
+from app_logic.cache import (
+    CachedEmbedder,
+    PersistentLRUCache,
+    SemanticResponseCache,
+    cache_key,
+    normalize_cache_text,
+)
+
+
+class _CountingEmbedder:
+    def __init__(self):
+        self.calls: list[list[str]] = []
+
+    def encode(self, texts, **kwargs):
+        self.calls.append(list(texts))
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = PersistentLRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the oldest
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+    assert cache.stats() == {
+        "hits": 3, "memory_hits": 3, "disk_hits": 0, "misses": 1, "memory_items": 2,
+    }
+
+
+def test_disk_tier_survives_restart_and_refills_memory(tmp_path):
+    path = str(tmp_path / "cache" / "values.sqlite")
+    PersistentLRUCache(1, path).put_many({"a": np.arange(3), "b": "text"})
+
+    reopened = PersistentLRUCache(1, path)
+    assert len(reopened) == 0
+    np.testing.assert_array_equal(reopened.get("a"), np.arange(3))
+    assert reopened.get("a") is not None
+    assert reopened.stats()["disk_hits"] == 1
+    assert reopened.stats()["memory_hits"] == 1
+
+
+def test_clear_empties_both_tiers(tmp_path):
+    path = str(tmp_path / "values.sqlite")
+    cache = PersistentLRUCache(4, path)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.clear()
+
+    assert cache.get("a") is None
+    assert PersistentLRUCache(4, path).get("a") is None
+    assert cache.stats()["hits"] == 0
+
+
+def test_cache_key_normalises_text_but_keeps_case():
+    assert normalize_cache_text(" masinõpe \n ja  AI ") == "masinõpe ja AI"
+    assert cache_key("m", normalize_cache_text("a  b")) == cache_key("m", "a b")
+    assert cache_key("m", "AI") != cache_key("m", "ai")
+
+
+def test_cached_embedder_only_encodes_missing_texts():
+    model = _CountingEmbedder()
+    embedder = CachedEmbedder(model, "bge-m3", PersistentLRUCache(10))
+    first = embedder.encode(["ab", "abc"])
+    second = embedder.encode(["abc", "abcd", "ab "])
+
+    assert model.calls == [["ab", "abc"], ["abcd"]]
+    np.testing.assert_array_equal(second[0], first[1])
+    np.testing.assert_array_equal(second[2], first[0])
+    assert embedder.encode("ab").shape == (2,)
+
+
+def _response_cache(clock=None, max_items=8) -> SemanticResponseCache:
+    return SemanticResponseCache(max_items, ttl_seconds=60, threshold=0.9, clock=clock or _Clock())
+
+
+def test_response_cache_matches_similar_query_in_same_context():
+    cache = _response_cache()
+    cache.put([1.0, 0.0], ["B", "A"], "ECTS: 6", "et", [], "vastus", tokens=100)
+
+    hit = cache.get([0.95, 0.1], ["A", "B"], "ECTS: 6", "et", [])
+    assert hit["response"] == "vastus"
+    assert hit["similarity"] > 0.9
+    assert cache.get([0.0, 1.0], ["A", "B"], "ECTS: 6", "et", []) is None
+    assert cache.get([1.0, 0.0], ["A"], "ECTS: 6", "et", []) is None
+    assert cache.get([1.0, 0.0], ["A", "B"], "", "et", []) is None
+    assert cache.get([1.0, 0.0], ["A", "B"], "ECTS: 6", "en", []) is None
+    assert cache.stats()["tokens_saved"] == 100
+    assert cache.stats()["misses"] == 4
+
+
+def test_response_cache_keys_on_conversation_history():
+    cache = _response_cache()
+    history = [{"role": "user", "content": "AI kursused"}, {"role": "assistant", "content": "..."}]
+    cache.put([1.0, 0.0], ["A"], "", "et", history, "jätkuvastus")
+
+    assert cache.get([1.0, 0.0], ["A"], "", "et", []) is None
+    assert cache.get([1.0, 0.0], ["A"], "", "et", history[:1]) is None
+    assert cache.get([1.0, 0.0], ["A"], "", "et", list(history))["response"] == "jätkuvastus"
+
+
+def test_response_cache_entries_expire_after_ttl():
+    clock = _Clock()
+    cache = _response_cache(clock)
+    cache.put([1.0, 0.0], ["A"], "", "et", [], "vastus")
+
+    clock.now = 60.0
+    assert cache.get([1.0, 0.0], ["A"], "", "et", []) is not None
+    clock.now = 60.5
+    assert cache.get([1.0, 0.0], ["A"], "", "et", []) is None
+    assert cache.stats()["expired"] == 1
+    assert len(cache) == 0
+
+
+def test_response_cache_drops_least_recently_used():
+    cache = _response_cache(max_items=2)
+    cache.put([1.0, 0.0], ["A"], "", "et", [], "a")
+    cache.put([1.0, 0.0], ["B"], "", "et", [], "b")
+    cache.get([1.0, 0.0], ["A"], "", "et", [])  # "b" is now the oldest
+    cache.put([1.0, 0.0], ["C"], "", "et", [], "c")
+
+    assert cache.get([1.0, 0.0], ["B"], "", "et", []) is None
+    assert cache.get([1.0, 0.0], ["A"], "", "et", [])["response"] == "a"
+    assert cache.get([1.0, 0.0], ["C"], "", "et", [])["response"] == "c"
@@ -0,0 +1,26 @@
+import numpy as np
+
+from app_logic.retrieval import cascade_survivors
+
+
+def test_margin_limits_survivors_on_logit_scores():
+    # Six clear winners, two near-ties within the margin, four far behind.
+    scores = np.array([6.0, 5.5, 5.2, 5.0, 4.8, 4.5, 4.0, 3.7, -2.0, -3.0, -4.0, -5.0])
+    survivors = cascade_survivors(scores, keep=6, margin=1.0, max_survivors=10)
+    assert len(survivors) == 8
+    assert list(survivors) == [0, 1, 2, 3, 4, 5, 6, 7]
+
+
+def test_clear_gap_keeps_only_top_keep():
+    scores = np.array([8.0, 7.5, 7.0, 6.5, 6.0, 5.5, 0.0, -1.0, -2.0, -3.0, -4.0, -6.0])
+    survivors = cascade_survivors(scores, keep=6, margin=1.0, max_survivors=10)
+    assert len(survivors) == 6
+
+
+def test_survivors_capped_at_max():
+    survivors = cascade_survivors(np.zeros(12), keep=6, margin=1.0, max_survivors=10)
+    assert len(survivors) == 10
+
+
+def test_empty_scores():
+    assert len(cascade_survivors(np.array([]))) == 0
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app_logic.embedding_store import (
+    diff_embedding_store,
+    is_store_stale,
+    open_embedding_store,
+    validate_embedding_store,
+    write_embedding_store,
+)
+
+
+def _catalogue(tmp_path, codes=("AAA.01", "BBB.02", "CCC.03")):
+    courses_df = pd.DataFrame({
+        "aine_kood": list(codes),
+        "description": [f"Kursus {code}" for code in codes],
+    })
+    source = tmp_path / "courses.csv"
+    courses_df.to_csv(source, index=False)
+    return courses_df, str(source)
+
+
+def _vectors(rows: int) -> np.ndarray:
+    return np.random.default_rng(0).normal(size=(rows, 4)).astype(np.float32)
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+def test_store_round_trip_is_normalised_and_memory_mapped(tmp_path, dtype):
+    courses_df, source = _catalogue(tmp_path)
+    store_dir = tmp_path / "store"
+    write_embedding_store(_vectors(3), courses_df, "bge-m3", source, str(store_dir), dtype=dtype)
+
+    store = open_embedding_store(str(store_dir))
+    assert isinstance(store.matrix, np.memmap)
+    assert str(store.matrix.dtype) == dtype
+    np.testing.assert_allclose(np.linalg.norm(store.matrix.astype(np.float32), axis=1), 1.0, atol=1e-3)
+    assert store.course_ids == ["AAA.01", "BBB.02", "CCC.03"]
+    assert not list(store_dir.glob("*.tmp"))
+    validate_embedding_store(store, courses_df)
+
+
+def test_store_rejects_unknown_dtype_and_length_mismatch(tmp_path):
+    courses_df, source = _catalogue(tmp_path)
+    with pytest.raises(ValueError):
+        write_embedding_store(_vectors(3), courses_df, "bge-m3", source, str(tmp_path), dtype="int8")
+    with pytest.raises(ValueError):
+        write_embedding_store(_vectors(2), courses_df, "bge-m3", source, str(tmp_path))
+
+
+def test_validation_catches_reordered_or_resized_catalogue(tmp_path):
+    courses_df, source = _catalogue(tmp_path)
+    write_embedding_store(_vectors(3), courses_df, "bge-m3", source, str(tmp_path / "store"))
+    store = open_embedding_store(str(tmp_path / "store"))
+
+    with pytest.raises(ValueError, match="order"):
+        validate_embedding_store(store, courses_df.iloc[::-1])
+    with pytest.raises(ValueError, match="rows"):
+        validate_embedding_store(store, courses_df.iloc[:2])
+
+
+def test_store_is_stale_once_the_source_csv_changes(tmp_path):
+    courses_df, source = _catalogue(tmp_path)
+    write_embedding_store(_vectors(3), courses_df, "bge-m3", source, str(tmp_path / "store"))
+    store = open_embedding_store(str(tmp_path / "store"))
+    assert not is_store_stale(store, source)
+
+    courses_df.assign(description="muudetud").to_csv(source, index=False)
+    assert is_store_stale(store, source)
+
+
+def test_diff_compares_version_uuids_and_description_hashes(tmp_path):
+    courses_df, source = _catalogue(tmp_path)
+    write_embedding_store(
+        _vectors(3), courses_df, "bge-m3", source, str(tmp_path / "store"),
+        version_uuids=["v1", "v1", "v1"],
+    )
+    store = open_embedding_store(str(tmp_path / "store"))
+
+    current = pd.DataFrame({
+        "aine_kood": ["AAA.01", "BBB.02", "CCC.03", "DDD.04"],
+        "description": ["Kursus AAA.01", "Kursus BBB.02", "Uus kirjeldus", "Kursus DDD.04"],
+    })
+    diff = diff_embedding_store(store, current, ["v1", "v2", "v1", "v1"])
+    assert diff == {
+        "new": ["DDD.04"],
+        "changed": ["BBB.02", "CCC.03"],
+        "removed": [],
+        "unchanged": ["AAA.01"],
+    }
+
+    diff = diff_embedding_store(store, current.iloc[1:2], ["v1"])
+    assert diff["removed"] == ["AAA.01", "CCC.03"]
+    assert diff["unchanged"] == ["BBB.02"]
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app_logic.filters import apply_filters, build_filter_index
+
+
+@pytest.fixture
+def courses() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "semester": ["Kevad", "sügis", "kevad", "Sügis", None, "kevad"],
+            "eap": [6, "3", 6.0, None, 12, "x"],
+            "hindamisskaala": ["Eristav (A, B, C, D, E, F, mi)", "Mitteeristav (arv, m.arv)",
+                               None, "Eristav (A, B, C, D, E, F, mi)", "Mitteeristav", "Eristav"],
+            "oppekeeled": ["eesti keel", "inglise keel, eesti keel", None, "inglise keel", "vene keel", "Eesti keel"],
+            "linn": ["Tartu", "Tallinn", "Tartu", None, "Narva", "Tartu"],
+            "oppeaste": ["bakalaureuseõpe", "magistriõpe, doktoriõpe", "bakalaureuseõpe (3+2)",
+                         None, "doktoriõpe", "magistriõpe"],
+            "oppeviis": ["päevaõpe", "sessioonõpe", "päevaõpe", "e-õpe", None, "päevaõpe"],
+            "valdkond": ["loodus- ja täppisteaduste valdkond", "humanitaarteaduste ja kunstide valdkond",
+                         "loodus- ja täppisteaduste valdkond", None, "meditsiiniteaduste valdkond",
+                         "sotsiaalteaduste valdkond"],
+        },
+        # A non-default index: masks must align with df.index, not positions.
+        index=[10, 11, 12, 13, 14, 15],
+    )
+
+
+SELECTIONS = [
+    dict(semesters=[], eap_range=(0, 30), grading_choice="Koik"),
+    dict(semesters=["Kevad ", ""], eap_range=(3, 6), grading_choice="Eristav"),
+    dict(semesters=["kevad"], eap_range=(0, 30), grading_choice="Mitteeristav"),
+    dict(semesters=[], eap_range=(6, 6), grading_choice="Koik", languages=["eesti keel"]),
+    # A language value not among the precomputed options.
+    dict(semesters=[], eap_range=(0, 30), grading_choice="Koik", languages=["keel"]),
+    dict(semesters=[], eap_range=(0, 30), grading_choice="Koik", cities=["Tartu", "Narva", "Pärnu"]),
+    dict(semesters=[], eap_range=(0, 30), grading_choice="Koik", study_levels=["(3+2)", "doktoriõpe"]),
+    dict(
+        semesters=["kevad", "sügis"], eap_range=(0, 12), grading_choice="Koik",
+        teaching_methods=["päevaõpe"], domains=["loodus- ja täppisteaduste valdkond"],
+    ),
+    dict(semesters=["talv"], eap_range=(0, 30), grading_choice="Koik"),
+]
+
+
+@pytest.mark.parametrize("selection", SELECTIONS)
+def test_filter_index_matches_pandas_scan(courses, selection):
+    expected = apply_filters(courses, **selection)
+    actual = apply_filters(courses, **selection, filter_index=build_filter_index(courses))
+    pd.testing.assert_series_equal(actual, expected, check_names=False)
+
+
+def test_filter_index_is_reusable_across_selections(courses):
+    filter_index = build_filter_index(courses)
+    for selection in SELECTIONS:
+        expected = apply_filters(courses, **selection)
+        actual = apply_filters(courses, **selection, filter_index=filter_index)
+        np.testing.assert_array_equal(actual.to_numpy(), expected.to_numpy())
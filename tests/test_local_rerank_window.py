@@ -0,0 +1,95 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from app_logic.retrieval import (
+    _window_starts,
+    rerank_candidates_with_local_llm,
+    windowed_rank_with_local_llm,
+)
+
+
+class _OracleRuntime:
+    """Remote-style runtime whose ``generate`` ranks a prompt's candidates by a known relevance."""
+
+    def __init__(self, relevance: dict[str, float], reply=None):
+        self.relevance = relevance
+        self.reply = reply
+        self.prompt_sizes: list[int] = []
+
+    def generate(self, prompt: str) -> str:
+        candidates = json.loads(prompt.split("Candidates: ", 1)[1])
+        self.prompt_sizes.append(len(candidates))
+        if self.reply is not None:
+            return self.reply
+        ranked = sorted(candidates, key=lambda item: -self.relevance[item["aine_kood"]])
+        return json.dumps({"ranked_indices": [item["index"] for item in ranked]})
+
+    def runtime(self) -> dict:
+        return {"model_name": "oracle", "generate": self.generate}
+
+
+def _pool(n: int, seed: int = 0) -> tuple[pd.DataFrame, dict[str, float]]:
+    codes = [f"AINE.{i:02d}" for i in range(n)]
+    relevance = dict(zip(codes, np.random.default_rng(seed).permutation(n).astype(float)))
+    df = pd.DataFrame({"aine_kood": codes, "nimi_et": codes, "description": ["kirjeldus"] * n})
+    return df, relevance
+
+
+def test_window_starts_overlap_and_end_at_the_pool():
+    assert _window_starts(8, 10, 5) == [0]
+    assert _window_starts(23, 10, 5) == [0, 5, 10, 13]
+    assert _window_starts(60, 10, 5) == list(range(0, 55, 5))
+
+
+def test_small_pool_is_one_prompt():
+    df, relevance = _pool(7)
+    oracle = _OracleRuntime(relevance)
+    order = windowed_rank_with_local_llm("q", df, oracle.runtime(), window=10, stride=5)
+
+    assert oracle.prompt_sizes == [7]
+    assert [df["aine_kood"][i] for i in order] == sorted(relevance, key=lambda code: -relevance[code])
+
+
+def test_tournament_keeps_prompts_bounded_and_finds_the_best():
+    df, relevance = _pool(60)
+    oracle = _OracleRuntime(relevance)
+    order = windowed_rank_with_local_llm("q", df, oracle.runtime(), window=10, stride=5)
+
+    assert sorted(order) == list(range(60))
+    assert max(oracle.prompt_sizes) <= 10
+    # Levels of 60 -> 30 -> 15 -> 10 candidates, then one final window.
+    assert len(oracle.prompt_sizes) == 11 + 5 + 2 + 1
+    ranked = [relevance[df["aine_kood"][i]] for i in order]
+    # The final window is a full ranking of the survivors, best first.
+    assert ranked[:10] == sorted(ranked[:10], reverse=True)
+    assert ranked[0] == 59
+
+
+def test_later_levels_rank_above_earlier_drops():
+    df, relevance = _pool(23, seed=1)
+    oracle = _OracleRuntime(relevance)
+    order = windowed_rank_with_local_llm("q", df, oracle.runtime(), window=10, stride=5)
+
+    # 23 -> 12 -> 10: the 11 first-level drops close the ranking.
+    assert oracle.prompt_sizes == [10] * 4 + [10] * 2 + [10]
+    ranked = [relevance[df["aine_kood"][i]] for i in order]
+    assert ranked[:10] == sorted(ranked[:10], reverse=True)
+    last_drops = {relevance[df["aine_kood"][i]] for i in order[-11:]}
+    assert max(relevance.values()) not in last_drops
+
+
+def test_unparseable_replies_keep_the_current_order():
+    df, relevance = _pool(9)
+    oracle = _OracleRuntime(relevance, reply="ei oska")
+    assert windowed_rank_with_local_llm("q", df, oracle.runtime(), window=10, stride=5) == list(range(9))
+
+
+def test_window_method_returns_top_k_rows():
+    df, relevance = _pool(30, seed=2)
+    oracle = _OracleRuntime(relevance)
+    ranked_df = rerank_candidates_with_local_llm("q", df, oracle.runtime(), top_k=5, method="window")
+
+    assert len(ranked_df) == 5
+    assert relevance[ranked_df["aine_kood"].iloc[0]] == 29
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from app_logic.config import LOOKUP_MAX_PREFIX_MATCHES
+from app_logic.lookup import build_course_lookup, normalize_title
+
+
+def _catalogue() -> pd.DataFrame:
+    return pd.DataFrame({
+        "aine_kood": ["LTAT.03.001", "LTAT.03.001_2", "MTAT.03.227", "LTAT.02.004_1", None],
+        "nimi_et": ["Tarkvaratehnika", "Tarkvaratehnika", "Masinõpe", "Andmebaasid", "Nimeta"],
+        "nimi_en": ["Software Engineering", "Software Engineering", "Machine Learning", "Databases", None],
+    })
+
+
+def test_normalize_title_folds_case_and_punctuation_but_keeps_diacritics():
+    assert normalize_title("  Masinõpe:  SISSEJUHATUS! ") == "masinõpe sissejuhatus"
+    assert normalize_title("Masinope") != normalize_title("Masinõpe")
+
+
+def test_code_queries_match_exact_and_base_codes():
+    index = build_course_lookup(_catalogue())
+
+    assert list(index.lookup("mtat.03.227")) == [2]
+    assert list(index.lookup("LTAT.03.001_2")) == [1]
+    # An exact code wins over rows sharing its base code; a base code
+    # without an exact row matches its suffixed versions.
+    assert list(index.lookup("LTAT.03.001?")) == [0]
+    assert list(index.lookup("LTAT.02.004")) == [3]
+    # Several codes in one query are all returned once.
+    assert list(index.lookup("LTAT.02.004, MTAT.03.227; LTAT.02.004")) == [3, 2]
+
+
+def test_mixed_queries_are_not_code_lookups():
+    index = build_course_lookup(_catalogue())
+
+    assert index.find_codes("LTAT.02.004 kursus") is None
+    assert index.find_codes("") is None
+    assert len(index.lookup("kursused andmeteaduses")) == 0
+
+
+def test_title_queries_match_exact_titles_in_either_language():
+    index = build_course_lookup(_catalogue())
+
+    assert list(index.lookup("masinõpe")) == [2]
+    assert list(index.lookup("Machine learning.")) == [2]
+    assert list(index.lookup("software engineering")) == [0, 1]
+
+
+def test_title_prefixes_need_length_and_few_matches():
+    index = build_course_lookup(_catalogue())
+
+    assert list(index.lookup("andmebaa")) == [3]
+    assert len(index.lookup("andme")) == 0  # shorter than LOOKUP_MIN_PREFIX_CHARS
+
+    many = pd.DataFrame({
+        "aine_kood": [f"X.{i}" for i in range(LOOKUP_MAX_PREFIX_MATCHES + 1)],
+        "nimi_et": [f"Seminar {i}" for i in range(LOOKUP_MAX_PREFIX_MATCHES + 1)],
+    })
+    assert len(build_course_lookup(many).lookup("seminar")) == 0
+
+
+def test_row_mask_removes_filtered_rows():
+    index = build_course_lookup(_catalogue())
+    mask = np.array([False, True, True, True, True])
+
+    assert list(index.lookup("Tarkvaratehnika", row_mask=mask)) == [1]
+    assert len(index.lookup("LTAT.03.001", row_mask=~mask)) == 1
+    assert len(index.lookup("masinõpe", row_mask=pd.Series(~mask))) == 0
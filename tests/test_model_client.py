@@ -0,0 +1,50 @@
+import numpy as np
+
+from app_logic.cache import CachedEmbedder, PersistentLRUCache, RerankScoreCache
+from app_logic.model_client import RemoteCrossEncoder, RemoteEmbedder
+
+
+class _DownServer:
+    """Model-server client whose server has gone away."""
+
+    info = {"embedder_key": "bge-m3:onnx-int8", "reranker_key": "reranker:onnx-int8"}
+
+    def encode(self, texts, **options):
+        raise ConnectionRefusedError
+
+    def rerank(self, pairs, model="reranker", **options):
+        raise ConnectionRefusedError
+
+
+class _LocalEmbedder:
+    def encode(self, texts, **kwargs):
+        return np.ones((len(texts), 3), dtype=np.float32)
+
+
+class _LocalReranker:
+    def predict(self, pairs, **kwargs):
+        return np.full(len(pairs), 0.5, dtype=np.float32)
+
+
+def test_embedder_fallback_switches_cache_key():
+    remote = RemoteEmbedder(_DownServer(), fallback=lambda: (_LocalEmbedder(), "bge-m3"))
+    assert remote.model_key == "bge-m3:onnx-int8"
+    cache = PersistentLRUCache(10)
+    embedder = CachedEmbedder(remote, remote.model_key, cache)
+
+    embedder.encode(["masinõpe"])
+    assert remote.model_key == "bge-m3"
+    # The local vector is stored under the local key, not the server's.
+    local_only = CachedEmbedder(_LocalEmbedder(), "bge-m3", cache)
+    local_only.encode(["masinõpe"])
+    assert cache.stats()["hits"] == 1
+
+
+def test_reranker_fallback_switches_cache_key():
+    remote = RemoteCrossEncoder(_DownServer(), fallback=lambda: (_LocalReranker(), "reranker"))
+    cache = PersistentLRUCache(10)
+    scores = RerankScoreCache(remote.model_key, cache).score(remote, "q", ["A"], ["text"])
+    np.testing.assert_allclose(scores, [0.5])
+
+    RerankScoreCache("reranker", cache).score(_LocalReranker(), "q", ["A"], ["text"])
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,25 @@
+import numpy as np
+
+from app_logic.onnx_models import OnnxCrossEncoder
+
+
+class _FakeSession:
+    def __init__(self, logits):
+        self.logits = np.asarray(logits, dtype=np.float32)
+
+    def run(self, outputs, inputs):
+        return [self.logits[:len(inputs["input_ids"])]]
+
+
+def test_onnx_scores_match_torch_sigmoid():
+    logits = np.array([[-4.0], [0.0], [2.5]], dtype=np.float32)
+    model = OnnxCrossEncoder.__new__(OnnxCrossEncoder)
+    model.session = _FakeSession(logits)
+
+    ids = np.zeros((3, 4), dtype=np.int64)
+    scores = model.score_tokens(ids, np.ones_like(ids))
+
+    # CrossEncoder.predict applies Sigmoid to single-label models.
+    expected = 1.0 / (1.0 + np.exp(-logits[:, 0]))
+    np.testing.assert_allclose(scores, expected, rtol=1e-6)
+    assert scores.min() >= 0.0 and scores.max() <= 1.0
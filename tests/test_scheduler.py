@@ -0,0 +1,131 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+from app_logic.scheduler import BatchedReranker, MicroBatcher
+
+
+class _GatedModel:
+    """Batch function that records its calls and holds the first one open."""
+
+    def __init__(self):
+        self.calls: list[tuple[list, dict]] = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, items, **options):
+        self.calls.append((list(items), options))
+        self.entered.set()
+        assert self.release.wait(5)
+        return np.asarray(items) * 10
+
+
+def _busy_batcher(model, **options) -> tuple[MicroBatcher, Future]:
+    """Batcher whose worker is inside its first call, so later requests queue up."""
+    batcher = MicroBatcher(model, name=f"test-{id(model)}", **options)
+    first = batcher.submit([0])
+    assert model.entered.wait(5)
+    return batcher, first
+
+
+def test_queued_requests_with_equal_options_share_one_batch():
+    model = _GatedModel()
+    batcher, first = _busy_batcher(model, max_wait_ms=0)
+    a = batcher.submit([1, 2])
+    b = batcher.submit([3])
+    other = batcher.submit([4], scale=2)
+    model.release.set()
+
+    np.testing.assert_array_equal(a.result(5), [10, 20])
+    np.testing.assert_array_equal(b.result(5), [30])
+    np.testing.assert_array_equal(other.result(5), [40])
+    np.testing.assert_array_equal(first.result(5), [0])
+    assert model.calls == [([0], {}), ([1, 2, 3], {}), ([4], {"scale": 2})]
+    stats = batcher.stats()
+    assert stats["batches"] == 3
+    assert stats["max_batch_requests"] == 2
+
+
+def test_batches_respect_the_item_budget():
+    model = _GatedModel()
+    batcher, _ = _busy_batcher(model, max_batch_items=3, max_wait_ms=0)
+    futures = [batcher.submit([i, i]) for i in range(1, 4)]
+    model.release.set()
+
+    for future in futures:
+        future.result(5)
+    assert [items for items, _ in model.calls] == [[0], [1, 1], [2, 2], [3, 3]]
+
+
+def test_errors_reach_every_request_of_the_batch():
+    def fail(items):
+        raise RuntimeError("model down")
+
+    batcher = MicroBatcher(fail, name="test-errors")
+    with pytest.raises(RuntimeError, match="model down"):
+        batcher([1])
+    assert batcher.stats()["batches"] == 0
+
+
+def _after_shared_batch(model, **options) -> MicroBatcher:
+    """Batcher whose last dispatched batch held two requests."""
+    batcher, first = _busy_batcher(model, **options)
+    shared = [batcher.submit([1]), batcher.submit([2])]
+    model.release.set()
+    for future in [first, *shared]:
+        future.result(5)
+    return batcher
+
+
+def test_waits_for_stragglers_only_after_shared_batches():
+    model = _GatedModel()
+    batcher = _after_shared_batch(model, max_wait_ms=100)
+
+    started = time.perf_counter()
+    batcher([3])  # the previous batch was shared: waits out max_wait
+    assert time.perf_counter() - started >= 0.09
+
+    started = time.perf_counter()
+    batcher([4])  # the previous batch had one request: no wait
+    assert time.perf_counter() - started < 0.09
+    assert [items for items, _ in model.calls] == [[0], [1, 2], [3], [4]]
+
+
+def test_full_batch_is_dispatched_before_max_wait():
+    model = _GatedModel()
+    batcher = _after_shared_batch(model, max_batch_items=2, max_wait_ms=5000)
+
+    started = time.perf_counter()
+    early = batcher.submit([3])
+    late = batcher.submit([4])
+    np.testing.assert_array_equal(early.result(5), [30])
+    np.testing.assert_array_equal(late.result(5), [40])
+    assert time.perf_counter() - started < 4
+    assert [items for items, _ in model.calls][-1] == [3, 4]
+
+
+def test_idle_worker_exits_and_restarts_on_demand():
+    batcher = MicroBatcher(lambda items: np.asarray(items), name="test-idle", idle_seconds=0.01)
+    batcher([1])
+    deadline = time.perf_counter() + 5
+    while batcher._worker is not None and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    assert batcher._worker is None
+
+    np.testing.assert_array_equal(batcher([2]), [2])
+
+
+def test_batched_reranker_keeps_the_predict_interface():
+    class Model:
+        name = "reranker"
+
+        def predict(self, pairs, **kwargs):
+            return np.array([len(query) + len(text) for query, text in pairs], dtype=np.float32)
+
+    reranker = BatchedReranker(Model(), name="test-reranker")
+    np.testing.assert_array_equal(reranker.predict([("ab", "c"), ("a", "")]), [3, 1])
+    assert len(reranker.predict([])) == 0
+    assert reranker.name == "reranker"
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from app_logic.vector_index import build_vector_index
+
+
+def test_hnsw_filtered_search_returns_allowed_rows():
+    pytest.importorskip("hnswlib")
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(200, 16)).astype(np.float32)
+    index = build_vector_index(embeddings, "hnsw")
+    exact = build_vector_index(embeddings, "exact")
+
+    allowed = np.zeros(200, dtype=bool)
+    allowed[[3, 77, 150]] = True
+    query = embeddings[77]
+    # More rows requested than the filter allows.
+    row_ids, scores = index.search(query, 10, row_mask=allowed)
+    exact_ids, exact_scores = exact.search(query, 10, row_mask=allowed)
+
+    assert sorted(row_ids.tolist()) == [3, 77, 150]
+    assert row_ids[0] == 77
+    np.testing.assert_allclose(np.sort(scores), np.sort(exact_scores), atol=1e-5)
+    assert sorted(exact_ids.tolist()) == [3, 77, 150]